@@ -2,9 +2,12 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from app.services.llm_client import (
+    agenerate_chat_completion,
+    agenerate_structured_json,
+    astream_chat_completion,
     generate_chat_completion,
     generate_structured_json,
 )
@@ -27,6 +30,9 @@ def call_llm_text(
     *,
     max_new_tokens: int = DEFAULT_MAX_TOKENS,
     temperature: float = DEFAULT_TEMPERATURE,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
 ) -> str:
     """
     Call Omni Nano and return a plain text completion.
@@ -38,6 +44,9 @@ def call_llm_text(
         messages=messages,
         temperature=temperature,
         max_new_tokens=max_new_tokens,  # mapped inside llm_client
+        use_cache=use_cache,
+        timeout=timeout,
+        deadline=deadline,
     )
     return text.strip()
 
@@ -48,6 +57,9 @@ def call_llm_json(
     *,
     max_new_tokens: int = DEFAULT_MAX_TOKENS,
     temperature: float = DEFAULT_TEMPERATURE,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     Call Omni Nano expecting a JSON-like response.
@@ -62,5 +74,85 @@ def call_llm_json(
         messages=messages,
         temperature=temperature,
         max_new_tokens=max_new_tokens,
+        use_cache=use_cache,
+        timeout=timeout,
+        deadline=deadline,
     )
     return data
+
+
+async def acall_llm_text(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    max_new_tokens: int = DEFAULT_MAX_TOKENS,
+    temperature: float = DEFAULT_TEMPERATURE,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
+) -> str:
+    """
+    Async version of call_llm_text(); never blocks the event loop.
+    """
+    messages = _build_messages(system_prompt, user_prompt)
+    text = await agenerate_chat_completion(
+        messages=messages,
+        temperature=temperature,
+        max_new_tokens=max_new_tokens,
+        use_cache=use_cache,
+        timeout=timeout,
+        deadline=deadline,
+    )
+    return text.strip()
+
+
+async def acall_llm_json(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    max_new_tokens: int = DEFAULT_MAX_TOKENS,
+    temperature: float = DEFAULT_TEMPERATURE,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Async version of call_llm_json(); same {"raw": "..."} fallback.
+    """
+    messages = _build_messages(system_prompt, user_prompt)
+    data = await agenerate_structured_json(
+        messages=messages,
+        temperature=temperature,
+        max_new_tokens=max_new_tokens,
+        use_cache=use_cache,
+        timeout=timeout,
+        deadline=deadline,
+    )
+    return data
+
+
+async def astream_llm_text(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    max_new_tokens: int = DEFAULT_MAX_TOKENS,
+    temperature: float = DEFAULT_TEMPERATURE,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """
+    Like acall_llm_text(), but yields the completion as text deltas.
+
+    Chunks are passed through unstripped; callers strip the joined text.
+    """
+    messages = _build_messages(system_prompt, user_prompt)
+    async for chunk in astream_chat_completion(
+        messages=messages,
+        temperature=temperature,
+        max_new_tokens=max_new_tokens,
+        use_cache=use_cache,
+        timeout=timeout,
+        deadline=deadline,
+    ):
+        yield chunk
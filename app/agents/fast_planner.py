@@ -0,0 +1,268 @@
+# app/agents/fast_planner.py
+
+"""
+Cheap local classifier in front of the planner LLM.
+
+Small talk ("hi", "thanks", "who are you?") and other messages we can classify
+confidently get a Plan straight away, without a Space round trip; everything
+else returns None and the LLM planner runs as before.
+
+Two layers, cheapest first:
+- rules: regexes over the whole (short) message;
+- embeddings (optional, PLANNER_FAST_PATH_EMBEDDINGS=true): cosine similarity
+  to a few labelled example messages, using app.rag.embeddings.
+
+In an ongoing conversation "ok", "sounds good" or "thanks" usually mean "go
+ahead" or lead into a follow-up, so thanks / acknowledgements are only
+fast-pathed when there is no chat history.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.types import OmniState
+
+Plan = Dict[str, Any]
+
+PLANNER_FAST_PATH_ENABLED = os.getenv("PLANNER_FAST_PATH_ENABLED", "true").lower() == "true"
+# Rule matches below this confidence go to the LLM planner
+PLANNER_FAST_PATH_MIN_CONFIDENCE = float(os.getenv("PLANNER_FAST_PATH_MIN_CONFIDENCE", "0.8"))
+
+# Embedding layer: loads the sentence-transformers model, so off by default.
+# Its matches are accepted at this cosine similarity (instead of the rules'
+# confidence threshold).
+PLANNER_FAST_PATH_EMBEDDINGS = os.getenv("PLANNER_FAST_PATH_EMBEDDINGS", "false").lower() == "true"
+PLANNER_FAST_PATH_EMBEDDING_THRESHOLD = float(
+    os.getenv("PLANNER_FAST_PATH_EMBEDDING_THRESHOLD", "0.75")
+)
+
+# Longer messages always go to the LLM planner
+_MAX_FAST_PATH_WORDS = 12
+
+# Labels that mean something else mid-conversation (see module docstring)
+_FRESH_CONVERSATION_ONLY = frozenset({"thanks", "acknowledgement"})
+
+
+@dataclass
+class PlanDecision:
+    """
+    Outcome of the fast-path classifier.
+    """
+
+    label: str
+    confidence: float
+    method: str  # "rules" | "embeddings"
+    plan: Plan
+
+    def as_extras(self) -> Dict[str, Any]:
+        return {
+            "route": "fast_path",
+            "label": self.label,
+            "confidence": round(self.confidence, 3),
+            "method": self.method,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Plans
+# ---------------------------------------------------------------------------
+
+def _simple_plan(goal: str) -> Plan:
+    return {
+        "complexity": "simple",
+        "needs_research": False,
+        "goals": [goal],
+        "steps": ["Reply briefly and naturally."],
+        "constraints": [],
+    }
+
+
+_PLANS: Dict[str, Plan] = {
+    "greeting": _simple_plan("Greet the user and offer help."),
+    "thanks": _simple_plan("Acknowledge the user's thanks."),
+    "farewell": _simple_plan("Say goodbye politely."),
+    "acknowledgement": _simple_plan("Acknowledge the user and ask if they need anything else."),
+    "identity": _simple_plan("Briefly explain who OmniAI is and what it can help with."),
+}
+
+
+# ---------------------------------------------------------------------------
+# Rules
+# ---------------------------------------------------------------------------
+
+_NAME = r"(?:\s+(?:there|omni|omniai|bot|team|everyone|all|again))?"
+_TAIL = r"[\s!.,:;)\-~]*(?:[:;]-?[)D])?[\s!.]*"
+
+_RULES: List[Tuple[str, "re.Pattern[str]", float]] = [
+    (
+        "greeting",
+        re.compile(
+            r"^(?:hi+|hello+|hey+|hiya|yo|howdy|greetings|good\s+(?:morning|afternoon|evening))"
+            + _NAME + _TAIL + r"$"
+        ),
+        0.97,
+    ),
+    (
+        "thanks",
+        re.compile(
+            r"^(?:(?:thanks?|thank\s+you|thx|ty|cheers)(?:\s+(?:so\s+much|a\s+lot|very\s+much))?"
+            + _NAME + r"|much\s+appreciated|appreciate\s+it)" + _TAIL + r"$"
+        ),
+        0.97,
+    ),
+    (
+        "farewell",
+        re.compile(r"^(?:bye+|goodbye|good\s+night|see\s+(?:you|ya)(?:\s+later)?|later|cya)" + _NAME + _TAIL + r"$"),
+        0.95,
+    ),
+    (
+        "acknowledgement",
+        re.compile(
+            r"^(?:ok(?:ay)?|k|cool|great|nice|perfect|awesome|got\s+it|sounds\s+good|makes\s+sense|"
+            r"understood|alright)(?:[\s,]+(?:thanks?|thank\s+you))?" + _TAIL + r"$"
+        ),
+        0.9,
+    ),
+    (
+        "identity",
+        re.compile(
+            r"^(?:who\s+are\s+you|what\s+are\s+you|what(?:'s|\s+is)\s+your\s+name|"
+            r"what\s+can\s+you\s+do|how\s+are\s+you(?:\s+doing)?(?:\s+today)?)" + _TAIL + r"\??[\s!.]*$"
+        ),
+        0.9,
+    ),
+]
+
+
+def classify_by_rules(message: str, has_history: bool = False) -> Optional[PlanDecision]:
+    """
+    Match the whole message against the small-talk rules.
+    """
+    text = " ".join(message.lower().split())
+    if not text or len(text.split()) > _MAX_FAST_PATH_WORDS:
+        return None
+
+    for label, pattern, confidence in _RULES:
+        if has_history and label in _FRESH_CONVERSATION_ONLY:
+            continue
+        if pattern.match(text):
+            return PlanDecision(label=label, confidence=confidence, method="rules", plan=_PLANS[label])
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Embeddings
+# ---------------------------------------------------------------------------
+
+# A few examples per label; a message close enough to one of them gets its plan.
+_EXAMPLES: Dict[str, List[str]] = {
+    "greeting": ["hi there, how's it going", "hello! nice to meet you", "hey, good to see you"],
+    "thanks": ["thank you so much, that helped", "thanks, that's exactly what I needed"],
+    "farewell": ["ok bye, talk to you tomorrow", "that's all for today, goodbye"],
+    "acknowledgement": ["alright, that makes sense now", "ok cool, got it"],
+    "identity": ["tell me about yourself", "what kind of assistant are you", "what are you able to help with"],
+}
+
+
+@lru_cache(maxsize=1)
+def _example_embeddings() -> Tuple[List[str], List[List[float]]]:
+    from app.rag.embeddings import embed_texts
+
+    labels = [label for label, texts in _EXAMPLES.items() for _ in texts]
+    vectors = embed_texts([text for texts in _EXAMPLES.values() for text in texts])
+    return labels, vectors
+
+
+def classify_by_embeddings(message: str, has_history: bool = False) -> Optional[PlanDecision]:
+    """
+    Nearest labelled example by cosine similarity (embeddings are normalized,
+    so the dot product is the cosine), which is also the confidence.
+    """
+    if len(message.split()) > _MAX_FAST_PATH_WORDS:
+        return None
+
+    try:
+        from app.rag.embeddings import embed_query
+
+        labels, vectors = _example_embeddings()
+        query = embed_query(message).tolist()
+    except Exception as e:
+        print(f"[PLANNER] Embedding fast path unavailable, using LLM planner: {e!r}")
+        return None
+
+    best_label, best_score = "", -1.0
+    for label, vector in zip(labels, vectors):
+        if has_history and label in _FRESH_CONVERSATION_ONLY:
+            continue
+        score = sum(q * v for q, v in zip(query, vector))
+        if score > best_score:
+            best_label, best_score = label, score
+
+    if not best_label:
+        return None
+    return PlanDecision(label=best_label, confidence=best_score, method="embeddings", plan=_PLANS[best_label])
+
+
+# ---------------------------------------------------------------------------
+# Entry points
+# ---------------------------------------------------------------------------
+
+def _is_confident(decision: Optional[PlanDecision]) -> bool:
+    if decision is None:
+        return False
+    if decision.method == "embeddings":
+        return decision.confidence >= PLANNER_FAST_PATH_EMBEDDING_THRESHOLD
+    return decision.confidence >= PLANNER_FAST_PATH_MIN_CONFIDENCE
+
+
+def _record(state: OmniState, decision: Optional[PlanDecision]) -> None:
+    if _is_confident(decision):
+        state.extras["planner"] = decision.as_extras()
+    else:
+        state.extras["planner"] = {
+            "route": "llm",
+            "label": decision.label if decision else None,
+            "confidence": round(decision.confidence, 3) if decision else 0.0,
+        }
+
+
+def fast_plan(state: OmniState) -> Optional[Plan]:
+    """
+    Return a Plan for confidently classified messages, None to defer to the
+    LLM planner. The decision is recorded in state.extras["planner"] either way.
+    """
+    if not PLANNER_FAST_PATH_ENABLED:
+        return None
+
+    message = state.user_message or ""
+    has_history = bool(state.chat_history)
+    decision = classify_by_rules(message, has_history)
+    if not _is_confident(decision) and PLANNER_FAST_PATH_EMBEDDINGS:
+        decision = classify_by_embeddings(message, has_history) or decision
+
+    _record(state, decision)
+    return copy.deepcopy(decision.plan) if _is_confident(decision) else None
+
+
+async def afast_plan(state: OmniState) -> Optional[Plan]:
+    """
+    Async version of fast_plan(); the embedding layer runs in a worker thread.
+    """
+    if not PLANNER_FAST_PATH_ENABLED:
+        return None
+
+    message = state.user_message or ""
+    has_history = bool(state.chat_history)
+    decision = classify_by_rules(message, has_history)
+    if not _is_confident(decision) and PLANNER_FAST_PATH_EMBEDDINGS:
+        decision = await asyncio.to_thread(classify_by_embeddings, message, has_history) or decision
+
+    _record(state, decision)
+    return copy.deepcopy(decision.plan) if _is_confident(decision) else None
@@ -2,11 +2,15 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
-from app.agents.base import call_llm_text
+from app.agents.base import acall_llm_text, astream_llm_text, call_llm_text
+from app.core.deadline import call_budget
 from app.types import OmniState
 
+# Receives each chunk of the final answer as it is generated
+TokenCallback = Callable[[str], Awaitable[None]]
+
 FINALIZER_SYSTEM_PROMPT = """
 You are the Finalizer Agent for OmniAI (Omni Nano).
 
@@ -80,14 +84,57 @@ def finalizer_node(state: OmniState) -> OmniState:
     Output:
     - state.final_answer
     """
+    budget = call_budget(state, "finalizer")
     user_prompt = _build_finalizer_user_prompt(state)
 
     final_text = call_llm_text(
         system_prompt=FINALIZER_SYSTEM_PROMPT,
         user_prompt=user_prompt,
-        max_new_tokens=128,
-        temperature=0.3,
+        max_new_tokens=budget.max_new_tokens,
+        temperature=budget.temperature,
+        timeout=budget.timeout,
+        deadline=budget.deadline,
     )
 
     state.final_answer = final_text.strip()
     return state
+
+
+async def afinalizer_node(
+    state: OmniState,
+    on_token: Optional[TokenCallback] = None,
+) -> OmniState:
+    """
+    Async version of finalizer_node().
+
+    If `on_token` is given, the answer is streamed and each chunk is passed to it
+    as soon as the LLM backend produces it.
+    """
+    budget = call_budget(state, "finalizer")
+    user_prompt = _build_finalizer_user_prompt(state)
+
+    if on_token is None:
+        final_text = await acall_llm_text(
+            system_prompt=FINALIZER_SYSTEM_PROMPT,
+            user_prompt=user_prompt,
+            max_new_tokens=budget.max_new_tokens,
+            temperature=budget.temperature,
+            timeout=budget.timeout,
+            deadline=budget.deadline,
+        )
+    else:
+        chunks: List[str] = []
+        async for chunk in astream_llm_text(
+            system_prompt=FINALIZER_SYSTEM_PROMPT,
+            user_prompt=user_prompt,
+            max_new_tokens=budget.max_new_tokens,
+            temperature=budget.temperature,
+            timeout=budget.timeout,
+            deadline=budget.deadline,
+        ):
+            chunks.append(chunk)
+            await on_token(chunk)
+        final_text = "".join(chunks)
+
+    state.final_answer = final_text.strip()
+    return state
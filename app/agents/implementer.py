@@ -4,7 +4,8 @@ from __future__ import annotations
 
 from typing import Any, Dict, List
 
-from app.agents.base import call_llm_text
+from app.agents.base import acall_llm_text, call_llm_text
+from app.core.deadline import call_budget
 from app.types import OmniState
 
 IMPLEMENTER_SYSTEM_PROMPT = """
@@ -81,13 +82,36 @@ def implementer_node(state: OmniState) -> OmniState:
     Output:
     - state.draft_answer
     """
+    budget = call_budget(state, "implementer")
     user_prompt = _build_implementer_user_prompt(state)
 
     draft = call_llm_text(
         system_prompt=IMPLEMENTER_SYSTEM_PROMPT,
         user_prompt=user_prompt,
-        max_new_tokens=128,  # still light-mode; llm_client further hard-caps to 32
-        temperature=0.3,
+        max_new_tokens=budget.max_new_tokens,
+        temperature=budget.temperature,
+        timeout=budget.timeout,
+        deadline=budget.deadline,
+    )
+
+    state.draft_answer = draft.strip()
+    return state
+
+
+async def aimplementer_node(state: OmniState) -> OmniState:
+    """
+    Async version of implementer_node().
+    """
+    budget = call_budget(state, "implementer")
+    user_prompt = _build_implementer_user_prompt(state)
+
+    draft = await acall_llm_text(
+        system_prompt=IMPLEMENTER_SYSTEM_PROMPT,
+        user_prompt=user_prompt,
+        max_new_tokens=budget.max_new_tokens,
+        temperature=budget.temperature,
+        timeout=budget.timeout,
+        deadline=budget.deadline,
     )
 
     state.draft_answer = draft.strip()
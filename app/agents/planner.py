@@ -4,7 +4,10 @@ from __future__ import annotations
 
 from typing import Any, Dict, List
 
-from app.agents.base import call_llm_json
+from app.agents.base import acall_llm_json, call_llm_json
+from app.agents.fast_planner import afast_plan, fast_plan
+from app.core.deadline import call_budget, has_time_for, record_skip
+from app.core.profiles import profile_for
 from app.types import OmniState
 
 Plan = Dict[str, Any]
@@ -83,6 +86,30 @@ Your task:
     return prompt
 
 
+def _plan_from_response(data: Any) -> Plan:
+    """
+    Normalize the planner LLM's JSON (or {"raw": ...} fallback) into a Plan.
+    """
+    if not isinstance(data, dict):
+        # Fallback if the model didn't return proper JSON
+        data = {"raw": data}
+
+    return {
+        "complexity": data.get("complexity", "normal"),
+        "needs_research": bool(data.get("needs_research", True)),
+        "goals": data.get("goals", []),
+        "steps": data.get("steps", []),
+        "constraints": data.get("constraints", []),
+    }
+
+
+def _default_plan() -> Plan:
+    """
+    Plan for profiles that skip the LLM planner (see app.core.profiles).
+    """
+    return _plan_from_response({"complexity": "normal", "needs_research": False})
+
+
 def planner_node(state: OmniState) -> OmniState:
     """
     LangGraph node: Planner.
@@ -98,28 +125,72 @@ def planner_node(state: OmniState) -> OmniState:
         - goals
         - steps
         - constraints
+
+    Small talk and other confidently classified messages are planned locally
+    (app.agents.fast_planner) without an LLM call; see state.extras["planner"].
+    Profiles without an LLM planner get a default plan for everything else, as
+    do requests whose deadline leaves too little time for both the planner and
+    the implementer.
     """
+    plan = fast_plan(state)
+    if plan is not None:
+        state.plan = plan
+        return state
+
+    if not profile_for(state).llm_planner:
+        state.plan = _default_plan()
+        return state
+    if not has_time_for(state, 2):
+        record_skip(state, "planner", "deadline")
+        state.plan = _default_plan()
+        return state
+
+    budget = call_budget(state, "planner", calls=2)
     user_prompt = _build_planner_user_prompt(state)
 
-    # Call Omni Nano via the shared helper (using light-mode token budget).
+    # Call Omni Nano via the shared helper (token budget from the profile,
+    # shrunk if the deadline is close).
     data = call_llm_json(
         system_prompt=PLANNER_SYSTEM_PROMPT,
         user_prompt=user_prompt,
-        max_new_tokens=128,
-        temperature=0.2,
+        max_new_tokens=budget.max_new_tokens,
+        temperature=budget.temperature,
+        timeout=budget.timeout,
+        deadline=budget.deadline,
     )
 
-    if not isinstance(data, dict):
-        # Fallback if the model didn't return proper JSON
-        data = {"raw": data}
+    state.plan = _plan_from_response(data)
+    return state
 
-    plan: Plan = {
-        "complexity": data.get("complexity", "normal"),
-        "needs_research": bool(data.get("needs_research", True)),
-        "goals": data.get("goals", []),
-        "steps": data.get("steps", []),
-        "constraints": data.get("constraints", []),
-    }
 
-    state.plan = plan
+async def aplanner_node(state: OmniState) -> OmniState:
+    """
+    Async version of planner_node().
+    """
+    plan = await afast_plan(state)
+    if plan is not None:
+        state.plan = plan
+        return state
+
+    if not profile_for(state).llm_planner:
+        state.plan = _default_plan()
+        return state
+    if not has_time_for(state, 2):
+        record_skip(state, "planner", "deadline")
+        state.plan = _default_plan()
+        return state
+
+    budget = call_budget(state, "planner", calls=2)
+    user_prompt = _build_planner_user_prompt(state)
+
+    data = await acall_llm_json(
+        system_prompt=PLANNER_SYSTEM_PROMPT,
+        user_prompt=user_prompt,
+        max_new_tokens=budget.max_new_tokens,
+        temperature=budget.temperature,
+        timeout=budget.timeout,
+        deadline=budget.deadline,
+    )
+
+    state.plan = _plan_from_response(data)
     return state
@@ -0,0 +1,236 @@
+# app/agents/precheck.py
+
+"""
+Deterministic checks on the implementer's draft, run before the tester LLM.
+
+- empty / truncated output
+- repetition (looping generations)
+- length against the plan's complexity
+- PII / secret patterns the user didn't provide themselves
+
+A draft with no findings and a normal-complexity plan passes with high
+confidence; the tester then skips its LLM review and the finalizer is skipped
+too (the draft becomes the final answer). Findings are reported as tester
+issues / safety flags either way.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.core.profiles import profile_for
+from app.types import OmniState
+
+TESTER_PRECHECK_ENABLED = os.getenv("TESTER_PRECHECK_ENABLED", "true").lower() == "true"
+# Passing drafts at or above this confidence skip the tester/finalizer LLM calls
+TESTER_PRECHECK_MIN_CONFIDENCE = float(os.getenv("TESTER_PRECHECK_MIN_CONFIDENCE", "0.9"))
+
+# Minimum / maximum draft length (words) per plan complexity
+_MIN_WORDS = {"simple": 1, "normal": 15, "complex": 40}
+_MAX_WORDS = 1500
+
+# Confidence of a clean draft per plan complexity: complex plans always get
+# the LLM review.
+_CLEAN_CONFIDENCE = {"simple": 0.97, "normal": 0.92, "complex": 0.6}
+
+_SENTENCE_END = re.compile(r"""[.!?)\]"'`*:>]\s*$|[\U0001F300-\U0001FAFF]\s*$""")
+_TRAILING_CONNECTIVE = re.compile(r"\b(?:and|or|but|the|a|an|to|of|with|for|in|is|are|because)\s*$", re.I)
+
+
+@dataclass
+class DraftCheck:
+    """
+    Result of precheck_draft().
+    """
+
+    issues: List[str] = field(default_factory=list)
+    safety_flags: List[str] = field(default_factory=list)
+    confidence: float = 0.0
+
+    @property
+    def passed(self) -> bool:
+        return not self.issues and not self.safety_flags
+
+    @property
+    def confident_pass(self) -> bool:
+        return self.passed and self.confidence >= TESTER_PRECHECK_MIN_CONFIDENCE
+
+    def as_extras(self) -> Dict[str, Any]:
+        return {
+            "precheck": "pass" if self.passed else "fail",
+            "confidence": round(self.confidence, 3),
+            "findings": len(self.issues) + len(self.safety_flags),
+            "llm_review": not self.confident_pass,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Individual checks
+# ---------------------------------------------------------------------------
+
+def _check_truncation(draft: str) -> List[str]:
+    if draft.count("```") % 2 == 1:
+        return ["Draft answer looks truncated: a code block is never closed."]
+    if _TRAILING_CONNECTIVE.search(draft) or draft.endswith((",", ";", "-", "(")):
+        return ["Draft answer looks truncated: it ends mid-sentence."]
+    last_line = draft.splitlines()[-1].strip()
+    # List items / code lines legitimately end without punctuation
+    if last_line.startswith(("-", "*", "•", "|")) or re.match(r"^\d+[.)]\s", last_line):
+        return []
+    if not _SENTENCE_END.search(draft) and len(last_line.split()) > 3:
+        return ["Draft answer looks truncated: the last sentence is incomplete."]
+    return []
+
+
+def _check_repetition(words: List[str], draft: str) -> List[str]:
+    issues: List[str] = []
+
+    lines = [line.strip().lower() for line in draft.splitlines() if len(line.split()) >= 4]
+    if len(lines) >= 3 and len(set(lines)) <= len(lines) / 2:
+        issues.append("Draft answer repeats the same lines several times.")
+
+    n = 6
+    if len(words) >= 4 * n:
+        grams = [tuple(words[i:i + n]) for i in range(len(words) - n + 1)]
+        repeated = 1.0 - len(set(grams)) / len(grams)
+        if repeated > 0.3:
+            issues.append(f"Draft answer is repetitive ({repeated:.0%} repeated phrases).")
+    return issues
+
+
+def _check_length(words: List[str], plan: Dict[str, Any]) -> List[str]:
+    complexity = plan.get("complexity", "normal")
+    min_words = _MIN_WORDS.get(complexity, _MIN_WORDS["normal"])
+    if len(words) < min_words:
+        return [f"Draft answer is too short for a {complexity} request ({len(words)} words)."]
+    if len(words) > _MAX_WORDS:
+        return [f"Draft answer is too long ({len(words)} words); tighten it."]
+    return []
+
+
+def _luhn_ok(digits: str) -> bool:
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = int(ch)
+        if i % 2 == 1:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+
+_PII_PATTERNS = [
+    ("an email address", re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.-]+\b")),
+    # Phone-shaped groups only, and never part of a longer dotted / dashed run,
+    # so IP addresses, version numbers and dates don't match
+    (
+        "a phone number",
+        re.compile(
+            r"(?<![\w.])(?:"
+            r"\+\d{1,3}[\s.-]?(?:\(\d{1,4}\)[\s.-]?)?\d{1,4}(?:[\s.-]\d{2,4}){2,3}"  # +44 20 7946 0958
+            r"|\(\d{3}\)\s?\d{3}[\s.-]\d{4}"  # (555) 123-4567
+            r"|\d{3}(?P<sep>[\s.-])\d{3}(?P=sep)\d{4}"  # 555-123-4567, 555.123.4567
+            r"|0\d{2,4}[\s-]\d{3,4}[\s-]\d{3,4}"  # 020 7946 0958
+            r")(?!\w|[.-]\d)"
+        ),
+    ),
+    ("a US social security number", re.compile(r"\b\d{3}-\d{2}-\d{4}\b")),
+    ("an IBAN", re.compile(r"\b[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){3,7}\b")),
+    ("an API key or access token", re.compile(r"\b(?:sk-[A-Za-z0-9_-]{20,}|AKIA[0-9A-Z]{16}|gh[pousr]_[A-Za-z0-9]{36}|hf_[A-Za-z0-9]{30,})\b")),
+    ("a private key", re.compile(r"-----BEGIN (?:[A-Z]+ )?PRIVATE KEY-----")),
+]
+_CARD_CANDIDATE = re.compile(r"\b(?:\d[ -]?){13,19}\b")
+
+
+def _check_pii(draft: str, user_message: str) -> List[str]:
+    """
+    Flag PII / secrets in the draft that the user didn't supply themselves.
+    """
+    flags: List[str] = []
+
+    for match in _CARD_CANDIDATE.findall(draft):
+        digits = re.sub(r"\D", "", match)
+        if 13 <= len(digits) <= 19 and _luhn_ok(digits) and match not in user_message:
+            flags.append("Draft answer contains what looks like a payment card number.")
+            # Don't report the same digits again as a phone number
+            draft = draft.replace(match, " ")
+
+    for label, pattern in _PII_PATTERNS:
+        if any(m.group(0) not in user_message for m in pattern.finditer(draft)):
+            flags.append(f"Draft answer contains {label}.")
+    return list(dict.fromkeys(flags))
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+def precheck_draft(state: OmniState) -> DraftCheck:
+    """
+    Run all checks on state.draft_answer.
+    """
+    draft = (state.draft_answer or "").strip()
+    plan = state.plan or {}
+
+    if not draft:
+        return DraftCheck(issues=["Draft answer is empty."], confidence=1.0)
+
+    words = draft.split()
+    check = DraftCheck()
+    check.issues += _check_truncation(draft)
+    check.issues += _check_repetition([w.lower() for w in words], draft)
+    check.issues += _check_length(words, plan)
+    check.safety_flags += _check_pii(draft, state.user_message or "")
+
+    complexity = plan.get("complexity", "normal")
+    check.confidence = (
+        _CLEAN_CONFIDENCE.get(complexity, _CLEAN_CONFIDENCE["normal"]) if check.passed else 1.0
+    )
+    return check
+
+
+def run_precheck(state: OmniState) -> Optional[DraftCheck]:
+    """
+    Pre-check step shared by the review agents (tester, reviser).
+
+    Returns the check if the LLM review is still needed, None if the draft
+    passed on its own (review fields are cleared then). The outcome is
+    recorded in state.extras["tester"].
+    """
+    if not TESTER_PRECHECK_ENABLED:
+        return DraftCheck()
+
+    check = precheck_draft(state)
+    extras = check.as_extras()
+    if not profile_for(state).precheck_shortcut:
+        extras["llm_review"] = True
+    state.extras["tester"] = extras
+    if extras["llm_review"]:
+        return check
+
+    state.tester_issues = []
+    state.tester_fixes = []
+    state.safety_flags = []
+    return None
+
+
+def merge_precheck_findings(state: OmniState, check: DraftCheck) -> OmniState:
+    """
+    Put the concrete local findings ahead of the LLM's review.
+    """
+    state.tester_issues = check.issues + [i for i in state.tester_issues if i not in check.issues]
+    state.safety_flags = check.safety_flags + [
+        f for f in state.safety_flags if f not in check.safety_flags
+    ]
+    return state
+
+
+def llm_review_skipped(state: OmniState) -> bool:
+    """
+    True if the tester accepted the draft on the pre-checks alone.
+    """
+    return not state.extras.get("tester", {}).get("llm_review", True)
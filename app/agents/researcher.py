@@ -1,18 +1,98 @@
 # app/agents/researcher.py
 
+"""
+Researcher Agent: retrieval over the Qdrant knowledge base (no LLM call).
+
+- Embeds the user message and searches general_docs + personal_knowledge
+  (app.rag.rag_pipeline), profile.top_k hits per collection.
+- The async node embeds the query and searches the collections concurrently,
+  all within RAG_COLLECTION_TIMEOUT_SEC and the request deadline; a slow or
+  failing collection is left out (research["failed_collections"]).
+- If retrieval isn't available at all (Qdrant not configured, embedding model
+  missing), the pipeline continues without research.
+"""
+
 from __future__ import annotations
 
+import os
+from typing import Any, Dict
+
+from app.core.deadline import remaining_sec
+from app.core.profiles import profile_for
 from app.types import OmniState
 
+RAG_ENABLED = os.getenv("RAG_ENABLED", "true").lower() == "true"
+RAG_INCLUDE_PERSONAL = os.getenv("RAG_INCLUDE_PERSONAL", "true").lower() == "true"
+
+
+def _research_from(result: Dict[str, Any]) -> Dict[str, Any]:
+    research: Dict[str, Any] = {
+        "summary": result["research_summary"],
+        "sources": result["sources"],
+    }
+    if result.get("failed_collections"):
+        research["failed_collections"] = result["failed_collections"]
+    return research
+
+
+def _research_unavailable(reason: str) -> Dict[str, Any]:
+    return {"summary": f"Knowledge base search is unavailable ({reason}).", "sources": []}
+
 
 def researcher_node(state: OmniState) -> OmniState:
     """
-    TEMP DEBUG VERSION:
-    Bypass real RAG and just attach a simple message.
-    Later, we will re-enable Qdrant-based RAG here.
+    Lang-style node: Researcher (blocking; collections searched one after the other).
     """
-    state.research = {
-        "summary": "RAG is disabled in debug mode.",
-        "sources": [],
-    }
+    if not RAG_ENABLED:
+        state.research = _research_unavailable("RAG_ENABLED=false")
+        return state
+
+    try:
+        from app.rag.rag_pipeline import run_rag
+
+        result = run_rag(
+            state.user_message or "",
+            plan=state.plan,
+            top_k=profile_for(state).top_k,
+            include_personal=RAG_INCLUDE_PERSONAL,
+        )
+    except Exception as e:
+        print(f"[RAG] Retrieval failed, continuing without research: {e!r}")
+        state.research = _research_unavailable(type(e).__name__)
+        return state
+
+    state.research = _research_from(result)
+    return state
+
+
+async def aresearcher_node(state: OmniState) -> OmniState:
+    """
+    Async version of researcher_node(): concurrent per-collection searches with
+    timeouts, so retrieval costs one round trip instead of two serial ones.
+    """
+    if not RAG_ENABLED:
+        state.research = _research_unavailable("RAG_ENABLED=false")
+        return state
+
+    try:
+        from app.rag.rag_pipeline import RAG_COLLECTION_TIMEOUT_SEC, arun_rag
+
+        timeout = RAG_COLLECTION_TIMEOUT_SEC
+        remaining = remaining_sec(state)
+        if remaining is not None:
+            timeout = max(0.0, min(timeout, remaining))
+
+        result = await arun_rag(
+            state.user_message or "",
+            plan=state.plan,
+            top_k=profile_for(state).top_k,
+            include_personal=RAG_INCLUDE_PERSONAL,
+            timeout=timeout,
+        )
+    except Exception as e:
+        print(f"[RAG] Retrieval failed, continuing without research: {e!r}")
+        state.research = _research_unavailable(type(e).__name__)
+        return state
+
+    state.research = _research_from(result)
     return state
@@ -0,0 +1,179 @@
+# app/agents/reviser.py
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict
+
+from app.agents.base import acall_llm_json, call_llm_json
+from app.agents.precheck import merge_precheck_findings, run_precheck
+from app.agents.tester import apply_tester_review
+from app.core.deadline import call_budget
+from app.types import OmniState
+
+RevisedAnswer = Dict[str, Any]
+
+REVISER_SYSTEM_PROMPT = """
+You are the Reviser Agent for OmniAI (Omni Nano).
+
+Your job, in one pass:
+- Critically review a draft answer produced by the Implementer Agent
+  (clarity, correctness, structure, safety, usefulness).
+- Then write the final answer for the user with your fixes applied, in the
+  OmniAI style: direct, honest, helpful and practical; not cringe, not overly
+  formal, not rude.
+- If there are safety concerns, adjust the answer and/or add a brief disclaimer.
+
+You MUST respond ONLY with valid JSON in this schema:
+
+{
+  "issues": [ "issue 1", ... ],
+  "fixes": [ "fix 1", ... ],
+  "safety_flags": [ "flag 1", ... ],
+  "final_answer": "the complete final answer text"
+}
+
+Guidelines:
+- Keep "issues" and "fixes" short and specific; empty lists are fine.
+- "final_answer" is shown to the user as-is: no meta commentary about the review.
+"""
+
+
+def _build_reviser_user_prompt(state: OmniState) -> str:
+    """
+    Build the user_prompt for the reviser LLM.
+
+    Includes:
+    - user_message
+    - research summary (if any)
+    - draft_answer
+    - pre-check findings (if any)
+    """
+    user_message = state.user_message or ""
+    research = state.research or {}
+    draft = state.draft_answer or ""
+
+    research_summary = research.get("summary", "") if isinstance(research, dict) else ""
+
+    prompt = f"""
+User's original request:
+{user_message}
+
+Research summary (if any):
+{research_summary}
+
+Draft answer from the Implementer Agent:
+{draft}
+
+Known issues from automatic checks (if any):
+{state.tester_issues or []}
+{state.safety_flags or []}
+
+Your task:
+- Review the draft, then produce the final answer with the fixes applied.
+- Output JSON ONLY in the required schema.
+""".strip()
+
+    return prompt
+
+
+_FINAL_ANSWER_KEY = re.compile(r'"final_answer"\s*:\s*(?=")')
+
+
+def _recover_final_answer(raw: str) -> str:
+    """
+    The "final_answer" string from output that isn't valid JSON as a whole
+    (e.g. a trailing field was cut off), or "" unless that value is complete.
+    """
+    match = _FINAL_ANSWER_KEY.search(raw)
+    if match is None:
+        return ""
+    try:
+        value, _ = json.JSONDecoder().raw_decode(raw, match.end())
+    except ValueError:
+        return ""
+    return value if isinstance(value, str) else ""
+
+
+def _apply_revision(state: OmniState, data: Any) -> OmniState:
+    """
+    Write the review fields and the final answer onto the state.
+
+    If the model didn't return the schema, a complete "final_answer" value is
+    recovered from its raw text when possible; otherwise the draft stands (raw
+    output, often truncated JSON, is never shown to the user).
+    """
+    apply_tester_review(state, data)
+
+    final_answer: Any = ""
+    if isinstance(data, dict):
+        final_answer = data.get("final_answer") or ""
+        if not final_answer and isinstance(data.get("raw"), str):
+            final_answer = _recover_final_answer(data["raw"])
+    state.final_answer = str(final_answer).strip() or state.draft_answer
+    return state
+
+
+def reviser_node(state: OmniState) -> OmniState:
+    """
+    LangGraph node: Reviser (tester + finalizer in one LLM call).
+
+    Inputs (from OmniState):
+    - state.user_message
+    - state.research
+    - state.draft_answer
+
+    Outputs:
+    - state.tester_issues
+    - state.tester_fixes
+    - state.safety_flags
+    - state.final_answer
+
+    Drafts that pass the deterministic pre-checks are accepted as-is (the
+    final answer is left to the pipeline's draft fallback).
+    """
+    check = run_precheck(state)
+    if check is None:
+        return state
+
+    state.tester_issues = list(check.issues)
+    state.safety_flags = list(check.safety_flags)
+    budget = call_budget(state, "reviser")
+    user_prompt = _build_reviser_user_prompt(state)
+
+    data: RevisedAnswer = call_llm_json(
+        system_prompt=REVISER_SYSTEM_PROMPT,
+        user_prompt=user_prompt,
+        max_new_tokens=budget.max_new_tokens,
+        temperature=budget.temperature,
+        timeout=budget.timeout,
+        deadline=budget.deadline,
+    )
+
+    return merge_precheck_findings(_apply_revision(state, data), check)
+
+
+async def areviser_node(state: OmniState) -> OmniState:
+    """
+    Async version of reviser_node().
+    """
+    check = run_precheck(state)
+    if check is None:
+        return state
+
+    state.tester_issues = list(check.issues)
+    state.safety_flags = list(check.safety_flags)
+    budget = call_budget(state, "reviser")
+    user_prompt = _build_reviser_user_prompt(state)
+
+    data: RevisedAnswer = await acall_llm_json(
+        system_prompt=REVISER_SYSTEM_PROMPT,
+        user_prompt=user_prompt,
+        max_new_tokens=budget.max_new_tokens,
+        temperature=budget.temperature,
+        timeout=budget.timeout,
+        deadline=budget.deadline,
+    )
+
+    return merge_precheck_findings(_apply_revision(state, data), check)
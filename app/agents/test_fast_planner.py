@@ -0,0 +1,50 @@
+# app/agents/test_fast_planner.py
+
+from __future__ import annotations
+
+import pytest
+
+from app.agents import fast_planner
+from app.agents.fast_planner import PlanDecision, classify_by_rules, fast_plan
+from app.types import OmniState
+
+_HISTORY = [
+    {"role": "user", "content": "Can you draft the release notes?"},
+    {"role": "assistant", "content": "Sure. Should I include the migration steps?"},
+]
+
+
+@pytest.mark.parametrize(
+    "message, label",
+    [("Hi there!", "greeting"), ("thanks so much", "thanks"), ("got it", "acknowledgement"), ("who are you?", "identity")],
+)
+def test_small_talk_is_fast_pathed_without_history(message: str, label: str) -> None:
+    state = OmniState(user_message=message)
+    plan = fast_plan(state)
+    assert plan is not None and plan["needs_research"] is False
+    assert state.extras["planner"]["label"] == label
+
+
+@pytest.mark.parametrize("message", ["ok", "sounds good", "cool", "thanks"])
+def test_acknowledgements_mid_conversation_go_to_the_llm_planner(message: str) -> None:
+    state = OmniState(user_message=message, chat_history=list(_HISTORY))
+    assert fast_plan(state) is None
+    assert state.extras["planner"]["route"] == "llm"
+
+
+def test_greetings_are_still_fast_pathed_mid_conversation() -> None:
+    assert classify_by_rules("hello again", has_history=True).label == "greeting"
+
+
+def test_embedding_matches_use_their_own_threshold(monkeypatch: pytest.MonkeyPatch) -> None:
+    def classify(message: str, has_history: bool = False) -> PlanDecision:
+        return PlanDecision("identity", 0.77, "embeddings", fast_planner._PLANS["identity"])
+
+    monkeypatch.setattr(fast_planner, "PLANNER_FAST_PATH_EMBEDDINGS", True)
+    monkeypatch.setattr(fast_planner, "classify_by_embeddings", classify)
+
+    monkeypatch.setattr(fast_planner, "PLANNER_FAST_PATH_EMBEDDING_THRESHOLD", 0.75)
+    assert fast_plan(OmniState(user_message="tell me about yourself")) is not None
+
+    monkeypatch.setattr(fast_planner, "PLANNER_FAST_PATH_EMBEDDING_THRESHOLD", 0.8)
+    assert fast_plan(OmniState(user_message="tell me about yourself")) is None
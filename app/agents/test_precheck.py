@@ -0,0 +1,42 @@
+# app/agents/test_precheck.py
+
+from __future__ import annotations
+
+import pytest
+
+from app.agents.precheck import _check_pii
+
+_PHONE_FLAG = "Draft answer contains a phone number."
+
+
+@pytest.mark.parametrize(
+    "draft",
+    [
+        "Call us at +44 20 7946 0958 for support.",
+        "Call us at +1-555-123-4567.",
+        "Call (555) 123-4567 today.",
+        "Call 555-123-4567 or 555.123.4567.",
+        "Ring 020 7946 0958.",
+    ],
+)
+def test_phone_numbers_are_flagged(draft: str) -> None:
+    assert _PHONE_FLAG in _check_pii(draft, user_message="")
+
+
+@pytest.mark.parametrize(
+    "draft",
+    [
+        "The router is at 192.168.100.200 and the DNS at 10.0.0.1.",
+        "Upgrade to version 10.0.19041.1 or 2.31.0.",
+        "The release shipped on 2024-01-15.",
+        "We sold 1999 2000 2001 units in those years.",
+        "Order 123-45-6789-0000 is on its way.",
+    ],
+)
+def test_ips_versions_and_dates_are_not_phone_numbers(draft: str) -> None:
+    assert _PHONE_FLAG not in _check_pii(draft, user_message="")
+
+
+def test_phone_number_from_the_user_is_not_flagged() -> None:
+    message = "My number is 555-123-4567, can you format it?"
+    assert _PHONE_FLAG not in _check_pii("Formatted: 555-123-4567", message)
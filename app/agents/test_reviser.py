@@ -0,0 +1,39 @@
+# app/agents/test_reviser.py
+
+from __future__ import annotations
+
+from app.agents.reviser import _apply_revision
+from app.types import OmniState
+
+
+def _state() -> OmniState:
+    return OmniState(user_message="q", draft_answer="The draft.")
+
+
+def test_schema_final_answer_is_used() -> None:
+    state = _apply_revision(_state(), {"issues": ["typo"], "final_answer": " Fixed. "})
+    assert state.final_answer == "Fixed."
+    assert state.tester_issues == ["typo"]
+
+
+def test_unparsed_output_falls_back_to_the_draft() -> None:
+    raw = '{"issues": ["too long"], "fixes": ["shorten'
+    state = _apply_revision(_state(), {"raw": raw})
+    assert state.final_answer == "The draft."
+
+
+def test_truncated_final_answer_is_not_used() -> None:
+    raw = '{"issues": [], "final_answer": "Half of the rewritten ans'
+    state = _apply_revision(_state(), {"raw": raw})
+    assert state.final_answer == "The draft."
+
+
+def test_complete_final_answer_is_recovered_from_unparsed_output() -> None:
+    raw = '{"final_answer": "Line one.\\nSay \\"hi\\".", "safety_flags": ["cut o'
+    state = _apply_revision(_state(), {"raw": raw})
+    assert state.final_answer == 'Line one.\nSay "hi".'
+
+
+def test_empty_or_non_dict_output_keeps_the_draft() -> None:
+    assert _apply_revision(_state(), {"final_answer": ""}).final_answer == "The draft."
+    assert _apply_revision(_state(), "plain text").final_answer == "The draft."
@@ -4,7 +4,9 @@ from __future__ import annotations
 
 from typing import Any, Dict, List
 
-from app.agents.base import call_llm_json
+from app.agents.base import acall_llm_json, call_llm_json
+from app.agents.precheck import merge_precheck_findings, run_precheck
+from app.core.deadline import call_budget
 from app.types import OmniState
 
 TesterReview = Dict[str, Any]
@@ -92,6 +94,32 @@ Your task:
     return prompt
 
 
+def apply_tester_review(state: OmniState, data: Any) -> OmniState:
+    """
+    Normalize the tester LLM's JSON and write it onto the state.
+    """
+    if not isinstance(data, dict):
+        data = {"raw": data}
+
+    issues = data.get("issues", [])
+    fixes = data.get("fixes", [])
+    safety_flags = data.get("safety_flags", [])
+
+    # Normalize types
+    if not isinstance(issues, list):
+        issues = [str(issues)]
+    if not isinstance(fixes, list):
+        fixes = [str(fixes)]
+    if not isinstance(safety_flags, list):
+        safety_flags = [str(safety_flags)]
+
+    state.tester_issues = [str(i) for i in issues]
+    state.tester_fixes = [str(f) for f in fixes]
+    state.safety_flags = [str(s) for s in safety_flags]
+
+    return state
+
+
 def tester_node(state: OmniState) -> OmniState:
     """
     LangGraph node: Tester.
@@ -106,33 +134,47 @@ def tester_node(state: OmniState) -> OmniState:
     - state.tester_issues
     - state.tester_fixes
     - state.safety_flags
+
+    Drafts that pass the deterministic pre-checks with high confidence are
+    accepted without an LLM call (see state.extras["tester"]).
     """
+    check = run_precheck(state)
+    if check is None:
+        return state
+
+    budget = call_budget(state, "tester", calls=2)
     user_prompt = _build_tester_user_prompt(state)
 
     data: TesterReview = call_llm_json(
         system_prompt=TESTER_SYSTEM_PROMPT,
         user_prompt=user_prompt,
-        max_new_tokens=128,
-        temperature=0.2,
+        max_new_tokens=budget.max_new_tokens,
+        temperature=budget.temperature,
+        timeout=budget.timeout,
+        deadline=budget.deadline,
     )
 
-    if not isinstance(data, dict):
-        data = {"raw": data}
+    return merge_precheck_findings(apply_tester_review(state, data), check)
 
-    issues = data.get("issues", [])
-    fixes = data.get("fixes", [])
-    safety_flags = data.get("safety_flags", [])
 
-    # Normalize types
-    if not isinstance(issues, list):
-        issues = [str(issues)]
-    if not isinstance(fixes, list):
-        fixes = [str(fixes)]
-    if not isinstance(safety_flags, list):
-        safety_flags = [str(safety_flags)]
+async def atester_node(state: OmniState) -> OmniState:
+    """
+    Async version of tester_node().
+    """
+    check = run_precheck(state)
+    if check is None:
+        return state
 
-    state.tester_issues = [str(i) for i in issues]
-    state.tester_fixes = [str(f) for f in fixes]
-    state.safety_flags = [str(s) for s in safety_flags]
+    budget = call_budget(state, "tester", calls=2)
+    user_prompt = _build_tester_user_prompt(state)
 
-    return state
+    data: TesterReview = await acall_llm_json(
+        system_prompt=TESTER_SYSTEM_PROMPT,
+        user_prompt=user_prompt,
+        max_new_tokens=budget.max_new_tokens,
+        temperature=budget.temperature,
+        timeout=budget.timeout,
+        deadline=budget.deadline,
+    )
+
+    return merge_precheck_findings(apply_tester_review(state, data), check)
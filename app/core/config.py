@@ -21,6 +21,19 @@ class Settings(BaseSettings):
         os.getenv("HF_API_TOKEN") or os.getenv("HF_TOKEN") or os.getenv("HF_API_KEY")
     )
 
+    # LLM backend: "gradio" (the HF Space), "openai" (any OpenAI-compatible
+    # /v1/chat/completions server, e.g. app.services.mock_llm_server) or "fake"
+    # (in-process, no network; for load tests).
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "gradio")
+    LLM_OPENAI_BASE_URL: str = os.getenv("LLM_OPENAI_BASE_URL", "http://127.0.0.1:8001/v1")
+    LLM_OPENAI_API_KEY: Optional[str] = os.getenv("LLM_OPENAI_API_KEY")
+    LLM_OPENAI_MODEL: str = os.getenv("LLM_OPENAI_MODEL", "omni-nano")
+
+    # Latency model for the fake backend and the mock LLM server
+    FAKE_LLM_LATENCY_MEDIAN_MS: float = float(os.getenv("FAKE_LLM_LATENCY_MEDIAN_MS", "800"))
+    FAKE_LLM_LATENCY_SIGMA: float = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+    FAKE_LLM_TOKENS_PER_SEC: float = float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "30"))
+
     # RAG / Qdrant (for later when we re-enable RAG)
     QDRANT_URL: Optional[str] = os.getenv("QDRANT_URL")
     QDRANT_API_KEY: Optional[str] = os.getenv("QDRANT_API_KEY")
@@ -0,0 +1,142 @@
+# app/core/deadline.py
+
+"""
+Per-request deadlines.
+
+arun_omni_graph() stamps state.deadline (absolute time.time()) from the
+profile's deadline_sec or settings["timeout_sec"]. Every LLM call gets the
+deadline, so no attempt or retry runs past it, and the pipeline degrades
+instead of overrunning:
+
+- the planner falls back to its default plan when there's barely time for the
+  implementer;
+- optional stages (research, review, finalizer) are skipped when the calls they
+  need no longer fit, or when their LLM call runs out of time; the draft then
+  becomes the final answer;
+- token budgets shrink when the remaining time is less than a typical call.
+
+Skipped stages are recorded in state.extras["skipped"] ({stage: reason}) and
+shrunk budgets in state.extras["shrunk_budgets"] ({agent: max_new_tokens}).
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional
+
+from app.core.profiles import PipelineProfile, profile_for
+from app.services.llm_client import estimate_call_latency
+from app.types import OmniState
+
+# Upper bound for settings["timeout_sec"]
+PIPELINE_MAX_DEADLINE_SEC = float(os.getenv("PIPELINE_MAX_DEADLINE_SEC", "300"))
+
+# Assumed LLM call latency until the client has measured a few real calls
+PIPELINE_DEFAULT_CALL_SEC = float(os.getenv("PIPELINE_DEFAULT_CALL_SEC", "5"))
+
+# Token budgets never shrink below this fraction of the profile's budget
+PIPELINE_MIN_TOKEN_FRACTION = float(os.getenv("PIPELINE_MIN_TOKEN_FRACTION", "0.25"))
+
+
+class PipelineDeadlineError(TimeoutError):
+    """Raised when a request's deadline passes before it could produce an answer."""
+    pass
+
+
+@dataclass(frozen=True)
+class CallBudget:
+    """
+    Arguments for one agent's LLM call (see call_budget()).
+    """
+
+    max_new_tokens: int
+    temperature: float
+    timeout: float
+    deadline: Optional[float]
+
+
+def request_deadline(
+    profile: PipelineProfile,
+    settings: Optional[Mapping[str, Any]] = None,
+) -> float:
+    """
+    Absolute deadline for a request starting now; raises ValueError for a bad
+    settings["timeout_sec"].
+    """
+    seconds: Any = (settings or {}).get("timeout_sec")
+    if seconds is None:
+        seconds = profile.deadline_sec
+    try:
+        seconds = float(seconds)
+    except (TypeError, ValueError):
+        raise ValueError(f"timeout_sec must be a number, got {seconds!r}.") from None
+    if not 0 < seconds <= PIPELINE_MAX_DEADLINE_SEC:
+        raise ValueError(f"timeout_sec must be in (0, {PIPELINE_MAX_DEADLINE_SEC:g}].")
+    return time.time() + seconds
+
+
+def remaining_sec(state: OmniState) -> Optional[float]:
+    """
+    Seconds left before state.deadline (negative once passed), None without one.
+    """
+    if state.deadline is None:
+        return None
+    return state.deadline - time.time()
+
+
+def expected_call_sec() -> float:
+    measured = estimate_call_latency()
+    return measured if measured is not None else PIPELINE_DEFAULT_CALL_SEC
+
+
+def has_time_for(state: OmniState, calls: int = 1) -> bool:
+    """
+    True if `calls` typical LLM calls still fit before the deadline.
+    """
+    remaining = remaining_sec(state)
+    if remaining is None:
+        return True
+    return remaining >= calls * expected_call_sec()
+
+
+def call_budget(state: OmniState, agent: str, calls: int = 1) -> CallBudget:
+    """
+    The profile's budget for `agent`, with max_new_tokens scaled down when this
+    call's share of the remaining time (split over the `calls` still to come,
+    this one included) is less than a typical call.
+
+    The call's own deadline keeps time back for the calls after it, so a slow
+    optional stage can't starve the ones that must still run.
+    """
+    profile = profile_for(state)
+    budget = profile.budget(agent)
+    max_new_tokens = budget.max_new_tokens
+    deadline = state.deadline
+
+    remaining = remaining_sec(state)
+    if remaining is not None:
+        calls = max(1, calls)
+        share = max(0.0, remaining) / calls
+        expected = expected_call_sec()
+        deadline = state.deadline - (calls - 1) * min(share, expected)
+        if share < expected:
+            fraction = max(PIPELINE_MIN_TOKEN_FRACTION, share / expected)
+            max_new_tokens = max(1, int(budget.max_new_tokens * fraction))
+            state.extras.setdefault("shrunk_budgets", {})[agent] = max_new_tokens
+
+    return CallBudget(
+        max_new_tokens=max_new_tokens,
+        temperature=budget.temperature,
+        timeout=profile.llm_timeout_sec,
+        deadline=deadline,
+    )
+
+
+def record_skip(state: OmniState, stage: str, reason: str) -> None:
+    """
+    Note that `stage` was skipped (e.g. reason "deadline").
+    """
+    state.extras.setdefault("skipped", {})[stage] = reason
+    print(f"[DEADLINE] Skipping {stage}: {reason}")
@@ -0,0 +1,354 @@
+# app/core/metrics.py
+
+"""
+Process metrics in the Prometheus text exposition format (served by
+app.routers.metrics at /metrics).
+
+Counters, gauges and histograms are sharded per thread: each thread adds to
+its own slots, so recording takes no lock (asyncio tasks on the loop thread
+share its shard; a single `+=` is never interleaved with another task). A
+lock is only taken the first time a thread touches a label set, and while
+rendering, which sums the shards.
+
+    REQUESTS = counter("omni_http_requests_total", "HTTP requests.", ("endpoint", "status"))
+    REQUESTS.labels("/chat", "200").inc()
+
+Values derived from existing stats (cache hit counters etc.) are exported by
+callbacks registered with register_collector(), at scrape time only.
+
+MetricsMiddleware records per-endpoint request counts, latency and in-flight
+requests for the HTTP app.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, MutableMapping, Sequence, Tuple
+
+# Default latency buckets (seconds)
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+SIZE_BUCKETS: Tuple[float, ...] = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# (name, labels, value) samples produced by a collector at scrape time
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class _Child:
+    """
+    One label set of a metric: `width` float slots per thread.
+    """
+
+    __slots__ = ("width", "_local", "_shards", "_lock")
+
+    def __init__(self, width: int) -> None:
+        self.width = width
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def _slots(self) -> List[float]:
+        slots = getattr(self._local, "slots", None)
+        if slots is None:
+            slots = [0.0] * self.width
+            with self._lock:
+                self._shards.append(slots)
+            self._local.slots = slots
+        return slots
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            shards = list(self._shards)
+        totals = [0.0] * self.width
+        for shard in shards:
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], _Child] = {}
+        self._lock = threading.Lock()
+
+    def _width(self) -> int:
+        return 1
+
+    def _child(self, values: Tuple[str, ...]) -> _Child:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _Child(self._width()))
+        return child
+
+    def _label_values(self, args: Tuple[str, ...], kwargs: Dict[str, str]) -> Tuple[str, ...]:
+        if kwargs:
+            args = tuple(kwargs[name] for name in self.labelnames)
+        if len(args) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {args}")
+        return tuple(str(a) for a in args)
+
+    def children(self) -> List[Tuple[Dict[str, str], _Child]]:
+        with self._lock:
+            items = list(self._children.items())
+        return [(dict(zip(self.labelnames, values)), child) for values, child in items]
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, child in self.children():
+            yield self.name, labels, child.totals()[0]
+
+
+class _CounterChild:
+    __slots__ = ("_child",)
+
+    def __init__(self, child: _Child) -> None:
+        self._child = child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._child._slots()[0] += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def labels(self, *args: str, **kwargs: str) -> _CounterChild:
+        return _CounterChild(self._child(self._label_values(args, kwargs)))
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._child(())._slots()[0] += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._child._slots()[0] -= amount
+
+
+class Gauge(_Metric):
+    """
+    Up/down gauge (e.g. in-flight requests); inc() and dec() may happen on
+    different threads, the shards are summed.
+    """
+
+    kind = "gauge"
+
+    def labels(self, *args: str, **kwargs: str) -> _GaugeChild:
+        return _GaugeChild(self._child(self._label_values(args, kwargs)))
+
+
+class _HistogramChild:
+    __slots__ = ("_child", "_buckets")
+
+    def __init__(self, child: _Child, buckets: Tuple[float, ...]) -> None:
+        self._child = child
+        self._buckets = buckets
+
+    def observe(self, value: float) -> None:
+        # Slots: one per bucket (non-cumulative) + overflow, then sum and count
+        slots = self._child._slots()
+        slots[bisect_left(self._buckets, value)] += 1
+        slots[-2] += value
+        slots[-1] += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _width(self) -> int:
+        return len(self.buckets) + 3
+
+    def labels(self, *args: str, **kwargs: str) -> _HistogramChild:
+        return _HistogramChild(self._child(self._label_values(args, kwargs)), self.buckets)
+
+    def observe(self, value: float) -> None:
+        _HistogramChild(self._child(()), self.buckets).observe(value)
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, child in self.children():
+            totals = child.totals()
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), totals):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _format_value(bound)
+                yield f"{self.name}_bucket", {**labels, "le": le}, cumulative
+            yield f"{self.name}_sum", labels, totals[-2]
+            yield f"{self.name}_count", labels, totals[-1]
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+_metrics: Dict[str, _Metric] = {}
+_collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+_registry_lock = threading.Lock()
+
+
+def _register(metric: _Metric) -> _Metric:
+    with _registry_lock:
+        existing = _metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        _metrics[metric.name] = metric
+        return metric
+
+
+def counter(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _register(Counter(name, help_text, labelnames))  # type: ignore[return-value]
+
+
+def gauge(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return _register(Gauge(name, help_text, labelnames))  # type: ignore[return-value]
+
+
+def histogram(
+    name: str,
+    help_text: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = LATENCY_BUCKETS,
+) -> Histogram:
+    return _register(Histogram(name, help_text, labelnames, buckets))  # type: ignore[return-value]
+
+
+def register_collector(
+    name: str,
+    kind: str,
+    help_text: str,
+    collect: Callable[[], Iterable[Sample]],
+) -> None:
+    """
+    Export samples computed at scrape time (`kind`: "counter" | "gauge").
+    """
+    with _registry_lock:
+        if all(existing[0] != name for existing in _collectors):
+            _collectors.append((name, kind, help_text, collect))
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if labels:
+        rendered = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+        return f"{name}{{{rendered}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+def render_metrics() -> str:
+    """
+    All metrics in the Prometheus text format (version 0.0.4).
+    """
+    with _registry_lock:
+        metrics = list(_metrics.values())
+        collectors = list(_collectors)
+
+    lines: List[str] = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(_format_sample(*sample) for sample in metric.samples())
+
+    for name, kind, help_text, collect in collectors:
+        try:
+            samples = list(collect())
+        except Exception as e:
+            print(f"[METRICS] Collector {name} failed: {e!r}")
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(_format_sample(*sample) for sample in samples)
+
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# HTTP middleware
+# ---------------------------------------------------------------------------
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+_HTTP_REQUESTS = counter(
+    "omni_http_requests_total",
+    "HTTP requests per endpoint and status code.",
+    ("endpoint", "status"),
+)
+_HTTP_LATENCY = histogram(
+    "omni_http_request_duration_seconds",
+    "HTTP request latency per endpoint, until the last body chunk is sent.",
+    ("endpoint",),
+)
+_HTTP_IN_FLIGHT = gauge(
+    "omni_http_requests_in_flight",
+    "HTTP requests currently being served.",
+    ("method",),
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (it doesn't buffer streaming responses).
+
+    Endpoints are labelled by route template ("/sessions/{session_id}"), so
+    label cardinality stays bounded; requests no route matched are
+    "unmatched". /metrics itself is not recorded.
+    """
+
+    def __init__(self, app: Callable[[Scope, Receive, Send], Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("path") == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        in_flight = _HTTP_IN_FLIGHT.labels(scope.get("method", ""))
+        in_flight.inc()
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            _HTTP_LATENCY.labels(endpoint).observe(time.perf_counter() - t0)
+            _HTTP_REQUESTS.labels(endpoint, str(status)).inc()
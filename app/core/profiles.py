@@ -0,0 +1,133 @@
+# app/core/profiles.py
+
+"""
+Pipeline profiles, picked per request from ChatRequest.settings["depth"].
+
+- fast:     one LLM call (implementer); no LLM planner, research or review.
+- balanced: the default pipeline; research and review as the plan decides.
+- thorough: always research and review (tester + finalizer), larger budgets.
+
+A profile decides which stages run, each agent's token budget and temperature,
+the retrieval top_k, the per-call LLM timeout and the request's overall
+deadline (see app.core.deadline).
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping, Optional
+
+from app.types import OmniState
+
+# Profile used when the request doesn't name one
+PIPELINE_DEFAULT_PROFILE = os.getenv("PIPELINE_DEFAULT_PROFILE", "balanced").strip().lower()
+
+
+@dataclass(frozen=True)
+class AgentBudget:
+    max_new_tokens: int
+    temperature: float
+
+
+@dataclass(frozen=True)
+class PipelineProfile:
+    """
+    - budgets: per-agent token budget / temperature (planner, implementer,
+      tester, finalizer, reviser)
+    - llm_planner: False = only the rule-based fast path, else a default plan
+    - research: "never" | "auto" (plan["needs_research"]) | "always"
+    - review: "none" | "auto" (skip for simple plans) | "always"
+    - review_mode: force "separate" / "merged" review (None = PIPELINE_REVIEW_MODE)
+    - precheck_shortcut: accept drafts that pass the deterministic pre-checks
+      without the LLM review
+    - top_k: retrieval hits per collection
+    - llm_timeout_sec: per-attempt LLM timeout
+    - deadline_sec: end-to-end budget of a request (settings["timeout_sec"]
+      can lower or raise it)
+    """
+
+    name: str
+    budgets: Dict[str, AgentBudget] = field(default_factory=dict)
+    llm_planner: bool = True
+    research: str = "auto"
+    review: str = "auto"
+    review_mode: Optional[str] = None
+    precheck_shortcut: bool = True
+    top_k: int = 5
+    llm_timeout_sec: float = 60.0
+    deadline_sec: float = 45.0
+
+    def budget(self, agent: str) -> AgentBudget:
+        return self.budgets[agent]
+
+
+PROFILES: Dict[str, PipelineProfile] = {
+    "fast": PipelineProfile(
+        name="fast",
+        budgets={
+            "planner": AgentBudget(64, 0.2),
+            "implementer": AgentBudget(192, 0.3),
+            "tester": AgentBudget(96, 0.2),
+            "finalizer": AgentBudget(192, 0.3),
+            "reviser": AgentBudget(512, 0.3),
+        },
+        llm_planner=False,
+        research="never",
+        review="none",
+        top_k=3,
+        llm_timeout_sec=float(os.getenv("PROFILE_FAST_LLM_TIMEOUT_SEC", "20")),
+        deadline_sec=float(os.getenv("PROFILE_FAST_DEADLINE_SEC", "15")),
+    ),
+    "balanced": PipelineProfile(
+        name="balanced",
+        budgets={
+            "planner": AgentBudget(128, 0.2),
+            "implementer": AgentBudget(192, 0.3),
+            "tester": AgentBudget(128, 0.2),
+            "finalizer": AgentBudget(192, 0.3),
+            "reviser": AgentBudget(512, 0.3),
+        },
+        top_k=5,
+        llm_timeout_sec=float(os.getenv("PROFILE_BALANCED_LLM_TIMEOUT_SEC", "60")),
+        deadline_sec=float(os.getenv("PROFILE_BALANCED_DEADLINE_SEC", "45")),
+    ),
+    "thorough": PipelineProfile(
+        name="thorough",
+        budgets={
+            "planner": AgentBudget(192, 0.2),
+            "implementer": AgentBudget(512, 0.4),
+            "tester": AgentBudget(256, 0.1),
+            "finalizer": AgentBudget(512, 0.3),
+            "reviser": AgentBudget(768, 0.3),
+        },
+        research="always",
+        review="always",
+        review_mode="separate",
+        precheck_shortcut=False,
+        top_k=10,
+        llm_timeout_sec=float(os.getenv("PROFILE_THOROUGH_LLM_TIMEOUT_SEC", "120")),
+        deadline_sec=float(os.getenv("PROFILE_THOROUGH_DEADLINE_SEC", "150")),
+    ),
+}
+
+
+def resolve_profile(settings: Optional[Mapping[str, Any]] = None) -> PipelineProfile:
+    """
+    Profile for a request's settings ("depth"); raises ValueError for unknown names.
+    """
+    name = str((settings or {}).get("depth") or PIPELINE_DEFAULT_PROFILE).strip().lower()
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown depth {name!r}; expected one of: {', '.join(PROFILES)}."
+        ) from None
+
+
+def profile_for(state: OmniState) -> PipelineProfile:
+    """
+    The profile a run was started with (see arun_omni_graph); default otherwise.
+    """
+    default = PROFILES.get(PIPELINE_DEFAULT_PROFILE, PROFILES["balanced"])
+    return PROFILES.get(state.extras.get("profile", ""), default)
@@ -0,0 +1,170 @@
+# app/core/timing.py
+
+"""
+Per-request timing spans.
+
+arun_omni_graph() starts a Trace when timings are enabled (PIPELINE_TIMINGS_ENABLED
+or settings["timings"]) and puts it in a context variable; pipeline stages,
+LLM calls, embeddings and Qdrant calls open spans on it:
+
+    with span("llm", "llm", max_new_tokens=256) as rec:
+        ...
+        annotate(cache="miss", attempts=2)
+
+Each span records its start offset and duration in ms, the stage it ran in
+(set_current_stage(), which also labels the LLM metrics) and any attributes
+(attempts, cache hits, prompt/output sizes, ...). The trace ends up in
+state.extras["timings"] and ChatResponse.timings.
+
+Without a trace, span() returns a shared no-op context manager and annotate()
+returns straight away: one context-variable lookup per call.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextvars import ContextVar, Token
+from typing import Any, Dict, List, Optional
+
+PIPELINE_TIMINGS_ENABLED = os.getenv("PIPELINE_TIMINGS_ENABLED", "false").lower() == "true"
+
+Span = Dict[str, Any]
+
+
+class Trace:
+    """
+    Spans of one request. Appends are atomic list operations, so spans may be
+    recorded from worker threads (to_thread copies the context) as well.
+    """
+
+    def __init__(self) -> None:
+        self.t0 = time.perf_counter()
+        self.spans: List[Span] = []
+
+    def offset_ms(self, t: float) -> float:
+        return round((t - self.t0) * 1000.0, 3)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        {"total_ms", "stages": {stage: ms}, "spans": [...]} sorted by start.
+        """
+        spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        stages: Dict[str, float] = {}
+        for s in spans:
+            if s["kind"] == "stage":
+                stages[s["name"]] = round(stages.get(s["name"], 0.0) + s["duration_ms"], 3)
+        return {
+            "total_ms": self.offset_ms(time.perf_counter()),
+            "stages": stages,
+            "spans": spans,
+        }
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("omni_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("omni_current_span", default=None)
+_current_stage: ContextVar[Optional[str]] = ContextVar("omni_current_stage", default=None)
+
+
+class _SpanContext:
+    __slots__ = ("trace", "record", "t_start", "tokens")
+
+    def __init__(self, trace: Trace, record: Span) -> None:
+        self.trace = trace
+        self.record = record
+        self.t_start = 0.0
+        self.tokens: List[Token] = []
+
+    def __enter__(self) -> Span:
+        self.t_start = time.perf_counter()
+        self.record["start_ms"] = self.trace.offset_ms(self.t_start)
+        self.tokens.append(_current_span.set(self.record))
+        return self.record
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.record["duration_ms"] = round((time.perf_counter() - self.t_start) * 1000.0, 3)
+        if exc_type is not None:
+            self.record["error"] = exc_type.__name__
+        for token in reversed(self.tokens):
+            try:
+                token.var.reset(token)
+            except ValueError:
+                # Closed from another context (e.g. an abandoned stream)
+                pass
+        self.trace.spans.append(self.record)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, kind: str, **attrs: Any) -> Any:
+    """
+    Context manager timing a block as a span of the current trace (no-op
+    without one). `kind` is "stage", "llm", "embedding", "qdrant", ...
+    """
+    trace = _trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    record: Span = {"name": name, "kind": kind}
+    stage = _current_stage.get()
+    if stage is not None and kind != "stage":
+        record["stage"] = stage
+    record.update(attrs)
+    return _SpanContext(trace, record)
+
+
+def annotate(**attrs: Any) -> None:
+    """
+    Add attributes to the innermost open span (no-op without a trace).
+    """
+    if _trace.get() is None:
+        return
+    record = _current_span.get()
+    if record is not None:
+        record.update(attrs)
+
+
+def current_stage() -> Optional[str]:
+    """
+    The pipeline stage (agent) the caller runs in, if any.
+    """
+    return _current_stage.get()
+
+
+def set_current_stage(name: str) -> Token:
+    return _current_stage.set(name)
+
+
+def reset_current_stage(token: Token) -> None:
+    _current_stage.reset(token)
+
+
+def start_trace(enabled: bool) -> Optional[Token]:
+    """
+    Start a trace for the current context if `enabled`; pass the token to
+    end_trace().
+    """
+    if not (enabled or PIPELINE_TIMINGS_ENABLED):
+        return None
+    return _trace.set(Trace())
+
+
+def end_trace(token: Optional[Token]) -> Optional[Dict[str, Any]]:
+    """
+    Stop the trace started by start_trace() and return its summary.
+    """
+    if token is None:
+        return None
+    trace = _trace.get()
+    _trace.reset(token)
+    return trace.summary() if trace is not None else None
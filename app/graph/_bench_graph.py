@@ -0,0 +1,78 @@
+# app/graph/_bench_graph.py
+
+"""
+Measure end-to-end throughput of the async pipeline without the real Space.
+
+Usage (from omni-backend root):
+
+    # fully in-process (no network at all)
+    LLM_BACKEND=fake python -m app.graph._bench_graph --requests 200 --concurrency 50
+
+    # against the local mock server (see app/services/mock_llm_server.py)
+    LLM_BACKEND=openai LLM_OPENAI_BASE_URL=http://127.0.0.1:8001/v1 \\
+        python -m app.graph._bench_graph
+
+Set LLM_CACHE_ENABLED=false to measure uncached throughput; by default every
+request sends a distinct message so the completion cache doesn't hide latency.
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+from app.graph.workflow import arun_omni_graph
+from app.services.llm_client import get_llm_backend_stats
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def _run(n_requests: int, concurrency: int, distinct: bool) -> None:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        message = f"Benchmark question #{i}: what is OmniAI?" if distinct else "What is OmniAI?"
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                await arun_omni_graph(user_message=message, chat_history=[])
+            except Exception as e:
+                errors += 1
+                print(f"[BENCH] request {i} failed: {e}")
+                return
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    elapsed = time.perf_counter() - t0
+
+    print("\n=== BENCHMARK ===")
+    print(f"backend:      {get_llm_backend_stats()}")
+    print(f"requests:     {n_requests} (concurrency {concurrency}, errors {errors})")
+    print(f"wall time:    {elapsed:.2f}s")
+    print(f"throughput:   {len(latencies) / elapsed:.1f} pipelines/s")
+    print(f"latency p50:  {_percentile(latencies, 0.50) * 1000:.0f} ms")
+    print(f"latency p95:  {_percentile(latencies, 0.95) * 1000:.0f} ms")
+    print(f"latency p99:  {_percentile(latencies, 0.99) * 1000:.0f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark arun_omni_graph throughput.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--same-message", action="store_true", help="send one message repeatedly")
+    args = parser.parse_args()
+
+    asyncio.run(_run(args.requests, args.concurrency, distinct=not args.same_message))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+# app/graph/compiled.py
+
+"""
+Compile a list of pipeline Stages (app.graph.dag) into a LangGraph StateGraph.
+
+Each stage becomes a node; `when` gates become conditional edges to either the
+stage node or a `<stage>__skip` node (which applies `otherwise`). Speculative
+stages get a `<stage>__speculative` node started as soon as their `needs` are
+done, joined with the `after` stages into a `<stage>` gate node that keeps or
+discards the speculative result; when `speculate_if` declines, the
+speculative node does nothing and the gate runs the stage itself if `when`
+holds. (Unlike run_dag, LangGraph cannot cancel the
+speculative node mid-step; a discarded result still costs its full run.)
+
+With a checkpointer, every finished superstep is persisted under the run's
+thread id, so a failed / timed-out run can be resumed with
+`graph.ainvoke(None, config)` and only the nodes that had not completed run
+again (their LLM calls included).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import os
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import fields
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Set
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from app.graph.dag import Stage, StageDoneCallback, speculates, validate_stages
+from app.graph.state import GraphState
+from app.types import OmniState
+
+# "memory" (per process), "sqlite" (survives restarts; needs
+# langgraph-checkpoint-sqlite) or "none" (no resume).
+PIPELINE_CHECKPOINTER = os.getenv("PIPELINE_CHECKPOINTER", "memory").strip().lower()
+PIPELINE_CHECKPOINT_SQLITE_PATH = os.getenv("PIPELINE_CHECKPOINT_SQLITE_PATH", "omni_checkpoints.sqlite")
+
+# Checkpoints of failed runs are kept so they can be resumed; only the most
+# recent N are retained. Finished runs are deleted straight away.
+PIPELINE_CHECKPOINT_MAX_RUNS = int(os.getenv("PIPELINE_CHECKPOINT_MAX_RUNS", "1000"))
+
+_OMNI_FIELDS = tuple(f.name for f in fields(OmniState))
+
+# Per-run stage-done hook. The graph is compiled once and shared by all requests,
+# so per-request callbacks travel through a context variable (LangGraph runs
+# nodes in tasks that inherit the caller's context).
+_stage_done_hook: ContextVar[Optional[StageDoneCallback]] = ContextVar(
+    "omni_stage_done_hook", default=None
+)
+
+
+# ---------------------------------------------------------------------------
+# State conversion
+# ---------------------------------------------------------------------------
+
+def to_omni_state(values: Mapping[str, Any]) -> OmniState:
+    """
+    Build an OmniState from graph values. Fields are deep-copied, so node
+    functions can keep mutating state in place without touching checkpoints.
+    """
+    return OmniState(**{k: copy.deepcopy(values[k]) for k in _OMNI_FIELDS if k in values})
+
+
+def from_omni_state(state: OmniState) -> GraphState:
+    return {k: getattr(state, k) for k in _OMNI_FIELDS}  # type: ignore[return-value]
+
+
+def _updates(stage: Stage, before: Mapping[str, Any], state: OmniState) -> Dict[str, Any]:
+    """
+    The partial update a node returns: the declared outputs the stage changed
+    plus the extras keys it added or changed (merged by the `extras` reducer).
+
+    Unchanged outputs are left out, so a skipped stage without a fallback
+    doesn't collide with an alternative stage writing the same fields in the
+    same step (LangGraph allows one write per field per step).
+    """
+    update: Dict[str, Any] = {}
+    for name in stage.outputs:
+        value = getattr(state, name)
+        if name not in before or before[name] != value:
+            update[name] = value
+    old_extras = before.get("extras") or {}
+    changed = {k: v for k, v in state.extras.items() if k not in old_extras or old_extras[k] != v}
+    if changed:
+        update["extras"] = changed
+    return update
+
+
+def _apply_fallback(stage: Stage, state: OmniState) -> None:
+    # Drop anything a speculative run wrote, then let `otherwise` fill in.
+    defaults = OmniState()
+    for name in stage.outputs:
+        setattr(state, name, copy.deepcopy(getattr(defaults, name)))
+    if stage.otherwise is not None:
+        stage.otherwise(state)
+
+
+# ---------------------------------------------------------------------------
+# Nodes
+# ---------------------------------------------------------------------------
+
+def _make_node(stage: Stage, mode: str) -> Callable[[GraphState], Any]:
+    """
+    mode:
+    - "run":         run the stage
+    - "skip":        apply the stage's fallback (`when` was False)
+    - "speculative": run the stage ahead of its gate (if speculate_if allows);
+                     no stage-done event
+    - "gate":        keep the speculative result or fall back, per `when`; runs
+                     the stage if it wasn't speculated
+    """
+
+    async def node(values: GraphState) -> Dict[str, Any]:
+        state = to_omni_state(values)
+        skipped = False
+
+        if mode == "run":
+            await stage.run(state)
+        elif mode == "speculative":
+            if speculates(stage, state):
+                await stage.run(state)
+        elif mode == "skip":
+            skipped = True
+            _apply_fallback(stage, state)
+        else:
+            skipped = stage.when is not None and not stage.when(state)
+            if skipped:
+                _apply_fallback(stage, state)
+            elif not speculates(stage, state):
+                await stage.run(state)
+
+        if mode != "speculative":
+            hook = _stage_done_hook.get()
+            if hook is not None:
+                await hook(stage, state, skipped)
+
+        return _updates(stage, values, state)
+
+    node.__name__ = f"{stage.name}_{mode}"
+    return node
+
+
+async def _noop(values: GraphState) -> Dict[str, Any]:
+    return {}
+
+
+# ---------------------------------------------------------------------------
+# Compilation
+# ---------------------------------------------------------------------------
+
+def _topological_order(stages: Sequence[Stage]) -> List[Stage]:
+    by_name = {s.name: s for s in stages}
+    ordered: List[Stage] = []
+    seen: Set[str] = set()
+
+    def visit(stage: Stage) -> None:
+        if stage.name in seen:
+            return
+        seen.add(stage.name)
+        for dep in stage.needs + stage.after:
+            visit(by_name[dep])
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+def _ancestors(stages: Sequence[Stage]) -> Dict[str, Set[str]]:
+    ancestors: Dict[str, Set[str]] = {}
+    for stage in _topological_order(stages):
+        acc: Set[str] = set()
+        for dep in stage.needs + stage.after:
+            acc.add(dep)
+            acc |= ancestors[dep]
+        ancestors[stage.name] = acc
+    return ancestors
+
+
+def _reduce(deps: Sequence[str], ancestors: Dict[str, Set[str]]) -> List[str]:
+    """
+    Drop dependencies implied by another one (transitive reduction), so each
+    node is only wired to its direct predecessors.
+    """
+    unique = list(dict.fromkeys(deps))
+    return [d for d in unique if not any(d in ancestors[o] for o in unique if o != d)]
+
+
+def compile_stages(
+    stages: Sequence[Stage],
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+):
+    """
+    Compile `stages` into a runnable LangGraph graph over GraphState.
+    """
+    validate_stages(stages)
+    ancestors = _ancestors(stages)
+    ordered = _topological_order(stages)
+
+    preds = {s.name: _reduce(s.needs + s.after, ancestors) for s in ordered}
+    joined = {p for ps in preds.values() if len(ps) > 1 for p in ps}
+    has_successor = {p for ps in preds.values() for p in ps}
+
+    builder = StateGraph(GraphState)
+    # Node(s) whose completion marks a stage as done (a gated stage ends in
+    # either its run node or its skip node).
+    exits: Dict[str, List[str]] = {}
+
+    def connect(deps: Sequence[str], target: str) -> None:
+        if not deps:
+            builder.add_edge(START, target)
+        elif len(deps) == 1:
+            for node_name in exits[deps[0]]:
+                builder.add_edge(node_name, target)
+        else:
+            builder.add_edge([exits[d][0] for d in deps], target)
+
+    def branch(stage: Stage, deps: Sequence[str]) -> None:
+        skip_name = f"{stage.name}__skip"
+
+        def route(values: GraphState) -> str:
+            return stage.name if stage.when(to_omni_state(values)) else skip_name
+
+        # Branch names must be unique per source node
+        route.__name__ = f"route_{stage.name}"
+
+        if not deps:
+            sources = [START]
+        elif len(deps) == 1:
+            sources = exits[deps[0]]
+        else:
+            ready = f"{stage.name}__ready"
+            builder.add_node(ready, _noop)
+            connect(deps, ready)
+            sources = [ready]
+        for source in sources:
+            builder.add_conditional_edges(source, route, [stage.name, skip_name])
+
+    for stage in ordered:
+        deps = preds[stage.name]
+
+        if stage.when is not None and stage.speculative:
+            spec_name = f"{stage.name}__speculative"
+            builder.add_node(spec_name, _make_node(stage, "speculative"))
+            connect(_reduce(stage.needs, ancestors), spec_name)
+            builder.add_node(stage.name, _make_node(stage, "gate"))
+            for dep in deps:
+                if len(exits[dep]) != 1:
+                    raise ValueError(f"Stage {stage.name!r}: cannot join on gated stage {dep!r}.")
+            builder.add_edge([exits[d][0] for d in deps] + [spec_name], stage.name)
+            exits[stage.name] = [stage.name]
+
+        elif stage.when is not None:
+            builder.add_node(stage.name, _make_node(stage, "run"))
+            builder.add_node(f"{stage.name}__skip", _make_node(stage, "skip"))
+            branch(stage, deps)
+            exits[stage.name] = [stage.name, f"{stage.name}__skip"]
+            if stage.name in joined:
+                done = f"{stage.name}__done"
+                builder.add_node(done, _noop)
+                for node_name in exits[stage.name]:
+                    builder.add_edge(node_name, done)
+                exits[stage.name] = [done]
+
+        else:
+            builder.add_node(stage.name, _make_node(stage, "run"))
+            connect(deps, stage.name)
+            exits[stage.name] = [stage.name]
+
+    for stage in ordered:
+        if stage.name not in has_successor:
+            for node_name in exits[stage.name]:
+                builder.add_edge(node_name, END)
+
+    return builder.compile(checkpointer=checkpointer)
+
+
+# ---------------------------------------------------------------------------
+# Checkpointers
+# ---------------------------------------------------------------------------
+
+_memory_saver: Optional[InMemorySaver] = None
+
+# aiosqlite connections belong to one event loop; reopen if the loop changes
+# (e.g. repeated asyncio.run() in scripts).
+_sqlite_saver_task: Optional["asyncio.Task[BaseCheckpointSaver]"] = None
+_sqlite_saver_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Thread ids of failed runs, oldest first (see PIPELINE_CHECKPOINT_MAX_RUNS)
+_retained_runs: "OrderedDict[str, None]" = OrderedDict()
+
+
+async def _aopen_sqlite_saver() -> BaseCheckpointSaver:
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError as e:
+        raise RuntimeError(
+            "PIPELINE_CHECKPOINTER=sqlite requires the langgraph-checkpoint-sqlite package."
+        ) from e
+
+    conn = await aiosqlite.connect(PIPELINE_CHECKPOINT_SQLITE_PATH)
+    saver = AsyncSqliteSaver(conn)
+    await saver.setup()
+    print(f"[GRAPH] SQLite checkpointer at {PIPELINE_CHECKPOINT_SQLITE_PATH}")
+    return saver
+
+
+def _stop_stale_sqlite_saver() -> None:
+    # The previous loop is gone, so the connection can't be closed gracefully;
+    # at least stop its worker thread so it doesn't keep the process alive.
+    task = _sqlite_saver_task
+    if task is None or not task.done() or task.cancelled() or task.exception() is not None:
+        return
+    task.result().conn.stop()
+
+
+async def aget_checkpointer() -> Optional[BaseCheckpointSaver]:
+    """
+    Return the configured checkpointer (None when checkpointing is off).
+    """
+    global _memory_saver, _sqlite_saver_task, _sqlite_saver_loop
+
+    if PIPELINE_CHECKPOINTER in ("", "none", "off", "false"):
+        return None
+
+    if PIPELINE_CHECKPOINTER == "memory":
+        if _memory_saver is None:
+            _memory_saver = InMemorySaver()
+        return _memory_saver
+
+    if PIPELINE_CHECKPOINTER == "sqlite":
+        loop = asyncio.get_running_loop()
+        if _sqlite_saver_task is None or _sqlite_saver_loop is not loop or (
+            _sqlite_saver_task.done()
+            and (_sqlite_saver_task.cancelled() or _sqlite_saver_task.exception() is not None)
+        ):
+            _stop_stale_sqlite_saver()
+            _sqlite_saver_loop = loop
+            _sqlite_saver_task = loop.create_task(_aopen_sqlite_saver())
+        return await asyncio.shield(_sqlite_saver_task)
+
+    raise ValueError(
+        f"Unknown PIPELINE_CHECKPOINTER={PIPELINE_CHECKPOINTER!r} (expected memory, sqlite or none)."
+    )
+
+
+async def aclose_checkpointer() -> None:
+    """
+    Close the SQLite connection, if one was opened on the running loop.
+    """
+    global _sqlite_saver_task, _sqlite_saver_loop
+
+    task = _sqlite_saver_task
+    if task is None or _sqlite_saver_loop is not asyncio.get_running_loop():
+        return
+    _sqlite_saver_task = None
+    _sqlite_saver_loop = None
+    try:
+        saver = await task
+    except Exception:
+        return
+    await saver.conn.close()
+
+
+async def arelease_run(checkpointer: Optional[BaseCheckpointSaver], run_id: str, finished: bool) -> None:
+    """
+    Bookkeeping after a run: drop the checkpoints of finished runs, keep the
+    most recent PIPELINE_CHECKPOINT_MAX_RUNS failed ones for resuming.
+    """
+    if checkpointer is None:
+        return
+
+    if finished:
+        _retained_runs.pop(run_id, None)
+        await checkpointer.adelete_thread(run_id)
+        return
+
+    _retained_runs[run_id] = None
+    _retained_runs.move_to_end(run_id)
+    while len(_retained_runs) > PIPELINE_CHECKPOINT_MAX_RUNS:
+        expired, _ = _retained_runs.popitem(last=False)
+        await checkpointer.adelete_thread(expired)
+
+
+def set_stage_done_hook(hook: Optional[StageDoneCallback]):
+    """
+    Install `hook` for graph runs started from the current context; returns
+    the token for `reset_stage_done_hook`.
+    """
+    return _stage_done_hook.set(hook)
+
+
+def reset_stage_done_hook(token) -> None:
+    _stage_done_hook.reset(token)
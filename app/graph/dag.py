@@ -0,0 +1,150 @@
+# app/graph/dag.py
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.types import OmniState
+
+StageFn = Callable[[OmniState], Awaitable[OmniState]]
+StagePredicate = Callable[[OmniState], bool]
+StageFallback = Callable[[OmniState], OmniState]
+
+# Called after every stage finishes: (stage, state, skipped)
+StageDoneCallback = Callable[["Stage", OmniState, bool], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One node of the pipeline dependency graph.
+
+    - needs: stages whose *outputs* `run` reads; it can't start before them.
+    - after: stages that must finish before we decide whether this stage is
+      wanted at all (`when`). Together with `needs` they order the graph.
+    - when / otherwise: if `when(state)` is False the stage is skipped and
+      `otherwise(state)` fills in its outputs instead.
+    - speculative: start `run` as soon as `needs` are done, in parallel with the
+      `after` stages; keep the result if `when` turns out True, cancel and fall
+      back to `otherwise` if not.
+    - speculate_if: only speculate when this returns True (checked once `needs`
+      are done); otherwise `run` waits for `when` as usual. It must only read
+      state the `after` stages don't change, e.g. the request's profile.
+    - outputs: OmniState fields the stage writes (stages running concurrently
+      must write disjoint fields).
+
+    Stages mutate the shared OmniState in place, like the node functions do.
+    """
+
+    name: str
+    run: StageFn
+    needs: Tuple[str, ...] = ()
+    after: Tuple[str, ...] = ()
+    when: Optional[StagePredicate] = None
+    otherwise: Optional[StageFallback] = None
+    speculative: bool = False
+    speculate_if: Optional[StagePredicate] = None
+    outputs: Tuple[str, ...] = ()
+
+
+def speculates(stage: Stage, state: OmniState) -> bool:
+    """
+    Whether `stage` should start ahead of its `when` gate for this state.
+    """
+    if not stage.speculative or stage.when is None:
+        return False
+    return stage.speculate_if is None or stage.speculate_if(state)
+
+
+def validate_stages(stages: Sequence[Stage]) -> None:
+    """
+    Raise ValueError on unknown dependencies or cycles.
+    """
+    names = {s.name for s in stages}
+    if len(names) != len(stages):
+        raise ValueError("Duplicate stage names in pipeline.")
+
+    deps: Dict[str, Tuple[str, ...]] = {}
+    for stage in stages:
+        unknown = [d for d in stage.needs + stage.after if d not in names]
+        if unknown:
+            raise ValueError(f"Stage {stage.name!r} depends on unknown stages {unknown}.")
+        deps[stage.name] = stage.needs + stage.after
+
+    visiting: set = set()
+    visited: set = set()
+
+    def visit(name: str) -> None:
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline has a dependency cycle through {name!r}.")
+        visiting.add(name)
+        for dep in deps[name]:
+            visit(dep)
+        visiting.discard(name)
+        visited.add(name)
+
+    for stage in stages:
+        visit(stage.name)
+
+
+async def run_dag(
+    stages: Sequence[Stage],
+    state: OmniState,
+    on_stage_done: Optional[StageDoneCallback] = None,
+) -> OmniState:
+    """
+    Run every stage as soon as its dependencies allow, concurrently where the
+    graph permits. If any stage fails, the others are cancelled and the error
+    propagates.
+    """
+    validate_stages(stages)
+    finished: Dict[str, asyncio.Event] = {s.name: asyncio.Event() for s in stages}
+
+    async def wait_for(names: Tuple[str, ...]) -> None:
+        for name in names:
+            await finished[name].wait()
+
+    async def drive(stage: Stage) -> None:
+        speculative: Optional["asyncio.Task[OmniState]"] = None
+        try:
+            if stage.speculative and stage.when is not None:
+                await wait_for(stage.needs)
+                if speculates(stage, state):
+                    speculative = asyncio.create_task(stage.run(state))
+
+            await wait_for(stage.needs + stage.after)
+
+            skipped = stage.when is not None and not stage.when(state)
+            if skipped:
+                if speculative is not None:
+                    speculative.cancel()
+                    await asyncio.gather(speculative, return_exceptions=True)
+                    speculative = None
+                if stage.otherwise is not None:
+                    stage.otherwise(state)
+            elif speculative is not None:
+                await speculative
+            else:
+                await stage.run(state)
+        finally:
+            if speculative is not None and not speculative.done():
+                speculative.cancel()
+
+        if on_stage_done is not None:
+            await on_stage_done(stage, state, skipped)
+        finished[stage.name].set()
+
+    tasks: List["asyncio.Task[None]"] = [asyncio.create_task(drive(s)) for s in stages]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return state
@@ -2,14 +2,31 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import Annotated, Any, Dict, List, Optional, TypedDict
 
 
-class OmniState(TypedDict, total=False):
+def merge_extras(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """
-    Shared state flowing through the LangGraph workflow.
+    LangGraph reducer for `extras`: recursive dict merge, right wins on conflicts.
 
-    Each node reads this and returns partial updates.
+    Lets stages that run in the same step (e.g. planner + speculative
+    researcher) both record metadata without clobbering each other.
+    """
+    merged = dict(left or {})
+    for key, value in (right or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_extras(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class GraphState(TypedDict, total=False):
+    """
+    Shared state flowing through the compiled LangGraph workflow.
+
+    Mirrors app.types.OmniState field for field (nodes convert between the two);
+    each node returns only the fields it wrote.
     """
 
     # Input / context
@@ -26,11 +43,16 @@ class OmniState(TypedDict, total=False):
     draft_answer: str
 
     # Tester output
-    tester_issues: str
-    tester_fixes: str
+    tester_issues: List[str]
+    tester_fixes: List[str]
 
-    # Guardrails (to be fleshed out in Section 7)
-    safety_flags: Dict[str, Any]
+    # Guardrails
+    safety_flags: List[str]
 
     # Finalizer output
     final_answer: str
+
+    # Optional metadata
+    session_id: Optional[str]
+    deadline: Optional[float]
+    extras: Annotated[Dict[str, Any], merge_extras]
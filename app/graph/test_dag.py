@@ -0,0 +1,69 @@
+# app/graph/test_dag.py
+
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+import pytest
+
+from app.graph.compiled import compile_stages, from_omni_state, to_omni_state
+from app.graph.dag import Stage, run_dag
+from app.types import OmniState
+
+
+def _stages(calls: List[str], allow: bool) -> List[Stage]:
+    async def plan(state: OmniState) -> OmniState:
+        calls.append("planner")
+        state.plan = {"needs_research": state.extras.get("wants") == "yes"}
+        return state
+
+    async def research(state: OmniState) -> OmniState:
+        calls.append("researcher")
+        state.research = {"summary": "found"}
+        return state
+
+    return [
+        Stage(name="planner", run=plan, outputs=("plan",)),
+        Stage(
+            name="researcher",
+            run=research,
+            after=("planner",),
+            when=lambda s: bool(s.plan.get("needs_research")),
+            otherwise=lambda s: s,
+            speculative=True,
+            speculate_if=lambda s: allow,
+            outputs=("research",),
+        ),
+    ]
+
+
+async def _run(engine: str, stages: List[Stage], state: OmniState) -> OmniState:
+    if engine == "dag":
+        return await run_dag(stages, state)
+    values = await compile_stages(stages).ainvoke(from_omni_state(state))
+    return to_omni_state(values)
+
+
+@pytest.mark.parametrize("engine", ["dag", "langgraph"])
+def test_declined_speculation_does_not_run_a_skipped_stage(engine: str) -> None:
+    calls: List[str] = []
+    state = asyncio.run(_run(engine, _stages(calls, allow=False), OmniState(extras={"wants": "no"})))
+    assert calls == ["planner"]
+    assert state.research == {}
+
+
+@pytest.mark.parametrize("engine", ["dag", "langgraph"])
+def test_declined_speculation_still_runs_a_wanted_stage(engine: str) -> None:
+    calls: List[str] = []
+    state = asyncio.run(_run(engine, _stages(calls, allow=False), OmniState(extras={"wants": "yes"})))
+    assert calls == ["planner", "researcher"]
+    assert state.research == {"summary": "found"}
+
+
+@pytest.mark.parametrize("engine", ["dag", "langgraph"])
+def test_allowed_speculation_starts_with_the_planner(engine: str) -> None:
+    calls: List[str] = []
+    state = asyncio.run(_run(engine, _stages(calls, allow=True), OmniState(extras={"wants": "yes"})))
+    assert sorted(calls) == ["planner", "researcher"]
+    assert state.research == {"summary": "found"}
@@ -2,48 +2,550 @@
 
 from __future__ import annotations
 
-from typing import List, Dict, Any
+import asyncio
+import os
+from contextvars import ContextVar
+from dataclasses import replace
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from app.types import OmniState
-from app.agents.planner import planner_node
-from app.agents.researcher import researcher_node
-from app.agents.implementer import implementer_node
-from app.agents.tester import tester_node
-from app.agents.finalizer import finalizer_node
+from app.agents.planner import aplanner_node
+from app.agents.researcher import aresearcher_node
+from app.agents.implementer import aimplementer_node
+from app.agents.tester import atester_node
+from app.agents.finalizer import TokenCallback, afinalizer_node
+from app.agents.reviser import areviser_node
+from app.core.deadline import (
+    PipelineDeadlineError,
+    has_time_for,
+    record_skip,
+    remaining_sec,
+    request_deadline,
+)
+from app.core.profiles import profile_for, resolve_profile
+from app.core.timing import (
+    end_trace,
+    reset_current_stage,
+    set_current_stage,
+    span,
+    start_trace,
+)
+from app.agents.precheck import llm_review_skipped, precheck_draft
+from app.graph.compiled import (
+    aclose_checkpointer,
+    aget_checkpointer,
+    arelease_run,
+    compile_stages,
+    from_omni_state,
+    reset_stage_done_hook,
+    set_stage_done_hook,
+    to_omni_state,
+)
+from app.graph.dag import Stage, StageDoneCallback, run_dag
+from app.services.llm_client import LLMDeadlineExceededError
+from app.services.semantic_cache import (
+    SEMANTIC_CACHE_LOOKUP_TIMEOUT_SEC,
+    adrain_pending_stores,
+    alookup_answer,
+    cache_scope,
+    store_answer_in_background,
+)
+from app.utils.ids import new_run_id
 
+# (event_name, payload) callback used to stream pipeline progress, e.g. over SSE
+PipelineEventCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
 
-def run_omni_graph(user_message: str, chat_history: List[Dict[str, Any]]) -> OmniState:
+# "langgraph": the compiled StateGraph with checkpointing / resume (see
+# app.graph.compiled). "dag": the plain asyncio runner in app.graph.dag, which
+# can also cancel speculative stages early but keeps no checkpoints.
+PIPELINE_ENGINE = os.getenv("PIPELINE_ENGINE", "langgraph").strip().lower()
+
+# Stages allowed to start before we know whether they're needed (comma-separated
+# stage names). "researcher" runs retrieval on the raw user message in parallel
+# with the planner and is discarded if the plan says needs_research: false (not
+# started at all under a profile whose research is "never"). On by default only
+# with the "dag" engine: LangGraph can't cancel a discarded speculative run, so
+# the next stage would wait for it even when the plan skips research.
+PIPELINE_SPECULATIVE_STAGES = {
+    name.strip()
+    for name in os.getenv(
+        "PIPELINE_SPECULATIVE_STAGES", "researcher" if PIPELINE_ENGINE == "dag" else ""
+    ).split(",")
+    if name.strip()
+}
+
+# How many times a failed run is resumed in-process from its last checkpoint
+# before the error is returned (callers can still resume later by run id).
+PIPELINE_RESUME_ATTEMPTS = int(os.getenv("PIPELINE_RESUME_ATTEMPTS", "0"))
+
+# How the draft is reviewed (overridable per request via settings["review_mode"]):
+# - "separate": tester LLM call, then finalizer LLM call;
+# - "merged":   one reviser call that reviews and rewrites (app.agents.reviser);
+# - "auto":     merged for "normal" complexity, separate for "complex".
+PIPELINE_REVIEW_MODE = os.getenv("PIPELINE_REVIEW_MODE", "auto").strip().lower()
+
+# Stages degrade on their own as the deadline nears (app.core.deadline); this
+# is only the backstop for a stage that overruns it anyway.
+PIPELINE_DEADLINE_GRACE_SEC = float(os.getenv("PIPELINE_DEADLINE_GRACE_SEC", "2"))
+
+# Finalizer token callback of the current run (the stages are shared by all runs)
+_token_callback: ContextVar[Optional[TokenCallback]] = ContextVar("omni_token_callback", default=None)
+
+
+# ---------------------------------------------------------------------------
+# Branch conditions / fallbacks
+# ---------------------------------------------------------------------------
+
+def _needs_research(state: OmniState) -> bool:
+    research = profile_for(state).research
+    if research != "auto":
+        return research == "always"
+    return bool(state.plan.get("needs_research", False))
+
+
+def _may_need_research(state: OmniState) -> bool:
+    # Speculating is only worth it when the gate could still choose research
+    return profile_for(state).research != "never"
+
+
+def _needs_review(state: OmniState) -> bool:
+    review = profile_for(state).review
+    if review != "auto":
+        return review == "always"
+    # If complexity is simple, skip tester/finalizer
+    return state.plan.get("complexity", "normal") != "simple"
+
+
+def _review_mode(state: OmniState) -> str:
+    settings = state.extras.get("settings") or {}
+    mode = str(
+        settings.get("review_mode") or profile_for(state).review_mode or PIPELINE_REVIEW_MODE
+    ).lower()
+    if mode == "auto":
+        return "merged" if state.plan.get("complexity", "normal") == "normal" else "separate"
+    return mode if mode in ("merged", "separate") else "separate"
+
+
+def _needs_separate_review(state: OmniState) -> bool:
+    return _needs_review(state) and _review_mode(state) == "separate"
+
+
+def _needs_merged_review(state: OmniState) -> bool:
+    return _needs_review(state) and _review_mode(state) == "merged"
+
+
+def _needs_finalize(state: OmniState) -> bool:
+    # Nothing to apply if the tester accepted the draft on its pre-checks
+    return _needs_separate_review(state) and not llm_review_skipped(state)
+
+
+def _skip_research(state: OmniState) -> OmniState:
+    state.research = {
+        "summary": (
+            "Planner decided no external research is needed."
+            if profile_for(state).research == "auto"
+            else f"Research is disabled for the {profile_for(state).name!r} profile."
+        ),
+        "sources": [],
+    }
+    return state
+
+
+def _draft_as_final(state: OmniState) -> OmniState:
+    # The reviser may already have written the final answer
+    if not state.final_answer:
+        state.final_answer = state.draft_answer
+    return state
+
+
+# ---------------------------------------------------------------------------
+# Deadline degradation
+# ---------------------------------------------------------------------------
+
+def _research_out_of_time(state: OmniState) -> OmniState:
+    state.research = {
+        "summary": "Research was skipped to meet the request deadline.",
+        "sources": [],
+    }
+    return state
+
+
+def _review_out_of_time(state: OmniState) -> OmniState:
+    # Keep the deterministic findings; the draft stands as the final answer
+    check = precheck_draft(state)
+    state.tester_issues = list(check.issues)
+    state.tester_fixes = []
+    state.safety_flags = list(check.safety_flags)
+    state.extras["tester"] = {**check.as_extras(), "llm_review": False}
+    return state
+
+
+def _tester_out_of_time(state: OmniState) -> OmniState:
+    record_skip(state, "finalizer", "deadline")
+    return _review_out_of_time(state)
+
+
+def _timed(
+    name: str,
+    run: Callable[[OmniState], Awaitable[OmniState]],
+) -> Callable[[OmniState], Awaitable[OmniState]]:
+    """
+    Record each run of a stage as a "stage" span (see app.core.timing); LLM
+    calls made inside are attributed to the stage.
+    """
+
+    async def timed(state: OmniState) -> OmniState:
+        token = set_current_stage(name)
+        try:
+            with span(name, "stage"):
+                return await run(state)
+        finally:
+            reset_current_stage(token)
+
+    return timed
+
+
+def _degradable(
+    name: str,
+    run: Callable[[OmniState], Awaitable[OmniState]],
+    fallback: Callable[[OmniState], OmniState],
+    calls: int = 1,
+) -> Callable[[OmniState], Awaitable[OmniState]]:
+    """
+    Wrap an optional stage: apply `fallback` instead when fewer than `calls`
+    typical LLM calls (its own and the ones that must follow) still fit before
+    the deadline, or when its LLM call runs out of time.
+    """
+
+    async def degradable(state: OmniState) -> OmniState:
+        if has_time_for(state, calls):
+            try:
+                return await run(state)
+            except LLMDeadlineExceededError as e:
+                print(f"[GRAPH] {name} ran out of time: {e}")
+        record_skip(state, name, "deadline")
+        return fallback(state)
+
+    return degradable
+
+
+# ---------------------------------------------------------------------------
+# Pipeline graph
+# ---------------------------------------------------------------------------
+
+def build_omni_stages() -> List[Stage]:
+    """
+    The OmniAI pipeline as a dependency graph:
+
+                                          ┌──> tester ──┐
+        planner ────┐                     │             ├──> finalizer
+                    ├──> implementer ─────┤             │
+        researcher ─┘                     └──> reviser ─┘
+
+    - researcher is gated on plan["needs_research"];
+    - review is skipped when plan["complexity"] == "simple"; otherwise it is
+      either tester + finalizer or the single merged reviser call (see
+      PIPELINE_REVIEW_MODE);
+    - finalizer is also skipped when the tester's deterministic pre-checks
+      accepted the draft without an LLM review (the draft, or the reviser's
+      answer, becomes final);
+    - researcher, tester / reviser and finalizer are skipped as well when the
+      request's deadline is too close (see _degradable()).
+
+    The researcher only reads the user message, so it has no data dependency on
+    the planner; it is gated on the plan and may run speculatively (see
+    PIPELINE_SPECULATIVE_STAGES), except under profiles that never research.
+    """
+
+    async def finalize(state: OmniState) -> OmniState:
+        return await afinalizer_node(state, on_token=_token_callback.get())
+
+    stages = [
+        Stage(
+            name="planner",
+            run=aplanner_node,
+            outputs=("plan",),
+        ),
+        Stage(
+            name="researcher",
+            run=_degradable("researcher", aresearcher_node, _research_out_of_time),
+            after=("planner",),
+            when=_needs_research,
+            otherwise=_skip_research,
+            speculative="researcher" in PIPELINE_SPECULATIVE_STAGES,
+            speculate_if=_may_need_research,
+            outputs=("research",),
+        ),
+        Stage(
+            name="implementer",
+            run=aimplementer_node,
+            needs=("planner", "researcher"),
+            outputs=("draft_answer",),
+        ),
+        Stage(
+            name="tester",
+            run=_degradable("tester", atester_node, _tester_out_of_time, calls=2),
+            needs=("implementer",),
+            when=_needs_separate_review,
+            outputs=("tester_issues", "tester_fixes", "safety_flags"),
+        ),
+        Stage(
+            name="reviser",
+            run=_degradable("reviser", areviser_node, _review_out_of_time),
+            needs=("implementer",),
+            when=_needs_merged_review,
+            outputs=("tester_issues", "tester_fixes", "safety_flags", "final_answer"),
+        ),
+        Stage(
+            name="finalizer",
+            run=_degradable("finalizer", finalize, _draft_as_final),
+            needs=("tester", "reviser"),
+            when=_needs_finalize,
+            otherwise=_draft_as_final,
+            outputs=("final_answer",),
+        ),
+    ]
+    return [replace(stage, run=_timed(stage.name, stage.run)) for stage in stages]
+
+
+def _stage_event(
+    stage: Stage,
+    state: OmniState,
+    skipped: bool,
+) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Map a finished stage to the (event, payload) streamed to clients.
+    """
+    if stage.name == "planner":
+        return "plan", {"plan": state.plan}
+    if stage.name == "researcher":
+        return "research", {"research": state.research}
+    if stage.name == "implementer":
+        return "draft", {"draft_answer": state.draft_answer}
+    if stage.name in ("tester", "reviser") and not skipped:
+        return "review", {
+            "tester_issues": state.tester_issues,
+            "tester_fixes": state.tester_fixes,
+            "safety_flags": state.safety_flags,
+        }
+    if stage.name == "finalizer":
+        return "final", {"answer": state.final_answer}
+    return None
+
+
+_compiled_graph: Any = None
+_compiled_for: Any = None
+
+
+def _get_compiled_graph(checkpointer: Any) -> Any:
+    global _compiled_graph, _compiled_for
+    if _compiled_graph is None or _compiled_for is not checkpointer:
+        _compiled_graph = compile_stages(build_omni_stages(), checkpointer=checkpointer)
+        _compiled_for = checkpointer
+    return _compiled_graph
+
+
+async def _arun_langgraph(
+    state: OmniState,
+    run_id: str,
+    on_stage_done: Optional[StageDoneCallback],
+) -> OmniState:
+    """
+    Run (or resume) the compiled graph under thread id `run_id`.
+    """
+    checkpointer = await aget_checkpointer()
+    graph = _get_compiled_graph(checkpointer)
+    config = {"configurable": {"thread_id": run_id}}
+    graph_input: Optional[Dict[str, Any]] = dict(from_omni_state(state))
+
+    if checkpointer is not None:
+        snapshot = await graph.aget_state(config)
+        if snapshot.values and snapshot.next and snapshot.values.get("user_message") == state.user_message:
+            print(f"[GRAPH] Resuming run {run_id} before {list(snapshot.next)}")
+            graph_input = None
+            # The resumed run gets this request's deadline, not the failed one's
+            await graph.aupdate_state(config, {"deadline": state.deadline})
+        elif snapshot.values:
+            # Finished, or a different request reusing the id: start over
+            await checkpointer.adelete_thread(run_id)
+
+    hook_token = set_stage_done_hook(on_stage_done)
+    attempt = 0
+    try:
+        while True:
+            try:
+                values = await graph.ainvoke(graph_input, config)
+                break
+            except Exception as e:
+                if checkpointer is None or attempt >= PIPELINE_RESUME_ATTEMPTS:
+                    raise
+                attempt += 1
+                print(
+                    f"[GRAPH] Run {run_id} failed ({e!r}); resuming from last checkpoint "
+                    f"(attempt {attempt}/{PIPELINE_RESUME_ATTEMPTS})"
+                )
+                snapshot = await graph.aget_state(config)
+                graph_input = None if snapshot.values else dict(from_omni_state(state))
+    except BaseException:
+        await arelease_run(checkpointer, run_id, finished=False)
+        raise
+    finally:
+        reset_stage_done_hook(hook_token)
+
+    await arelease_run(checkpointer, run_id, finished=True)
+
+    result = to_omni_state(values)
+    result.extras["run_id"] = run_id
+    return result
+
+
+def _semantic_cache_scope(state: OmniState, settings: Optional[Dict[str, Any]]) -> Optional[str]:
+    settings = settings or {}
+    # Resumed runs must finish; settings["cache"] = False forces a fresh answer
+    if settings.get("cache") is False or settings.get("resume_run_id"):
+        return None
+    return cache_scope(profile_for(state).name, state.chat_history)
+
+
+def _cacheable(state: OmniState) -> bool:
+    # Degraded or flagged answers are not worth repeating to the next user
+    return bool(
+        state.final_answer
+        and not state.safety_flags
+        and not state.extras.get("skipped")
+        and not state.extras.get("shrunk_budgets")
+    )
+
+
+async def arun_omni_graph(
+    user_message: str,
+    chat_history: List[Dict[str, Any]],
+    on_event: Optional[PipelineEventCallback] = None,
+    run_id: Optional[str] = None,
+    settings: Optional[Dict[str, Any]] = None,
+) -> OmniState:
+    """
+    Run the OmniAI pipeline; independent stages run concurrently.
+
+    With the langgraph engine the run is checkpointed under `run_id` (a new id
+    if not given; returned in extras["run_id"]). Calling again with the id of
+    a failed run resumes it from the last completed node instead of starting
+    over.
+
+    `settings` are the caller's per-request settings (ChatRequest.settings),
+    kept in extras["settings"] for the stages to read (e.g. "review_mode").
+    settings["depth"] picks the pipeline profile (app.core.profiles), recorded
+    in extras["profile"]; unknown depths raise ValueError.
+
+    The run has a deadline (the profile's deadline_sec, or
+    settings["timeout_sec"]): optional stages are skipped as it nears, listed
+    in extras["skipped"], and PipelineDeadlineError is raised if no answer
+    could be produced in time.
+
+    With the semantic cache on (app.services.semantic_cache), a paraphrase of
+    an earlier answered message returns that answer without running the
+    pipeline; extras["cache"] describes the hit. settings["cache"] = False
+    bypasses it.
+
+    With settings["timings"] (or PIPELINE_TIMINGS_ENABLED), per-stage and
+    per-call spans are returned in extras["timings"] (app.core.timing).
+
+    If `on_event` is given it is awaited after each stage with one of:
+    - "plan"     {"plan": ...}
+    - "research" {"research": ...}
+    - "draft"    {"draft_answer": ...}
+    - "review"   {"tester_issues": ..., "tester_fixes": ..., "safety_flags": ...}
+    - "token"    {"text": ...}  (finalizer output chunks, as they are generated)
+    - "final"    {"answer": ...}
+    """
+    trace_token = start_trace(bool((settings or {}).get("timings")))
+    try:
+        state = await _arun_pipeline(user_message, chat_history, on_event, run_id, settings)
+    finally:
+        timings = end_trace(trace_token)
+    if timings is not None:
+        state.extras["timings"] = timings
+    return state
+
+
+async def _arun_pipeline(
+    user_message: str,
+    chat_history: List[Dict[str, Any]],
+    on_event: Optional[PipelineEventCallback],
+    run_id: Optional[str],
+    settings: Optional[Dict[str, Any]],
+) -> OmniState:
     state = OmniState(
         user_message=user_message,
         chat_history=chat_history or [],
     )
+    profile = resolve_profile(settings)
+    state.extras["profile"] = profile.name
+    state.deadline = request_deadline(profile, settings)
+    if settings:
+        state.extras["settings"] = dict(settings)
+
+    scope = _semantic_cache_scope(state, settings)
+    vector = None
+    if scope is not None:
+        timeout = SEMANTIC_CACHE_LOOKUP_TIMEOUT_SEC
+        remaining = remaining_sec(state)
+        if remaining is not None:
+            timeout = max(0.0, min(timeout, remaining))
+        hit, vector = await alookup_answer(user_message, scope, timeout=timeout)
+        if hit is not None:
+            print(f"[CACHE] Hit ({hit.source}, similarity {hit.similarity:.3f}): {hit.message!r}")
+            state.final_answer = hit.answer
+            state.extras["cache"] = hit.as_extras()
+            if on_event is not None:
+                await on_event("final", {"answer": hit.answer})
+            return state
+
+    on_token: Optional[TokenCallback] = None
+    on_stage_done = None
 
-    # 1) Planner
-    state = planner_node(state)
-    complexity = state.plan.get("complexity", "normal")
-    needs_research = bool(state.plan.get("needs_research", False))
+    if on_event is not None:
 
-    # 2) Researcher (stubbed or real)
-    if needs_research:
-        state = researcher_node(state)
+        async def on_token(text: str) -> None:
+            await on_event("token", {"text": text})
+
+        async def on_stage_done(stage: Stage, state: OmniState, skipped: bool) -> None:
+            event = _stage_event(stage, state, skipped)
+            if event is not None:
+                await on_event(*event)
+
+    if PIPELINE_ENGINE == "dag":
+        run = run_dag(build_omni_stages(), state, on_stage_done)
     else:
-        state.research = {
-            "summary": "Planner decided no external research is needed.",
-            "sources": [],
-        }
+        run = _arun_langgraph(state, run_id or new_run_id(), on_stage_done)
 
-    # 3) Implementer
-    state = implementer_node(state)
+    token = _token_callback.set(on_token)
+    try:
+        result = await asyncio.wait_for(run, timeout=remaining_sec(state) + PIPELINE_DEADLINE_GRACE_SEC)
+    except (asyncio.TimeoutError, LLMDeadlineExceededError) as e:
+        raise PipelineDeadlineError(
+            f"No answer within the request deadline ({profile.name!r} profile): {e or 'timed out'}"
+        ) from e
+    finally:
+        _token_callback.reset(token)
 
-    # For now, if complexity is simple, skip tester/finalizer
-    if complexity == "simple":
-        state.final_answer = state.draft_answer
-        return state
+    if vector is not None and _cacheable(result):
+        store_answer_in_background(vector, scope, user_message, result.final_answer)
+    return result
 
-    # 4) Tester
-    state = tester_node(state)
 
-    # 5) Finalizer
-    state = finalizer_node(state)
+def run_omni_graph(user_message: str, chat_history: List[Dict[str, Any]]) -> OmniState:
+    """
+    Blocking wrapper around arun_omni_graph() for scripts and sync callers.
 
-    return state
+    Must not be called from inside a running event loop.
+    """
+
+    async def run() -> OmniState:
+        try:
+            return await arun_omni_graph(user_message=user_message, chat_history=chat_history)
+        finally:
+            await adrain_pending_stores()
+            await aclose_checkpointer()
+
+    return asyncio.run(run())
@@ -2,11 +2,48 @@
 
 from __future__ import annotations
 
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import get_settings
-from app.routers import health, chat
+from app.core.metrics import MetricsMiddleware
+from app.graph.compiled import aclose_checkpointer
+from app.rag.qdrant_client import aclose_qdrant_clients, warm_up_qdrant_clients
+from app.routers import health, chat, metrics
+from app.services.llm_client import aclose_llm_backend, warm_up_llm_backend
+from app.services.semantic_cache import adrain_pending_stores
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Startup / shutdown hooks.
+
+    - Warm up the LLM backend (Space client pool) in the background, so the
+      first requests don't pay the handshake but a slow/down Space doesn't
+      block startup.
+    - Create the shared Qdrant clients and open their connections the same way.
+    - On shutdown, let pending semantic-cache writes finish, then close backend
+      connections, the Qdrant clients and the pipeline checkpointer.
+    """
+    warm_up_tasks = [
+        asyncio.create_task(asyncio.to_thread(warm_up_llm_backend)),
+        asyncio.create_task(warm_up_qdrant_clients()),
+    ]
+    try:
+        yield
+    finally:
+        for task in warm_up_tasks:
+            if not task.done():
+                task.cancel()
+        await adrain_pending_stores()
+        await aclose_llm_backend()
+        await aclose_qdrant_clients()
+        await aclose_checkpointer()
 
 
 def create_app() -> FastAPI:
@@ -15,6 +52,7 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title="OmniAI Backend",
         version="0.1.0",
+        lifespan=lifespan,
     )
 
     # CORS: allow your frontend origin(s) – can tighten later
@@ -25,8 +63,11 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    # Added last so it wraps CORS too and times the whole request
+    app.add_middleware(MetricsMiddleware)
 
     app.include_router(health.router, tags=["health"])
+    app.include_router(metrics.router, tags=["health"])
     app.include_router(chat.router, tags=["chat"])
 
     return app
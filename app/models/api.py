@@ -16,7 +16,7 @@ class ChatRequest(BaseModel):
     session_id: Optional[str] = None
     message: str
     chat_history: Optional[List[ChatMessage]] = None
-    settings: Optional[Dict[str, Any]] = None  # e.g. show_agent_breakdown, depth
+    settings: Optional[Dict[str, Any]] = None  # e.g. show_agent_breakdown, depth (fast|balanced|thorough), review_mode, resume_run_id, timeout_sec, cache, timings
 
 
 class AgentBreakdown(BaseModel):
@@ -33,3 +33,27 @@ class ChatResponse(BaseModel):
     answer: str
     agent_breakdown: Optional[AgentBreakdown] = None
     latency_ms: Optional[float] = None
+    run_id: Optional[str] = None  # pass back as settings["resume_run_id"] to resume a failed run
+    skipped_stages: Dict[str, str] = {}  # stage -> reason, e.g. {"tester": "deadline"}
+    degraded: bool = False  # stages skipped or token budgets shrunk to meet the deadline
+    cached: bool = False  # answer served from the semantic cache (no pipeline run)
+    timings: Optional[Dict[str, Any]] = None  # per-stage / per-call spans when settings["timings"] is set
+
+
+class ChatBatchRequest(BaseModel):
+    requests: List[ChatRequest]
+    concurrency: Optional[int] = None  # pipelines run at once; default/cap CHAT_BATCH_MAX_CONCURRENCY
+    stream: bool = False  # NDJSON lines as items finish instead of one ordered list
+
+
+class ChatBatchItem(BaseModel):
+    index: int  # position in ChatBatchRequest.requests
+    status: int = 200  # HTTP status the item would have had on /chat
+    response: Optional[ChatResponse] = None
+    error: Optional[str] = None
+    run_id: Optional[str] = None  # also set on failures, for resume_run_id
+
+
+class ChatBatchResponse(BaseModel):
+    results: List[ChatBatchItem] = []  # same order as the requests
+    latency_ms: Optional[float] = None
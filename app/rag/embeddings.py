@@ -1,15 +1,55 @@
 # app/rag/embeddings.py
 
+import asyncio
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
 from functools import lru_cache
-from typing import List
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
+try:
+    import fcntl
+except ImportError:  # Windows: the disk tier is then only safe for one process
+    fcntl = None  # type: ignore[assignment]
+
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from app.core.metrics import SIZE_BUCKETS, histogram, register_collector
+from app.core.timing import annotate, span
+
 # Default to MiniLM; can be overridden via env
 DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", DEFAULT_EMBEDDING_MODEL)
 
+# Cross-request batching: embed_texts() calls from concurrent requests are
+# queued and encoded together on one worker thread, flushed when
+# EMBED_BATCH_MAX_SIZE texts are queued or EMBED_BATCH_MAX_WAIT_MS has passed.
+EMBED_BATCH_ENABLED = os.getenv("EMBED_BATCH_ENABLED", "true").lower() == "true"
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+
+# Query-embedding cache (embed_query): in-memory LRU capped in bytes, plus an
+# optional persistent tier in a memory-mapped file under EMBED_CACHE_DISK_DIR.
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+EMBED_CACHE_DISK_DIR = os.getenv("EMBED_CACHE_DISK_DIR", "")
+EMBED_CACHE_DISK_ENTRIES = int(os.getenv("EMBED_CACHE_DISK_ENTRIES", "100000"))
+
+_EMBED_BATCH_SIZE = histogram(
+    "omni_embedding_batch_size",
+    "Texts per model forward pass (batched across requests).",
+    buckets=SIZE_BUCKETS,
+)
+_EMBED_LATENCY = histogram(
+    "omni_embedding_duration_seconds",
+    "Latency of one model forward pass.",
+)
+
 
 @lru_cache(maxsize=1)
 def get_embedding_model() -> SentenceTransformer:
@@ -21,15 +61,9 @@ def get_embedding_model() -> SentenceTransformer:
     return SentenceTransformer(EMBEDDING_MODEL_NAME)
 
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
-    """
-    Embed a list of strings into dense vectors.
-    Returns a list of lists (plain Python floats) for easy JSON serialization.
-    """
-    if not texts:
-        return []
-
+def _encode(texts: List[str]) -> np.ndarray:
     model = get_embedding_model()
+    t0 = time.perf_counter()
     embeddings = model.encode(
         texts,
         batch_size=32,
@@ -37,4 +71,535 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
         convert_to_numpy=True,
         normalize_embeddings=True,  # recommended for cosine similarity
     )
+    _EMBED_LATENCY.observe(time.perf_counter() - t0)
+    _EMBED_BATCH_SIZE.observe(len(texts))
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+# ---------------------------------------------------------------------------
+# Cross-request batching
+# ---------------------------------------------------------------------------
+
+class _EmbedItem:
+    """
+    One caller's texts; the future resolves to their (len(texts), dim) rows.
+    Large calls are encoded chunk by chunk: `done` texts so far, in `parts`.
+    """
+
+    __slots__ = ("texts", "future", "done", "parts")
+
+    def __init__(self, texts: List[str]) -> None:
+        self.texts = texts
+        self.future: Future = Future()
+        self.done = 0
+        self.parts: List[np.ndarray] = []
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent embedding requests into batched model calls.
+
+    A daemon worker thread takes the first queued call, then keeps collecting
+    calls until `max_batch_size` texts are queued or `max_wait_ms` has passed,
+    runs the batch through the model and resolves each caller's Future with
+    its rows. Calls of `max_batch_size` texts or more (ingestion) are encoded
+    one `max_batch_size` chunk at a time, and queued small calls (queries) go
+    first between chunks, so they never wait behind a whole bulk call. With
+    batching enabled the model only ever runs on this thread, so concurrent
+    requests don't contend for the CPU with separate forward passes.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch_size: int,
+        max_wait_ms: float,
+    ) -> None:
+        self._encode = encode
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_sec = max(0.0, max_wait_ms) / 1000.0
+        self._cond = threading.Condition()
+        self._pending: "deque[_EmbedItem]" = deque()
+        self._bulk: "deque[_EmbedItem]" = deque()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        A Future resolving to the float32 vectors of `texts`, one row each.
+        """
+        self._ensure_worker()
+        item = _EmbedItem(texts)
+        with self._cond:
+            if len(texts) >= self.max_batch_size:
+                self._bulk.append(item)
+            else:
+                self._pending.append(item)
+            self._cond.notify()
+        return item.future
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name="embedding-batcher",
+                    daemon=True,
+                )
+                self._worker.start()
+
+    def _collect(self) -> List[_EmbedItem]:
+        """
+        The next batch of small calls; [] if only bulk work is waiting.
+        """
+        with self._cond:
+            while not self._pending and not self._bulk:
+                self._cond.wait()
+
+            batch: List[_EmbedItem] = []
+            size = 0
+            deadline = time.monotonic() + self.max_wait_sec
+            while self._pending or batch:
+                while self._pending and size + len(self._pending[0].texts) <= self.max_batch_size:
+                    item = self._pending.popleft()
+                    # Drop requests whose caller already gave up
+                    if item.future.set_running_or_notify_cancel():
+                        batch.append(item)
+                        size += len(item.texts)
+                remaining = deadline - time.monotonic()
+                if size >= self.max_batch_size or self._pending or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return batch
+
+    def _count(self, texts: int) -> None:
+        with self._lock:
+            self.batches += 1
+            self.items += texts
+
+    def _run_batch(self, batch: List[_EmbedItem]) -> None:
+        texts = [text for item in batch for text in item.texts]
+        self._count(len(texts))
+        try:
+            vectors = self._encode(texts)
+        except BaseException as e:
+            for item in batch:
+                item.future.set_exception(e)
+            return
+
+        start = 0
+        for item in batch:
+            stop = start + len(item.texts)
+            item.future.set_result(vectors[start:stop])
+            start = stop
+
+    def _run_bulk_chunk(self) -> None:
+        with self._cond:
+            if not self._bulk:
+                return
+            item = self._bulk[0]
+            if item.done == 0 and not item.future.set_running_or_notify_cancel():
+                self._bulk.popleft()
+                return
+
+        chunk = item.texts[item.done : item.done + self.max_batch_size]
+        self._count(len(chunk))
+        try:
+            vectors = self._encode(chunk)
+        except BaseException as e:
+            with self._cond:
+                self._bulk.popleft()
+            item.future.set_exception(e)
+            return
+
+        item.parts.append(vectors)
+        item.done += len(chunk)
+        if item.done == len(item.texts):
+            with self._cond:
+                self._bulk.popleft()
+            item.future.set_result(np.concatenate(item.parts))
+            item.parts = []
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch:
+                self._run_batch(batch)
+            else:
+                self._run_bulk_chunk()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = sum(len(item.texts) for item in self._pending) + sum(
+                len(item.texts) - item.done for item in self._bulk
+            )
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": (self.items / self.batches) if self.batches else 0.0,
+                "queued": queued,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_sec * 1000.0,
+            }
+
+
+_batcher = EmbeddingBatcher(_encode, EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_WAIT_MS)
+
+
+def get_embedding_batching_stats() -> Dict[str, Any]:
+    """
+    Number of batched model calls and their average size.
+    """
+    stats = _batcher.stats()
+    stats["enabled"] = EMBED_BATCH_ENABLED
+    return stats
+
+
+def _embed_array(texts: List[str]) -> np.ndarray:
+    if EMBED_BATCH_ENABLED:
+        annotate(batched=True)
+        return _batcher.submit(texts).result()
+    return _encode(texts)
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """
+    Embed a list of strings into dense vectors.
+    Returns a list of lists (plain Python floats) for easy JSON serialization.
+
+    Calls are batched with concurrent ones from other requests (see
+    EmbeddingBatcher); this blocks until the batch has run.
+    """
+    if not texts:
+        return []
+
+    with span("embed_texts", "embedding", texts=len(texts), chars=sum(len(t) for t in texts)):
+        embeddings = _embed_array(texts)
     return embeddings.tolist()
+
+
+async def _aembed_array(texts: List[str]) -> np.ndarray:
+    if EMBED_BATCH_ENABLED:
+        annotate(batched=True)
+        return await asyncio.wrap_future(_batcher.submit(texts))
+    return await asyncio.to_thread(_encode, texts)
+
+
+async def aembed_texts(texts: List[str]) -> List[List[float]]:
+    """
+    Async embed_texts(): awaits the batcher's future instead of blocking a
+    thread.
+    """
+    if not texts:
+        return []
+
+    with span("embed_texts", "embedding", texts=len(texts), chars=sum(len(t) for t in texts)):
+        embeddings = await _aembed_array(texts)
+    return embeddings.tolist()
+
+
+# ---------------------------------------------------------------------------
+# Query-embedding cache
+# ---------------------------------------------------------------------------
+
+def _normalize_query(text: str) -> str:
+    return " ".join(text.split())
+
+
+class QueryEmbeddingCache:
+    """
+    LRU of normalized query text -> float32 vector, bounded by `max_bytes`
+    (vector bytes + key bytes). Cached vectors are read-only and shared.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_bytes(key: str, vector: np.ndarray) -> int:
+        return vector.nbytes + len(key.encode("utf-8"))
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def set(self, key: str, vector: np.ndarray) -> None:
+        size = self._entry_bytes(key, vector)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= self._entry_bytes(key, old)
+            self._data[key] = vector
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                old_key, old_vector = self._data.popitem(last=False)
+                self.bytes -= self._entry_bytes(old_key, old_vector)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+class DiskEmbeddingTier:
+    """
+    Persistent query embeddings in two memory-mapped .npy files: a hash table
+    of 64-bit key hashes (0 = empty slot) and the matching float32 rows.
+
+    Slots are found by linear probing from hash % capacity; when a probe run
+    is full the home slot is overwritten. The files are named after the model,
+    so switching EMBEDDING_MODEL_NAME starts a fresh table. Rows are written
+    before their key, so a crash never pairs a key with a half-written vector;
+    the OS writes the shared mappings back, also after the process exits.
+
+    Several processes (uvicorn workers) may share the directory: the files are
+    created under temporary names and renamed into place, and every access
+    holds an fcntl lock on <prefix>.lock (exclusive for creation and writes,
+    shared for reads), so no worker truncates another's table or reads a slot
+    mid-write.
+    """
+
+    PROBES = 8
+
+    def __init__(self, directory: str, capacity: int, model_name: str) -> None:
+        self.directory = directory
+        self.capacity = max(1, capacity)
+        self.prefix = os.path.join(
+            directory, "query_embeddings-" + hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:12]
+        )
+        self._keys: Optional[np.ndarray] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self._lock_fd: Optional[int] = None
+        self.hits = 0
+        self.writes = 0
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """
+        Cross-process lock on the table; callers hold self._lock.
+        """
+        if fcntl is None:
+            yield
+            return
+        if self._lock_fd is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._lock_fd = os.open(self.prefix + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        h = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        return h or 1
+
+    def _open(self, dim: Optional[int]) -> bool:
+        """
+        Map the files (creating them once the vector size is known, which
+        callers only ask for under the exclusive file lock).
+        """
+        if self._keys is not None:
+            return True
+        keys_path, vectors_path = self.prefix + ".keys.npy", self.prefix + ".vectors.npy"
+        if os.path.exists(keys_path) and os.path.exists(vectors_path):
+            self._keys = np.load(keys_path, mmap_mode="r+")
+            self._vectors = np.load(vectors_path, mmap_mode="r+")
+            self.capacity = self._keys.shape[0]
+            return True
+        if dim is None:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f".{os.getpid()}.tmp"
+        vectors = np.lib.format.open_memmap(
+            vectors_path + tmp, mode="w+", dtype=np.float32, shape=(self.capacity, dim)
+        )
+        keys = np.lib.format.open_memmap(
+            keys_path + tmp, mode="w+", dtype=np.uint64, shape=(self.capacity,)
+        )
+        vectors.flush()
+        keys.flush()
+        # Keys last: other processes only open the table once both files exist
+        os.replace(vectors_path + tmp, vectors_path)
+        os.replace(keys_path + tmp, keys_path)
+        self._vectors, self._keys = vectors, keys
+        return True
+
+    def _probe(self, h: int) -> List[int]:
+        home = h % self.capacity
+        return [(home + i) % self.capacity for i in range(min(self.PROBES, self.capacity))]
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        h = self._hash(key)
+        with self._lock, self._file_lock(exclusive=False):
+            if not self._open(None):
+                return None
+            for slot in self._probe(h):
+                stored = int(self._keys[slot])
+                if stored == h:
+                    self.hits += 1
+                    return np.array(self._vectors[slot], dtype=np.float32)
+                if stored == 0:
+                    return None
+        return None
+
+    def set(self, key: str, vector: np.ndarray) -> None:
+        h = self._hash(key)
+        with self._lock, self._file_lock(exclusive=True):
+            if not self._open(vector.shape[0]) or self._vectors.shape[1] != vector.shape[0]:
+                return
+            slots = self._probe(h)
+            target = next((s for s in slots if int(self._keys[s]) in (0, h)), slots[0])
+            self._keys[target] = 0
+            self._vectors[target] = vector
+            self._keys[target] = h
+            self.writes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            used = int(np.count_nonzero(self._keys)) if self._keys is not None else 0
+            return {
+                "path": self.prefix,
+                "capacity": self.capacity,
+                "entries": used,
+                "hits": self.hits,
+                "writes": self.writes,
+            }
+
+
+_query_cache = QueryEmbeddingCache(EMBED_CACHE_MAX_BYTES)
+_disk_tier: Optional[DiskEmbeddingTier] = (
+    DiskEmbeddingTier(EMBED_CACHE_DISK_DIR, EMBED_CACHE_DISK_ENTRIES, EMBEDDING_MODEL_NAME)
+    if EMBED_CACHE_DISK_DIR
+    else None
+)
+
+
+def _cached_query_vector(key: str) -> Optional[np.ndarray]:
+    vector = _query_cache.get(key)
+    if vector is not None:
+        annotate(query_cache="hit")
+        return vector
+    if _disk_tier is None:
+        return None
+
+    try:
+        vector = _disk_tier.get(key)
+    except Exception as e:
+        print(f"[EMBED] Disk cache read failed: {e!r}")
+        return None
+    if vector is not None:
+        vector.setflags(write=False)
+        _query_cache.set(key, vector)
+        annotate(query_cache="disk")
+    return vector
+
+
+def _store_query_vector(key: str, row: np.ndarray) -> np.ndarray:
+    # Own copy: a batched row is a view that would keep the whole batch alive
+    vector = np.array(row, dtype=np.float32)
+    vector.setflags(write=False)
+    _query_cache.set(key, vector)
+    if _disk_tier is not None:
+        try:
+            _disk_tier.set(key, vector)
+        except Exception as e:
+            print(f"[EMBED] Disk cache write failed: {e!r}")
+    return vector
+
+
+def embed_query(text: str) -> np.ndarray:
+    """
+    Normalized float32 embedding of a search query / user message, served
+    from the query cache when the (whitespace-normalized) text was seen
+    before. The returned array is shared: don't modify it.
+
+    Documents (ingestion) should keep using embed_texts().
+    """
+    key = _normalize_query(text)
+    vector = _cached_query_vector(key) if EMBED_CACHE_ENABLED else None
+    if vector is not None:
+        return vector
+
+    with span("embed_texts", "embedding", texts=1, chars=len(key)):
+        row = _embed_array([key])[0]
+    return _store_query_vector(key, row) if EMBED_CACHE_ENABLED else row
+
+
+async def aembed_query(text: str) -> np.ndarray:
+    """
+    Async embed_query(): a cache miss awaits the embedding batcher.
+    """
+    key = _normalize_query(text)
+    vector = _cached_query_vector(key) if EMBED_CACHE_ENABLED else None
+    if vector is not None:
+        return vector
+
+    with span("embed_texts", "embedding", texts=1, chars=len(key)):
+        row = (await _aembed_array([key]))[0]
+    return _store_query_vector(key, row) if EMBED_CACHE_ENABLED else row
+
+
+def get_query_embedding_cache_stats() -> Dict[str, Any]:
+    stats = _query_cache.stats()
+    stats["enabled"] = EMBED_CACHE_ENABLED
+    stats["disk"] = _disk_tier.stats() if _disk_tier is not None else None
+    return stats
+
+
+def clear_query_embedding_cache() -> None:
+    """
+    Clear the in-memory tier (the disk tier is left alone).
+    """
+    _query_cache.clear()
+
+
+def _collect_metrics() -> Any:
+    stats = _query_cache.stats()
+    for event in ("hits", "misses", "evictions"):
+        yield "omni_query_embedding_cache_events_total", {"event": event}, stats[event]
+    if _disk_tier is not None:
+        yield "omni_query_embedding_cache_events_total", {"event": "disk_hits"}, _disk_tier.hits
+
+
+register_collector(
+    "omni_query_embedding_cache_events_total",
+    "counter",
+    "Query-embedding cache hits, misses and evictions (memory), and disk-tier hits.",
+    _collect_metrics,
+)
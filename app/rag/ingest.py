@@ -9,6 +9,7 @@ from typing import Any, Dict, List, Optional, Union
 from qdrant_client.models import PointStruct
 
 from .embeddings import embed_texts
+from .local_store import get_local_store, use_local_store
 from .qdrant_client import get_qdrant_client, GENERAL_COLLECTION, PERSONAL_COLLECTION
 
 
@@ -92,10 +93,13 @@ def upsert_documents(
     if not docs:
         return 0
 
-    client = get_qdrant_client()
     collection = collection_name or GENERAL_COLLECTION
-
     points = _build_points(docs)
+
+    if use_local_store():
+        return get_local_store().upsert(collection, points)
+
+    client = get_qdrant_client()
     client.upsert(
         collection_name=collection,
         points=points,
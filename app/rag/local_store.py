@@ -0,0 +1,367 @@
+# app/rag/local_store.py
+
+"""
+In-process vector store: an offline replacement for Qdrant (CI, air-gapped
+staging, small deployments). Selected with VECTOR_STORE_BACKEND=local;
+search_collection(), asearch_collection(), upsert_documents() and
+ensure_collections_exist() then use it instead of the Qdrant clients.
+
+Each collection lives in LOCAL_VECTOR_STORE_DIR as:
+
+- <name>.vectors.npy   memory-mapped (capacity, dim) float32, or int8 with
+                       LOCAL_VECTOR_STORE_DTYPE=int8 (4x smaller)
+- <name>.scales.npy    per-row dequantization scales (int8 only)
+- <name>.points.jsonl  append-only {"row", "id", "payload"} log; the last
+                       line for a row wins
+
+Search is a vectorized brute-force dot product (vectors are normalized, so
+that is the cosine score) over blocks of rows, with np.argpartition for the
+top-k. Filters: a dict {"metadata.source": "faq"} (a list value matches any
+of its items) or a qdrant Filter whose `must` holds MatchValue / MatchAny
+conditions. Hits are returned as qdrant ScoredPoints, so callers don't care
+which backend answered.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from qdrant_client import models as qmodels
+
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "qdrant").strip().lower()
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", "./data/vector_store")
+LOCAL_VECTOR_STORE_DTYPE = os.getenv("LOCAL_VECTOR_STORE_DTYPE", "float32").strip().lower()
+
+# Rows scored per matrix product: small enough that an int8 block's float32
+# copy stays in cache, large enough to amortize the per-product overhead
+_BLOCK_ROWS = 4096
+_INITIAL_CAPACITY = 1024
+
+PointId = Union[str, int]
+LocalFilter = Union[Dict[str, Any], qmodels.Filter]
+
+
+def use_local_store() -> bool:
+    return VECTOR_STORE_BACKEND == "local"
+
+
+def _payload_value(payload: Dict[str, Any], key: str) -> Any:
+    value: Any = payload
+    for part in key.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _conditions(qfilter: LocalFilter) -> Dict[str, List[Any]]:
+    """
+    {payload key: accepted values} for a dict or qdrant Filter.
+    """
+    if isinstance(qfilter, dict):
+        return {
+            key: list(value) if isinstance(value, (list, tuple, set)) else [value]
+            for key, value in qfilter.items()
+        }
+
+    if qfilter.should or qfilter.must_not or qfilter.min_should:
+        raise ValueError("Local vector store filters support `must` conditions only.")
+    must = qfilter.must or []
+    if not isinstance(must, list):
+        must = [must]
+
+    conditions: Dict[str, List[Any]] = {}
+    for cond in must:
+        match = getattr(cond, "match", None)
+        if isinstance(match, qmodels.MatchValue):
+            conditions[cond.key] = [match.value]
+        elif isinstance(match, qmodels.MatchAny):
+            conditions[cond.key] = list(match.any)
+        else:
+            raise ValueError(f"Unsupported filter condition for the local vector store: {cond!r}")
+    return conditions
+
+
+def _matches(payload: Dict[str, Any], conditions: Dict[str, List[Any]]) -> bool:
+    for key, accepted in conditions.items():
+        value = _payload_value(payload, key)
+        values = value if isinstance(value, list) else [value]
+        if not any(v in accepted for v in values):
+            return False
+    return True
+
+
+class LocalCollection:
+    """
+    One collection: memory-mapped vectors plus an in-memory id/payload index
+    rebuilt from the points log on open. Writes take a lock; searches read a
+    consistent (rows, arrays) snapshot without one: the vectors and their
+    scales are always replaced together, as one tuple.
+    """
+
+    def __init__(self, directory: str, name: str, dtype: str = "float32") -> None:
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"LOCAL_VECTOR_STORE_DTYPE must be float32 or int8, got {dtype!r}.")
+        self.name = name
+        self.dtype = dtype
+        self._prefix = os.path.join(directory, name)
+        self._lock = threading.Lock()
+        # (vectors, scales); scales is None for float32
+        self._arrays: Tuple[Optional[np.ndarray], Optional[np.ndarray]] = (None, None)
+        self._rows = 0
+        self._ids: List[PointId] = []
+        self._payloads: List[Dict[str, Any]] = []
+        self._row_of: Dict[PointId, int] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def _vectors(self) -> Optional[np.ndarray]:
+        return self._arrays[0]
+
+    @property
+    def _scales(self) -> Optional[np.ndarray]:
+        return self._arrays[1]
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._vectors.shape[1] if self._vectors is not None else None
+
+    def __len__(self) -> int:
+        return self._rows
+
+    # -- storage ----------------------------------------------------------
+
+    def _path(self, suffix: str) -> str:
+        return f"{self._prefix}.{suffix}"
+
+    def _load(self) -> None:
+        if not os.path.exists(self._path("vectors.npy")):
+            return
+        vectors = np.load(self._path("vectors.npy"), mmap_mode="r+")
+        if vectors.dtype != np.dtype(self.dtype):
+            raise ValueError(
+                f"Collection {self.name!r} is stored as {vectors.dtype}, "
+                f"but LOCAL_VECTOR_STORE_DTYPE is {self.dtype}."
+            )
+        scales = np.load(self._path("scales.npy"), mmap_mode="r+") if self.dtype == "int8" else None
+        self._arrays = (vectors, scales)
+
+        if os.path.exists(self._path("points.jsonl")):
+            with open(self._path("points.jsonl"), encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash: its vector is orphaned
+                        continue
+                    self._set_row(record["row"], record["id"], record.get("payload") or {})
+
+    def _set_row(self, row: int, point_id: PointId, payload: Dict[str, Any]) -> None:
+        while len(self._ids) <= row:
+            self._ids.append("")
+            self._payloads.append({})
+        self._ids[row] = point_id
+        self._payloads[row] = payload
+        self._row_of[point_id] = row
+        self._rows = max(self._rows, row + 1)
+
+    def _allocate(
+        self,
+        suffix: str,
+        shape: Sequence[int],
+        dtype: Any,
+        old: Optional[np.ndarray],
+    ) -> np.ndarray:
+        """
+        (Re)create a memory-mapped array, copying `old` into it; the new file
+        replaces the old one atomically.
+        """
+        path = self._path(suffix)
+        tmp = path + ".tmp"
+        arr = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=tuple(shape))
+        if old is not None:
+            arr[: old.shape[0]] = old
+        arr.flush()
+        os.replace(tmp, path)
+        return arr
+
+    def _ensure_capacity(self, rows: int, dim: int) -> None:
+        if self._vectors is not None:
+            if self._vectors.shape[1] != dim:
+                raise ValueError(
+                    f"Collection {self.name!r} holds {self._vectors.shape[1]}-dim vectors, got {dim}."
+                )
+            if rows <= self._vectors.shape[0]:
+                return
+        current = self._vectors.shape[0] if self._vectors is not None else 0
+        capacity = max(_INITIAL_CAPACITY, rows, 2 * current)
+        vectors = self._allocate("vectors.npy", (capacity, dim), self.dtype, self._vectors)
+        scales = None
+        if self.dtype == "int8":
+            scales = self._allocate("scales.npy", (capacity,), np.float32, self._scales)
+        # Publish both at once, so a search never pairs new vectors with old scales
+        self._arrays = (vectors, scales)
+
+    # -- writes -----------------------------------------------------------
+
+    def create(self, dim: int) -> None:
+        with self._lock:
+            self._ensure_capacity(self._rows, dim)
+
+    def upsert(self, points: Sequence[qmodels.PointStruct]) -> int:
+        if not points:
+            return 0
+        # A repeated id within the batch: the last point wins, as in Qdrant
+        points = list({p.id: p for p in points}.values())
+        vectors = np.asarray([p.vector for p in points], dtype=np.float32)
+
+        with self._lock:
+            rows: List[int] = []
+            next_row = self._rows
+            for p in points:
+                row = self._row_of.get(p.id)
+                if row is None:
+                    row, next_row = next_row, next_row + 1
+                rows.append(row)
+            self._ensure_capacity(next_row, vectors.shape[1])
+
+            index = np.asarray(rows)
+            if self.dtype == "int8":
+                scales = np.abs(vectors).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                self._vectors[index] = np.round(vectors / scales[:, None]).astype(np.int8)
+                self._scales[index] = scales
+                self._scales.flush()
+            else:
+                self._vectors[index] = vectors
+            self._vectors.flush()
+
+            # Vectors first: a crash before the log line leaves an unused row
+            with open(self._path("points.jsonl"), "a", encoding="utf-8") as f:
+                for row, p in zip(rows, points):
+                    payload = p.payload or {}
+                    f.write(json.dumps({"row": row, "id": p.id, "payload": payload}, ensure_ascii=False) + "\n")
+                    self._set_row(row, p.id, payload)
+        return len(points)
+
+    # -- search -----------------------------------------------------------
+
+    def search(
+        self,
+        query_vector: Sequence[float],
+        limit: int = 5,
+        qfilter: Optional[LocalFilter] = None,
+    ) -> List[qmodels.ScoredPoint]:
+        rows = self._rows
+        vectors, scales = self._arrays
+        if rows == 0 or vectors is None or limit <= 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        if query.shape[0] != vectors.shape[1]:
+            raise ValueError(
+                f"Query has {query.shape[0]} dims, collection {self.name!r} has {vectors.shape[1]}."
+            )
+
+        scores = np.empty(rows, dtype=np.float32)
+        for start in range(0, rows, _BLOCK_ROWS):
+            stop = min(rows, start + _BLOCK_ROWS)
+            block = vectors[start:stop]
+            if scales is not None:
+                scores[start:stop] = (block.astype(np.float32) @ query) * scales[start:stop]
+            else:
+                scores[start:stop] = block @ query
+
+        if qfilter:
+            conditions = _conditions(qfilter)
+            mask = np.fromiter(
+                (_matches(payload, conditions) for payload in self._payloads[:rows]),
+                dtype=bool,
+                count=rows,
+            )
+            candidates = np.flatnonzero(mask)
+            if candidates.size == 0:
+                return []
+            scores = scores[candidates]
+        else:
+            candidates = None
+
+        k = min(limit, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        rows_hit = candidates[top] if candidates is not None else top
+
+        return [
+            qmodels.ScoredPoint(
+                id=self._ids[row],
+                version=0,
+                score=float(score),
+                payload=self._payloads[row],
+            )
+            for row, score in zip(rows_hit.tolist(), scores[top].tolist())
+        ]
+
+
+class LocalVectorStore:
+    """
+    Collections under one directory, opened on first use.
+    """
+
+    def __init__(self, directory: str, dtype: str = "float32") -> None:
+        self.directory = directory
+        self.dtype = dtype
+        self._collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name: str) -> LocalCollection:
+        col = self._collections.get(name)
+        if col is None:
+            with self._lock:
+                col = self._collections.get(name)
+                if col is None:
+                    col = LocalCollection(self.directory, name, self.dtype)
+                    self._collections[name] = col
+        return col
+
+    def collection_exists(self, name: str) -> bool:
+        return name in self._collections or os.path.exists(
+            os.path.join(self.directory, f"{name}.vectors.npy")
+        )
+
+    def create_collection(self, name: str, dim: int) -> None:
+        self.collection(name).create(dim)
+
+    def search(
+        self,
+        name: str,
+        query_vector: Sequence[float],
+        limit: int = 5,
+        qfilter: Optional[LocalFilter] = None,
+    ) -> List[qmodels.ScoredPoint]:
+        return self.collection(name).search(query_vector, limit, qfilter)
+
+    def upsert(self, name: str, points: Sequence[qmodels.PointStruct]) -> int:
+        return self.collection(name).upsert(points)
+
+
+_store: Optional[LocalVectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_local_store() -> LocalVectorStore:
+    """
+    The process-wide store in LOCAL_VECTOR_STORE_DIR.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LocalVectorStore(LOCAL_VECTOR_STORE_DIR, LOCAL_VECTOR_STORE_DTYPE)
+    return _store
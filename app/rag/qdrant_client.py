@@ -1,44 +1,158 @@
 # app/rag/qdrant_client.py
 
+"""
+Process-wide Qdrant clients.
+
+One QdrantClient (blocking: ingestion, semantic cache, run_rag) and one
+AsyncQdrantClient (the researcher's concurrent searches) are shared by the
+whole process, so requests reuse pooled keep-alive connections instead of
+paying connection setup and TLS on every search. The app creates them at
+startup (warm_up_qdrant_clients() in the FastAPI lifespan) and closes them on
+shutdown; outside the app they are created on first use.
+
+QDRANT_PREFER_GRPC=true switches both clients to gRPC (QDRANT_GRPC_PORT).
+"""
+
+from __future__ import annotations
+
+import asyncio
 import os
-from typing import List
+import threading
+from typing import Any, Dict, List, Optional
 
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.models import VectorParams, Distance
 
+from app.core.metrics import histogram
+from app.rag.local_store import get_local_store, use_local_store
+
 # Environment variables (must be set in .env / Render)
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 
+# Connection options of the shared clients
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_TIMEOUT_SEC = int(os.getenv("QDRANT_TIMEOUT_SEC", "10"))
+# Max pooled connections per client (REST) / channels (gRPC)
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "16"))
+
 GENERAL_COLLECTION = os.getenv("QDRANT_GENERAL_COLLECTION", "general_docs")
 PERSONAL_COLLECTION = os.getenv("QDRANT_PERSONAL_COLLECTION", "personal_knowledge")
 
 # Must match embedding model dimension (all-MiniLM-L6-v2 -> 384 dims)
 EMBEDDING_DIM = 384
 
+# Observed by every Qdrant call site (search, semantic cache query/upsert)
+QDRANT_LATENCY = histogram(
+    "omni_qdrant_request_duration_seconds",
+    "Qdrant request latency per operation and collection.",
+    ("operation", "collection"),
+)
+
+
+_client: Optional[QdrantClient] = None
+_async_client: Optional[AsyncQdrantClient] = None
+_client_lock = threading.Lock()
+
+
+def _client_kwargs() -> Dict[str, Any]:
+    if not QDRANT_URL or not QDRANT_API_KEY:
+        raise RuntimeError("QDRANT_URL and QDRANT_API_KEY must be set as environment variables.")
+
+    return {
+        "url": QDRANT_URL,
+        "api_key": QDRANT_API_KEY,
+        "prefer_grpc": QDRANT_PREFER_GRPC,
+        "grpc_port": QDRANT_GRPC_PORT,
+        "timeout": QDRANT_TIMEOUT_SEC,
+        "pool_size": QDRANT_POOL_SIZE,
+    }
+
 
 def get_qdrant_client() -> QdrantClient:
     """
-    Create a Qdrant client for Cloud cluster.
+    The shared (thread-safe) Qdrant client for the Cloud cluster.
     """
-    if not QDRANT_URL or not QDRANT_API_KEY:
-        raise RuntimeError("QDRANT_URL and QDRANT_API_KEY must be set as environment variables.")
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = QdrantClient(**_client_kwargs())
+    return _client
+
+
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    """
+    The shared async Qdrant client. Use it from the app's event loop only
+    (its connections belong to that loop).
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncQdrantClient(**_client_kwargs())
+    return _async_client
+
+
+def retrieval_configured() -> bool:
+    """
+    Whether searches have somewhere to go: the local store, or Qdrant credentials.
+    """
+    return use_local_store() or bool(QDRANT_URL and QDRANT_API_KEY)
+
+
+async def warm_up_qdrant_clients() -> bool:
+    """
+    Create both clients and open their first connection (startup hook).
+    Returns False, without raising, if Qdrant isn't configured or reachable.
+    """
+    if use_local_store():
+        return False
+    if not retrieval_configured():
+        print("[QDRANT] QDRANT_URL / QDRANT_API_KEY not set; skipping client warm-up")
+        return False
+    try:
+        # Construction checks server compatibility, which blocks
+        client = await asyncio.to_thread(get_qdrant_client)
+        await asyncio.to_thread(client.get_collections)
+        await get_async_qdrant_client().get_collections()
+    except Exception as e:
+        print(f"[QDRANT] Warm-up failed (clients connect on first use): {e!r}")
+        return False
+    print(f"[QDRANT] Clients ready ({'gRPC' if QDRANT_PREFER_GRPC else 'REST'})")
+    return True
 
-    return QdrantClient(
-        url=QDRANT_URL,
-        api_key=QDRANT_API_KEY,
-    )
+
+async def aclose_qdrant_clients() -> None:
+    """
+    Close the shared clients (shutdown hook); they are re-created on next use.
+    """
+    global _client, _async_client
+    with _client_lock:
+        client, async_client = _client, _async_client
+        _client = _async_client = None
+    if async_client is not None:
+        await async_client.close()
+    if client is not None:
+        client.close()
 
 
 def ensure_collections_exist(collection_names: List[str] | None = None) -> None:
     """
     Ensure that required collections exist with the correct vector configuration.
     """
-    client = get_qdrant_client()
-
     if collection_names is None:
         collection_names = [GENERAL_COLLECTION, PERSONAL_COLLECTION]
 
+    if use_local_store():
+        store = get_local_store()
+        for name in collection_names:
+            store.create_collection(name, EMBEDDING_DIM)
+        return
+
+    client = get_qdrant_client()
+
     for name in collection_names:
         if not client.collection_exists(name):
             client.create_collection(
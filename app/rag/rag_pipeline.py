@@ -2,18 +2,45 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, TypedDict
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
 
 from qdrant_client.models import Filter  # for future filters
 from qdrant_client import models as qmodels
 
-from .embeddings import embed_texts
+from app.core.timing import annotate, span
+
+from .embeddings import aembed_query, embed_query
+from .local_store import get_local_store, use_local_store
 from .qdrant_client import (
+    get_async_qdrant_client,
     get_qdrant_client,
     GENERAL_COLLECTION,
     PERSONAL_COLLECTION,
+    QDRANT_LATENCY,
+    retrieval_configured,
 )
 
+# Per-collection search timeout on the async path: a slow collection is dropped
+# from the result instead of stalling the research stage.
+RAG_COLLECTION_TIMEOUT_SEC = float(os.getenv("RAG_COLLECTION_TIMEOUT_SEC", "2.0"))
+
+
+class RetrievalUnavailableError(RuntimeError):
+    """
+    Neither Qdrant nor the local store is configured.
+    """
+
+
+def _require_retrieval() -> None:
+    # Checked before embedding, so an unconfigured deployment never loads the model
+    if not retrieval_configured():
+        raise RetrievalUnavailableError(
+            "Set QDRANT_URL and QDRANT_API_KEY, or VECTOR_STORE_BACKEND=local."
+        )
+
 
 class RetrievedSource(TypedDict, total=False):
     id: str
@@ -27,6 +54,7 @@ class RagResult(TypedDict):
     research_summary: str
     sources: List[RetrievedSource]
     raw_context: str
+    failed_collections: Dict[str, str]  # collection -> "timeout" | error (async path)
 
 
 def search_collection(
@@ -36,57 +64,98 @@ def search_collection(
     qfilter: Optional[Filter] = None,
 ) -> List[qmodels.ScoredPoint]:
     """
-    Low-level wrapper around Qdrant search.
+    Low-level wrapper around Qdrant search (or the local store, see
+    app.rag.local_store).
     """
+    if use_local_store():
+        return _search_local(collection_name, query_vector, limit, qfilter)
+
     client = get_qdrant_client()
 
-    results = client.search(
-        collection_name=collection_name,
-        query_vector=query_vector,
-        query_filter=qfilter,
-        limit=limit,
-        with_payload=True,
-        with_vectors=False,
-    )
+    t0 = time.perf_counter()
+    with span("search_collection", "qdrant", collection=collection_name, limit=limit):
+        results = client.query_points(
+            collection_name=collection_name,
+            query=query_vector,
+            query_filter=qfilter,
+            limit=limit,
+            with_payload=True,
+            with_vectors=False,
+        ).points
+        annotate(hits=len(results))
+    QDRANT_LATENCY.labels("search", collection_name).observe(time.perf_counter() - t0)
     return results
 
 
-def run_rag(
-    query: str,
-    plan: Optional[Dict[str, Any]] = None,
-    top_k: int = 5,
-    include_personal: bool = True,
-) -> RagResult:
-    """
-    High-level RAG helper used by the Researcher agent later.
+def _search_local(
+    collection_name: str,
+    query_vector: List[float],
+    limit: int,
+    qfilter: Optional[Filter],
+) -> List[qmodels.ScoredPoint]:
+    t0 = time.perf_counter()
+    with span("search_collection", "local_store", collection=collection_name, limit=limit):
+        results = get_local_store().search(collection_name, query_vector, limit, qfilter)
+        annotate(hits=len(results))
+    QDRANT_LATENCY.labels("local_search", collection_name).observe(time.perf_counter() - t0)
+    return results
 
-    - Embeds the query.
-    - Searches general_docs (+ personal_knowledge if enabled).
-    - Builds a simple research_summary and structured sources list.
 
-    `plan` is currently unused, but later you can:
-      - read plan["domains"] or plan["constraints"] to build Qdrant filters.
+async def asearch_collection(
+    collection_name: str,
+    query_vector: List[float],
+    limit: int = 5,
+    qfilter: Optional[Filter] = None,
+    timeout: Optional[float] = None,
+) -> List[qmodels.ScoredPoint]:
     """
-    # 1) Embed query
-    query_vec = embed_texts([query])[0]
+    search_collection() on the shared async client. Raises asyncio.TimeoutError
+    after `timeout` seconds; the request is cancelled then.
+
+    Local store searches run in a worker thread (the scan releases the GIL).
+    """
+    if use_local_store():
+        return await asyncio.wait_for(
+            asyncio.to_thread(_search_local, collection_name, query_vector, limit, qfilter),
+            timeout=timeout,
+        )
+
+    client = get_async_qdrant_client()
+
+    t0 = time.perf_counter()
+    with span("search_collection", "qdrant", collection=collection_name, limit=limit):
+        response = await asyncio.wait_for(
+            client.query_points(
+                collection_name=collection_name,
+                query=query_vector,
+                query_filter=qfilter,
+                limit=limit,
+                with_payload=True,
+                with_vectors=False,
+            ),
+            timeout=timeout,
+        )
+        annotate(hits=len(response.points))
+    QDRANT_LATENCY.labels("search", collection_name).observe(time.perf_counter() - t0)
+    return response.points
 
-    # 2) Query collections
-    hits_general = search_collection(GENERAL_COLLECTION, query_vec, limit=top_k)
 
-    hits_personal: List[qmodels.ScoredPoint] = []
+def _collections(include_personal: bool) -> List[str]:
     if include_personal:
-        hits_personal = search_collection(PERSONAL_COLLECTION, query_vec, limit=top_k)
+        return [GENERAL_COLLECTION, PERSONAL_COLLECTION]
+    return [GENERAL_COLLECTION]
 
-    # 3) Combine results and sort by score (Qdrant returns higher score = closer)
-    all_hits: List[tuple[str, qmodels.ScoredPoint]] = [
-        (GENERAL_COLLECTION, h) for h in hits_general
-    ] + [
-        (PERSONAL_COLLECTION, h) for h in hits_personal
-    ]
 
-    all_hits.sort(key=lambda t: (t[1].score or 0.0), reverse=True)
+def _build_rag_result(
+    all_hits: List[Tuple[str, qmodels.ScoredPoint]],
+    failed_collections: Optional[Dict[str, str]] = None,
+) -> RagResult:
+    """
+    Merge hits from all collections (best score first) into a RagResult.
+    """
+    # Qdrant returns higher score = closer
+    all_hits = sorted(all_hits, key=lambda t: (t[1].score or 0.0), reverse=True)
 
-    # 4) Build sources + raw_context
     sources: List[RetrievedSource] = []
     context_chunks: List[str] = []
 
@@ -113,9 +182,9 @@ def run_rag(
 
     raw_context = "\n\n".join(context_chunks)
 
-    # 5) Lightweight "summary" – this is intentionally simple.
-    #    The Researcher / Implementer agents will do deeper summarization
-    #    by reading raw_context + sources with the LLM.
+    # Lightweight "summary" – this is intentionally simple.
+    # The Researcher / Implementer agents will do deeper summarization
+    # by reading raw_context + sources with the LLM.
     if not context_chunks:
         research_summary = "No relevant documents were retrieved from the knowledge base."
     else:
@@ -128,4 +197,80 @@ def run_rag(
         research_summary=research_summary,
         sources=sources,
         raw_context=raw_context,
+        failed_collections=dict(failed_collections or {}),
+    )
+
+
+def run_rag(
+    query: str,
+    plan: Optional[Dict[str, Any]] = None,
+    top_k: int = 5,
+    include_personal: bool = True,
+) -> RagResult:
+    """
+    Blocking RAG helper (scripts, ingestion checks); the Researcher agent uses
+    arun_rag().
+
+    - Embeds the query.
+    - Searches general_docs (+ personal_knowledge if enabled), one after the other.
+    - Builds a simple research_summary and structured sources list.
+
+    `plan` is currently unused, but later you can:
+      - read plan["domains"] or plan["constraints"] to build Qdrant filters.
+    """
+    _require_retrieval()
+    query_vec = embed_query(query).tolist()
+
+    all_hits: List[Tuple[str, qmodels.ScoredPoint]] = []
+    for collection_name in _collections(include_personal):
+        hits = search_collection(collection_name, query_vec, limit=top_k)
+        all_hits += [(collection_name, h) for h in hits]
+
+    return _build_rag_result(all_hits)
+
+
+async def arun_rag(
+    query: str,
+    plan: Optional[Dict[str, Any]] = None,
+    top_k: int = 5,
+    include_personal: bool = True,
+    timeout: Optional[float] = None,
+) -> RagResult:
+    """
+    Async run_rag(): the query is embedded and the collections are searched
+    concurrently, all within `timeout` seconds (default
+    RAG_COLLECTION_TIMEOUT_SEC).
+
+    A collection that times out or fails is left out and recorded in
+    failed_collections; the result is built from the others. Raises
+    RetrievalUnavailableError if no vector store is configured, and
+    asyncio.TimeoutError (or the embedding error) if the query can't be
+    embedded in time.
+    """
+    _require_retrieval()
+    timeout = RAG_COLLECTION_TIMEOUT_SEC if timeout is None else timeout
+    t0 = time.monotonic()
+    query_vec = (await asyncio.wait_for(aembed_query(query), timeout=timeout)).tolist()
+    search_timeout = max(0.0, timeout - (time.monotonic() - t0))
+
+    collections = _collections(include_personal)
+    results = await asyncio.gather(
+        *(
+            asearch_collection(name, query_vec, limit=top_k, timeout=search_timeout)
+            for name in collections
+        ),
+        return_exceptions=True,
     )
+
+    all_hits: List[Tuple[str, qmodels.ScoredPoint]] = []
+    failed: Dict[str, str] = {}
+    for name, result in zip(collections, results):
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        if isinstance(result, BaseException):
+            failed[name] = "timeout" if isinstance(result, asyncio.TimeoutError) else repr(result)
+            print(f"[RAG] Search on {name} failed: {failed[name]}")
+            continue
+        all_hits += [(name, h) for h in result]
+
+    return _build_rag_result(all_hits, failed)
@@ -0,0 +1,126 @@
+# app/rag/test_local_store.py
+
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+import pytest
+from qdrant_client import models as qmodels
+
+from app.rag.local_store import LocalCollection, LocalVectorStore
+
+
+def _unit(*values: float) -> list:
+    v = np.asarray(values, dtype=np.float32)
+    return (v / np.linalg.norm(v)).tolist()
+
+
+def _point(point_id, vector, **payload) -> qmodels.PointStruct:
+    return qmodels.PointStruct(id=point_id, vector=vector, payload=payload)
+
+
+@pytest.fixture(params=["float32", "int8"])
+def collection(request: pytest.FixtureRequest, tmp_path) -> LocalCollection:
+    col = LocalCollection(str(tmp_path), "docs", request.param)
+    col.upsert(
+        [
+            _point(1, _unit(1, 0, 0), text="x", metadata={"source": "faq"}),
+            _point(2, _unit(0, 1, 0), text="y", metadata={"source": "blog"}),
+            _point(3, _unit(1, 1, 0), text="xy", metadata={"source": "faq"}),
+        ]
+    )
+    return col
+
+
+def test_search_orders_by_cosine_score(collection: LocalCollection) -> None:
+    hits = collection.search(_unit(1, 0.1, 0), limit=2)
+    assert [h.id for h in hits] == [1, 3]
+    assert hits[0].score == pytest.approx(0.995, abs=0.01)
+    assert hits[0].payload["text"] == "x"
+
+
+def test_dict_and_qdrant_filters(collection: LocalCollection) -> None:
+    hits = collection.search(_unit(0, 1, 0), limit=5, qfilter={"metadata.source": "faq"})
+    assert [h.id for h in hits] == [3, 1]
+
+    qfilter = qmodels.Filter(
+        must=[
+            qmodels.FieldCondition(key="metadata.source", match=qmodels.MatchAny(any=["blog"])),
+        ]
+    )
+    assert [h.id for h in collection.search(_unit(1, 0, 0), limit=5, qfilter=qfilter)] == [2]
+    assert collection.search(_unit(1, 0, 0), qfilter={"metadata.source": "none"}) == []
+
+
+def test_upsert_replaces_an_existing_id(collection: LocalCollection) -> None:
+    collection.upsert([_point(2, _unit(0, 0, 1), text="z")])
+    assert len(collection) == 3
+    hits = collection.search(_unit(0, 0, 1), limit=1)
+    assert hits[0].id == 2 and hits[0].payload == {"text": "z"}
+
+
+def test_duplicate_ids_in_one_batch_keep_the_last_point(tmp_path) -> None:
+    col = LocalCollection(str(tmp_path), "docs")
+    written = col.upsert(
+        [
+            _point("a", _unit(1, 0), text="old"),
+            _point("b", _unit(0, 1), text="b"),
+            _point("a", _unit(1, 1), text="new"),
+        ]
+    )
+    assert written == 2
+    assert len(col) == 2
+
+    hits = col.search(_unit(1, 0), limit=5)
+    assert [h.id for h in hits] == ["a", "b"]
+    assert hits[0].payload == {"text": "new"}
+    assert hits[0].score == pytest.approx(_unit(1, 1)[0], abs=1e-5)
+
+    reopened = LocalCollection(str(tmp_path), "docs")
+    assert len(reopened) == 2
+    assert [h.payload["text"] for h in reopened.search(_unit(1, 0), limit=5)] == ["new", "b"]
+
+
+def test_collection_survives_reopen_and_grows(tmp_path) -> None:
+    store = LocalVectorStore(str(tmp_path), "int8")
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(1500, 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    store.upsert("docs", [_point(i, v.tolist(), n=i) for i, v in enumerate(vectors)])
+
+    reopened = LocalVectorStore(str(tmp_path), "int8")
+    assert reopened.collection_exists("docs")
+    hits = reopened.search("docs", vectors[1234].tolist(), limit=3)
+    assert hits[0].id == 1234 and hits[0].payload == {"n": 1234}
+    assert hits[0].score == pytest.approx(1.0, abs=0.02)
+
+    with pytest.raises(ValueError):
+        LocalVectorStore(str(tmp_path), "float32").collection("docs")
+
+
+def test_search_during_growth_sees_matching_vectors_and_scales(tmp_path) -> None:
+    col = LocalCollection(str(tmp_path), "docs", "int8")
+    probe = _unit(1, 2, 3)
+    col.upsert([_point(0, probe)])
+    stop = threading.Event()
+    scores: list = []
+
+    def search() -> None:
+        while not stop.is_set():
+            scores.append(col.search(probe, limit=1)[0].score)
+
+    reader = threading.Thread(target=search)
+    reader.start()
+    try:
+        rng = np.random.default_rng(1)
+        for start in range(1, 5000, 500):
+            batch = rng.normal(size=(500, 3))
+            batch /= np.linalg.norm(batch, axis=1, keepdims=True)
+            col.upsert([_point(start + i, v.tolist()) for i, v in enumerate(batch)])
+    finally:
+        stop.set()
+        reader.join()
+    vectors, scales = col._arrays
+    assert vectors.shape[0] == scales.shape[0] >= 5000
+    assert scores and all(s == pytest.approx(1.0, abs=0.02) for s in scores)
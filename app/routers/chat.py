@@ -2,17 +2,36 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
+import os
 import time
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
-from app.graph.workflow import run_omni_graph
-from app.models.api import ChatRequest, ChatResponse, AgentBreakdown, ChatMessage
+from app.core.deadline import PipelineDeadlineError, request_deadline
+from app.core.profiles import resolve_profile
+from app.graph.workflow import arun_omni_graph
+from app.models.api import (
+    AgentBreakdown,
+    ChatBatchItem,
+    ChatBatchRequest,
+    ChatBatchResponse,
+    ChatMessage,
+    ChatRequest,
+    ChatResponse,
+)
 from app.types import OmniState
+from app.utils.ids import new_run_id
 
 router = APIRouter()
 
+# /chat/batch: pipelines run at once per batch (default and cap), and batch size
+CHAT_BATCH_MAX_CONCURRENCY = int(os.getenv("CHAT_BATCH_MAX_CONCURRENCY", "8"))
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "1000"))
+
 
 def _convert_history_to_internal(history: List[ChatMessage] | None) -> List[Dict[str, Any]]:
     if not history:
@@ -20,26 +39,56 @@ def _convert_history_to_internal(history: List[ChatMessage] | None) -> List[Dict
     return [msg.model_dump() for msg in history]
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(payload: ChatRequest) -> ChatResponse:
+def _run_id_for(payload: ChatRequest) -> str:
     """
-    Main OmniAI chat endpoint.
+    Resume the given run if the caller passes settings["resume_run_id"]
+    (the run_id of a failed request), otherwise start a new one.
+    """
+    resume_run_id = (payload.settings or {}).get("resume_run_id")
+    if isinstance(resume_run_id, str) and resume_run_id.strip():
+        return resume_run_id.strip()
+    return new_run_id()
+
+
+def _validate_settings(payload: ChatRequest) -> None:
+    try:
+        request_deadline(resolve_profile(payload.settings), payload.settings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _run_chat(payload: ChatRequest, run_id: str) -> ChatResponse:
+    """
+    Run one /chat request; failures are raised as HTTPException.
     """
     if not payload.message or not payload.message.strip():
         raise HTTPException(status_code=400, detail="Message must not be empty.")
+    _validate_settings(payload)
 
     user_message = payload.message.strip()
     chat_history = _convert_history_to_internal(payload.chat_history)
 
     t0 = time.time()
     try:
-        state: OmniState = run_omni_graph(
+        state: OmniState = await arun_omni_graph(
             user_message=user_message,
             chat_history=chat_history,
+            run_id=run_id,
+            settings=payload.settings,
+        )
+    except PipelineDeadlineError as e:
+        raise HTTPException(
+            status_code=504,
+            detail=str(e),
+            headers={"X-Omni-Run-Id": run_id},
         )
     except Exception as e:
         # You can add more structured logging here later
-        raise HTTPException(status_code=500, detail=f"Internal error in OmniAI pipeline: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal error in OmniAI pipeline: {e}",
+            headers={"X-Omni-Run-Id": run_id},
+        )
 
     latency_ms = (time.time() - t0) * 1000.0
 
@@ -53,9 +102,177 @@ async def chat_endpoint(payload: ChatRequest) -> ChatResponse:
         safety_flags=state.safety_flags or [],
     )
 
+    skipped_stages = state.extras.get("skipped") or {}
+
     return ChatResponse(
         session_id=payload.session_id,
         answer=state.final_answer or state.draft_answer or "",
         agent_breakdown=breakdown,
         latency_ms=latency_ms,
+        run_id=state.extras.get("run_id"),
+        skipped_stages=skipped_stages,
+        degraded=bool(skipped_stages or state.extras.get("shrunk_budgets")),
+        cached=bool(state.extras.get("cache", {}).get("hit")),
+        timings=state.extras.get("timings"),
+    )
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(payload: ChatRequest) -> ChatResponse:
+    """
+    Main OmniAI chat endpoint.
+    """
+    return await _run_chat(payload, _run_id_for(payload))
+
+
+async def _run_batch_item(
+    index: int,
+    payload: ChatRequest,
+    semaphore: asyncio.Semaphore,
+) -> ChatBatchItem:
+    run_id = _run_id_for(payload)
+    async with semaphore:
+        try:
+            response = await _run_chat(payload, run_id)
+        except HTTPException as e:
+            return ChatBatchItem(index=index, status=e.status_code, error=str(e.detail), run_id=run_id)
+    return ChatBatchItem(index=index, response=response, run_id=run_id)
+
+
+@router.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch_endpoint(payload: ChatBatchRequest):
+    """
+    Run many /chat requests in one call, at most `concurrency` pipelines at a
+    time (for eval runs, bulk FAQ answering, ...).
+
+    Items share the process-wide LLM connections, completion cache, request
+    coalescing and semantic cache, so repeated prompts across the batch are
+    answered once. A failing item doesn't fail the batch: it comes back with
+    the status /chat would have returned and an error.
+
+    - stream=false: one ChatBatchResponse, results in request order.
+    - stream=true: NDJSON, one ChatBatchItem per line as items finish (use
+      `index` to match them up). Disconnecting cancels the remaining items.
+    """
+    if not payload.requests:
+        raise HTTPException(status_code=400, detail="requests must not be empty.")
+    if len(payload.requests) > CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {CHAT_BATCH_MAX_ITEMS} requests per batch.",
+        )
+    concurrency = payload.concurrency if payload.concurrency is not None else CHAT_BATCH_MAX_CONCURRENCY
+    if concurrency < 1:
+        raise HTTPException(status_code=400, detail="concurrency must be at least 1.")
+    semaphore = asyncio.Semaphore(min(concurrency, CHAT_BATCH_MAX_CONCURRENCY))
+
+    if not payload.stream:
+        t0 = time.time()
+        results = await asyncio.gather(
+            *(_run_batch_item(i, req, semaphore) for i, req in enumerate(payload.requests))
+        )
+        return ChatBatchResponse(results=list(results), latency_ms=(time.time() - t0) * 1000.0)
+
+    async def item_stream() -> AsyncIterator[str]:
+        tasks = [
+            asyncio.create_task(_run_batch_item(i, req, semaphore))
+            for i, req in enumerate(payload.requests)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                yield item.model_dump_json() + "\n"
+        finally:
+            # Client went away: don't run the rest of the batch for nobody
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(
+        item_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(payload: ChatRequest) -> StreamingResponse:
+    """
+    Streaming variant of /chat using Server-Sent Events.
+
+    Emits one event per pipeline stage as soon as it completes
+    (plan, research, draft, review, final), "token" events with finalizer output
+    chunks while it is being generated, then a closing "done" event with latency
+    and the stages skipped to meet the deadline. Pipeline failures are reported
+    as an "error" event carrying the run_id to resume with.
+    """
+    if not payload.message or not payload.message.strip():
+        raise HTTPException(status_code=400, detail="Message must not be empty.")
+    _validate_settings(payload)
+
+    user_message = payload.message.strip()
+    chat_history = _convert_history_to_internal(payload.chat_history)
+    run_id = _run_id_for(payload)
+
+    queue: "asyncio.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = asyncio.Queue()
+
+    async def on_event(event: str, data: Dict[str, Any]) -> None:
+        await queue.put((event, data))
+
+    async def run_pipeline() -> None:
+        t0 = time.time()
+        try:
+            state = await arun_omni_graph(
+                user_message=user_message,
+                chat_history=chat_history,
+                on_event=on_event,
+                run_id=run_id,
+                settings=payload.settings,
+            )
+            skipped_stages = state.extras.get("skipped") or {}
+            await queue.put(
+                (
+                    "done",
+                    {
+                        "session_id": payload.session_id,
+                        "run_id": run_id,
+                        "latency_ms": (time.time() - t0) * 1000.0,
+                        "skipped_stages": skipped_stages,
+                        "degraded": bool(skipped_stages or state.extras.get("shrunk_budgets")),
+                        "cached": bool(state.extras.get("cache", {}).get("hit")),
+                        "timings": state.extras.get("timings"),
+                    },
+                )
+            )
+        except PipelineDeadlineError as e:
+            await queue.put(("error", {"detail": str(e), "run_id": run_id, "status": 504}))
+        except Exception as e:
+            await queue.put(
+                ("error", {"detail": f"Internal error in OmniAI pipeline: {e}", "run_id": run_id})
+            )
+        finally:
+            await queue.put(None)
+
+    async def event_stream() -> AsyncIterator[str]:
+        task = asyncio.create_task(run_pipeline())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                event, data = item
+                yield _sse_event(event, data)
+        finally:
+            # Client went away: stop the pipeline instead of finishing it for nobody
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
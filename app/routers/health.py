@@ -5,6 +5,7 @@ from __future__ import annotations
 from fastapi import APIRouter
 
 from app.core.config import get_settings
+from app.services.llm_client import get_circuit_breaker_state
 
 router = APIRouter()
 
@@ -16,4 +17,5 @@ async def health_check():
         "status": "ok",
         "env": settings.ENV,
         "debug": settings.DEBUG,
+        "llm_circuit_breaker": get_circuit_breaker_state(),
     }
@@ -0,0 +1,18 @@
+# app/routers/metrics.py
+
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """
+    Prometheus scrape endpoint (text exposition format 0.0.4).
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,249 @@
+# app/services/gradio_pool.py
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from gradio_client import Client
+
+
+# Errors that suggest the client's connection itself is broken (as opposed to the
+# Space returning an error), so the client should be thrown away and rebuilt.
+_BROKEN_CLIENT_ERRORS = (httpx.RequestError, ConnectionError, OSError)
+
+
+class PooledClient:
+    """
+    One slot in the pool: a (lazily created) gradio Client plus its bookkeeping.
+    """
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.client: Optional[Client] = None
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.total_calls = 0
+        self.replacements = 0
+
+
+class GradioClientPool:
+    """
+    Bounded pool of gradio_client.Client instances for one Space.
+
+    - `size` clients, each allowed at most `per_client_concurrency` jobs in flight.
+      Callers lease the least-loaded slot and wait when every slot is saturated.
+    - Clients are created lazily on first lease, or eagerly via warm_up().
+    - Passive health checks: a client whose jobs fail with connection-level
+      errors `max_failures` times in a row is dropped and rebuilt on next lease.
+
+    Leases are released automatically when the submitted job completes (see
+    submit()), so a lease spans exactly the lifetime of one Space job.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Client],
+        size: int,
+        per_client_concurrency: int,
+        max_failures: int,
+    ) -> None:
+        self._factory = factory
+        self.size = max(1, size)
+        self.per_client_concurrency = max(1, per_client_concurrency)
+        self.max_failures = max(1, max_failures)
+        self._slots: List[PooledClient] = [PooledClient(i) for i in range(self.size)]
+        self._cond = threading.Condition()
+        self._create_locks = [threading.Lock() for _ in range(self.size)]
+
+    # -- leasing -----------------------------------------------------------
+
+    def _pick(self) -> Optional[PooledClient]:
+        """
+        Least-loaded slot with spare capacity; prefers slots whose client exists.
+        Caller holds self._cond.
+        """
+        candidates = [s for s in self._slots if s.in_flight < self.per_client_concurrency]
+        if not candidates:
+            return None
+
+        slot = min(candidates, key=lambda s: (s.client is None, s.in_flight))
+        slot.in_flight += 1
+        slot.total_calls += 1
+        return slot
+
+    def try_acquire(self) -> Optional[PooledClient]:
+        with self._cond:
+            return self._pick()
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledClient:
+        """
+        Lease a slot, blocking until one has spare capacity. The slot's client is
+        created if needed. Raises TimeoutError if nothing frees up in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._cond:
+            slot = self._pick()
+            while slot is None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a free LLM Space client.")
+                self._cond.wait(timeout=remaining)
+                slot = self._pick()
+
+        return self._ensure_client(slot)
+
+    async def aacquire(self, timeout: Optional[float] = None) -> PooledClient:
+        """
+        Async acquire(): the fast path doesn't touch a thread; waiting for
+        capacity and first-time client creation run in a worker thread.
+        """
+        slot = self.try_acquire()
+        if slot is None:
+            return await self._alease(self.acquire, timeout)
+        if slot.client is None:
+            return await self._alease(self._ensure_client, slot)
+        return slot
+
+    async def _alease(self, fn: Callable[..., PooledClient], *args: Any) -> PooledClient:
+        """
+        Run a leasing call in a worker thread. If the caller is cancelled
+        meanwhile, the thread still finishes; the lease it ends up holding is
+        released instead of leaking.
+        """
+        task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+
+            def _release_abandoned(t: "asyncio.Future[PooledClient]") -> None:
+                if not t.cancelled() and t.exception() is None:
+                    self.release(t.result(), ok=True)
+
+            task.add_done_callback(_release_abandoned)
+            raise
+
+    def _ensure_client(self, slot: PooledClient) -> PooledClient:
+        if slot.client is not None:
+            return slot
+
+        try:
+            with self._create_locks[slot.index]:
+                if slot.client is None:
+                    slot.client = self._factory()
+        except BaseException:
+            self.release(slot, ok=True)
+            raise
+        return slot
+
+    def release(self, slot: PooledClient, ok: bool = True) -> None:
+        with self._cond:
+            slot.in_flight = max(0, slot.in_flight - 1)
+
+            if ok:
+                slot.consecutive_failures = 0
+            else:
+                slot.consecutive_failures += 1
+                if slot.consecutive_failures >= self.max_failures and slot.client is not None:
+                    print(
+                        f"[LLM] Replacing pooled Space client #{slot.index} after "
+                        f"{slot.consecutive_failures} consecutive connection failures"
+                    )
+                    slot.client = None
+                    slot.consecutive_failures = 0
+                    slot.replacements += 1
+
+            self._cond.notify()
+
+    # -- submitting --------------------------------------------------------
+
+    def submit(self, slot: PooledClient, *args: Any, **kwargs: Any) -> Future:
+        """
+        Submit a job on a leased slot; the lease is released when the job ends.
+        """
+        client = slot.client
+        if client is None:
+            # Replaced by a concurrent release since we leased it; rebuild now.
+            client = self._ensure_client(slot).client
+        try:
+            job = client.submit(*args, **kwargs)
+        except BaseException as e:
+            self.release(slot, ok=not isinstance(e, _BROKEN_CLIENT_ERRORS))
+            raise
+
+        def _on_done(f: Future) -> None:
+            broken = (
+                not f.cancelled()
+                and isinstance(f.exception(), _BROKEN_CLIENT_ERRORS)
+            )
+            self.release(slot, ok=not broken)
+
+        job.add_done_callback(_on_done)
+        return job
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def warm_up(self) -> int:
+        """
+        Create every client up front (in parallel) so the first requests don't pay
+        the Space handshake. Returns how many clients are ready; failures are
+        logged and retried lazily on first use.
+        """
+        missing = [s for s in self._slots if s.client is None]
+        if not missing:
+            return self.size
+
+        def _create(slot: PooledClient) -> None:
+            try:
+                with self._create_locks[slot.index]:
+                    if slot.client is None:
+                        slot.client = self._factory()
+            except Exception as e:
+                print(f"[LLM] Warm-up of pooled Space client #{slot.index} failed: {e}")
+
+        with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+            list(executor.map(_create, missing))
+
+        ready = sum(1 for s in self._slots if s.client is not None)
+        print(f"[LLM] Space client pool warm: {ready}/{self.size} clients ready")
+        return ready
+
+    def close(self) -> None:
+        """
+        Drop all clients (they are rebuilt lazily if the pool is used again).
+        """
+        with self._cond:
+            for slot in self._slots:
+                client, slot.client = slot.client, None
+                close = getattr(client, "close", None)
+                if callable(close):
+                    try:
+                        close()
+                    except Exception:
+                        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "size": self.size,
+                "per_client_concurrency": self.per_client_concurrency,
+                "ready": sum(1 for s in self._slots if s.client is not None),
+                "in_flight": sum(s.in_flight for s in self._slots),
+                "clients": [
+                    {
+                        "index": s.index,
+                        "ready": s.client is not None,
+                        "in_flight": s.in_flight,
+                        "total_calls": s.total_calls,
+                        "consecutive_failures": s.consecutive_failures,
+                        "replacements": s.replacements,
+                    }
+                    for s in self._slots
+                ],
+            }
@@ -0,0 +1,445 @@
+# app/services/llm_backends.py
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.services.gradio_pool import GradioClientPool
+
+# One completion request as passed to submit_batch():
+#   {"messages": [...], "max_new_tokens": int, "temperature": float}
+BatchRequest = Dict[str, Any]
+
+
+class LLMBackend:
+    """
+    Transport used by app.services.llm_client to reach a model.
+
+    Backends only move a single request/response; caching, coalescing, retries,
+    circuit breaking, hedging and batching all live in llm_client and work the
+    same for every backend.
+
+    - submit() returns a concurrent.futures.Future resolving to the raw text, so
+      the sync path can wait on it and the async path can await it.
+    - asubmit() is the same but must not block the event loop while waiting for
+      capacity.
+    - submit_batch() is only required when `supports_batch` is True.
+    - astream() yields text deltas; by default it yields the full answer once.
+    """
+
+    name = "base"
+    supports_batch = False
+
+    def submit(
+        self,
+        messages: List[Dict[str, Any]],
+        max_new_tokens: int,
+        temperature: float,
+        timeout: Optional[float] = None,
+    ) -> Future:
+        raise NotImplementedError
+
+    async def asubmit(
+        self,
+        messages: List[Dict[str, Any]],
+        max_new_tokens: int,
+        temperature: float,
+        timeout: Optional[float] = None,
+    ) -> Future:
+        return self.submit(messages, max_new_tokens, temperature, timeout)
+
+    def submit_batch(self, requests: List[BatchRequest], timeout: Optional[float] = None) -> Future:
+        raise NotImplementedError(f"{self.name} backend does not support batching.")
+
+    async def astream(
+        self,
+        messages: List[Dict[str, Any]],
+        max_new_tokens: int,
+        temperature: float,
+        timeout: float,
+    ) -> AsyncIterator[str]:
+        fut = await self.asubmit(messages, max_new_tokens, temperature, timeout)
+        result = await asyncio.wait_for(asyncio.wrap_future(fut), timeout)
+        yield str(result)
+
+    def warm_up(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+# ---------------------------------------------------------------------------
+# Gradio Space (production)
+# ---------------------------------------------------------------------------
+
+class GradioSpaceBackend(LLMBackend):
+    """
+    The Omni Nano Hugging Face Space, through a pool of gradio_client Clients.
+
+    Our Space expects:
+      omni_chat(messages_json: str, max_new_tokens: int, temperature: float) -> str
+
+    and is wired in Gradio as:
+      client.predict(messages_json, max_new_tokens, temperature, api_name="/predict")
+
+    `client.submit` takes the same arguments but returns a Job (a Future)
+    immediately. The optional batch endpoint is:
+      omni_chat_batch(batch_json: str) -> str  (JSON list of completions)
+    """
+
+    name = "gradio"
+
+    def __init__(
+        self,
+        pool: GradioClientPool,
+        api_name: str = "/predict",
+        batch_api_name: Optional[str] = None,
+        stream_poll_sec: float = 0.05,
+    ) -> None:
+        self.pool = pool
+        self.api_name = api_name
+        self.batch_api_name = batch_api_name
+        self.stream_poll_sec = stream_poll_sec
+        self.supports_batch = bool(batch_api_name)
+
+    def _submit_on(self, slot: Any, messages: List[Dict[str, Any]], max_new_tokens: int, temperature: float) -> Future:
+        messages_json = json.dumps({"messages": messages})
+        return self.pool.submit(
+            slot,
+            messages_json,
+            int(max_new_tokens),
+            float(temperature),
+            api_name=self.api_name,
+        )
+
+    def submit(self, messages, max_new_tokens, temperature, timeout=None) -> Future:
+        slot = self.pool.acquire(timeout=timeout)
+        return self._submit_on(slot, messages, max_new_tokens, temperature)
+
+    async def asubmit(self, messages, max_new_tokens, temperature, timeout=None) -> Future:
+        slot = await self.pool.aacquire(timeout=timeout)
+        return self._submit_on(slot, messages, max_new_tokens, temperature)
+
+    def submit_batch(self, requests: List[BatchRequest], timeout: Optional[float] = None) -> Future:
+        slot = self.pool.acquire(timeout=timeout)
+        return self.pool.submit(slot, json.dumps(requests), api_name=self.batch_api_name)
+
+    async def astream(self, messages, max_new_tokens, temperature, timeout) -> AsyncIterator[str]:
+        """
+        If the Space endpoint is a generator, gradio_client exposes its partial
+        (cumulative) outputs through job.outputs(); we poll those and yield only
+        the new suffix. For a plain endpoint the whole answer arrives as one chunk.
+        """
+        job = await self.asubmit(messages, max_new_tokens, temperature, timeout)
+        deadline = time.monotonic() + timeout
+        emitted = ""
+        try:
+            while not job.done():
+                if time.monotonic() > deadline:
+                    raise TimeoutError()
+
+                outputs = job.outputs()  # type: ignore[attr-defined]
+                if outputs:
+                    text = str(outputs[-1])
+                    if text.startswith(emitted) and len(text) > len(emitted):
+                        yield text[len(emitted):]
+                        emitted = text
+
+                await asyncio.sleep(self.stream_poll_sec)
+
+            final = str(job.result()).strip()
+            if final.startswith(emitted.strip()) and len(final) > len(emitted.strip()):
+                yield final[len(emitted.strip()):]
+        finally:
+            if not job.done():
+                job.cancel()
+
+    def warm_up(self) -> int:
+        return self.pool.warm_up()
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "pool": self.pool.stats()}
+
+
+# ---------------------------------------------------------------------------
+# OpenAI-compatible HTTP server (vLLM, TGI, llama.cpp, mock_llm_server, ...)
+# ---------------------------------------------------------------------------
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    Any server exposing POST {base_url}/chat/completions in the OpenAI format.
+
+    Non-streaming calls run on a bounded thread pool sharing one keep-alive
+    httpx.Client; streaming uses a shared httpx.AsyncClient and the SSE
+    `stream: true` protocol.
+    """
+
+    name = "openai"
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        api_key: Optional[str] = None,
+        max_concurrency: int = 32,
+        timeout: float = 60.0,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self._headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._limits = httpx.Limits(
+            max_connections=max_concurrency,
+            max_keepalive_connections=max_concurrency,
+        )
+        self._client = httpx.Client(
+            base_url=self.base_url,
+            headers=self._headers,
+            timeout=timeout,
+            limits=self._limits,
+        )
+        self._aclient: Optional[httpx.AsyncClient] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_concurrency),
+            thread_name_prefix="llm-openai",
+        )
+
+    def _payload(self, messages, max_new_tokens, temperature, stream: bool = False) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": int(max_new_tokens),
+            "temperature": float(temperature),
+            "stream": stream,
+        }
+
+    def _complete(self, messages, max_new_tokens, temperature, timeout=None) -> str:
+        resp = self._client.post(
+            "/chat/completions",
+            json=self._payload(messages, max_new_tokens, temperature),
+            # The attempt's timeout (possibly shortened to the request deadline)
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        return data["choices"][0]["message"]["content"] or ""
+
+    def submit(self, messages, max_new_tokens, temperature, timeout=None) -> Future:
+        return self._executor.submit(self._complete, messages, max_new_tokens, temperature, timeout)
+
+    def _get_aclient(self) -> httpx.AsyncClient:
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self._headers,
+                timeout=self.timeout,
+                limits=self._limits,
+            )
+        return self._aclient
+
+    async def astream(self, messages, max_new_tokens, temperature, timeout) -> AsyncIterator[str]:
+        client = self._get_aclient()
+        async with client.stream(
+            "POST",
+            "/chat/completions",
+            json=self._payload(messages, max_new_tokens, temperature, stream=True),
+            timeout=timeout,
+        ) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    def close(self) -> None:
+        self._client.close()
+
+    async def aclose(self) -> None:
+        self.close()
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "base_url": self.base_url, "model": self.model}
+
+
+# ---------------------------------------------------------------------------
+# In-process fake (load testing / benchmarks, no network)
+# ---------------------------------------------------------------------------
+
+class LatencyModel:
+    """
+    Simulated LLM latency: a log-normal time-to-first-token (given by its median
+    and sigma) plus generation time at a fixed token rate.
+
+    Shared by FakeBackend and app.services.mock_llm_server.
+    """
+
+    def __init__(self, median_ms: float, sigma: float, tokens_per_sec: float) -> None:
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.tokens_per_sec = tokens_per_sec
+
+    def time_to_first_token(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.median_ms / 1000.0), self.sigma)
+
+    def per_token(self) -> float:
+        return 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+    def total(self, n_tokens: int) -> float:
+        return self.time_to_first_token() + n_tokens * self.per_token()
+
+
+_LOREM_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat duis aute irure "
+    "in reprehenderit voluptate velit esse cillum eu fugiat nulla pariatur excepteur "
+    "sint occaecat cupidatat non proident sunt culpa qui officia deserunt mollit anim "
+    "id est laborum"
+).split()
+
+
+def fake_completion_tokens(messages: List[Dict[str, Any]], max_new_tokens: int) -> List[str]:
+    """
+    Deterministic stand-in output, split into "tokens" (words).
+
+    Prompts asking for JSON get "{}" so the agents fall back to their defaults
+    (which exercises the full pipeline); everything else gets an echo of the
+    user's message padded to the token budget.
+    """
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    if "valid JSON" in system:
+        return ["{}"]
+
+    user = next(
+        (m.get("content", "") for m in reversed(messages) if m.get("role") == "user"),
+        "",
+    )
+    budget = max(1, int(max_new_tokens))
+    words = ["(fake)"] + user.split()[:16]
+    # Pad with lorem-ipsum sentences (seeded by the prompt, so deterministic) that
+    # look like prose to the tester's pre-checks rather than one repeated word.
+    rng = random.Random(user)
+    while len(words) < budget:
+        sentence = rng.sample(_LOREM_WORDS, rng.randint(6, 12))
+        words += [sentence[0].capitalize()] + sentence[1:-1] + [sentence[-1] + "."]
+    tokens = words[:budget]
+    if len(tokens) > 1 and not tokens[-1].endswith("."):
+        tokens[-1] += "."
+    return [tokens[0]] + [" " + t for t in tokens[1:]]
+
+
+class _DelayedResults:
+    """
+    Resolves Futures at a given time from one daemon thread (a tiny timer wheel),
+    so hundreds of simulated in-flight calls don't need hundreds of threads.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, Future, Any]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, delay: float, value: Any) -> Future:
+        fut: Future = Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="llm-fake", daemon=True)
+                self._thread.start()
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), fut, value))
+            self._cond.notify()
+        return fut
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                due, _, fut, value = self._heap[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(timeout=wait)
+                    continue
+                heapq.heappop(self._heap)
+
+            if fut.set_running_or_notify_cancel():
+                fut.set_result(value)
+
+
+class FakeBackend(LLMBackend):
+    """
+    In-process stand-in for the Space with a configurable latency distribution
+    and token rate. No network, no threads per call; supports batching (a batch
+    costs one time-to-first-token plus its longest generation).
+    """
+
+    name = "fake"
+    supports_batch = True
+
+    def __init__(self, latency: LatencyModel) -> None:
+        self.latency = latency
+        self._timer = _DelayedResults()
+        self.calls = 0
+
+    def submit(self, messages, max_new_tokens, temperature, timeout=None) -> Future:
+        self.calls += 1
+        tokens = fake_completion_tokens(messages, max_new_tokens)
+        return self._timer.schedule(self.latency.total(len(tokens)), "".join(tokens))
+
+    def submit_batch(self, requests: List[BatchRequest], timeout: Optional[float] = None) -> Future:
+        self.calls += 1
+        outputs = [
+            fake_completion_tokens(r["messages"], r["max_new_tokens"]) for r in requests
+        ]
+        longest = max((len(t) for t in outputs), default=0)
+        delay = self.latency.time_to_first_token() + longest * self.latency.per_token()
+        return self._timer.schedule(delay, ["".join(t) for t in outputs])
+
+    async def astream(self, messages, max_new_tokens, temperature, timeout) -> AsyncIterator[str]:
+        self.calls += 1
+        tokens = fake_completion_tokens(messages, max_new_tokens)
+        await asyncio.sleep(self.latency.time_to_first_token())
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.latency.per_token())
+            yield token
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "calls": self.calls,
+            "latency_median_ms": self.latency.median_ms,
+            "latency_sigma": self.latency.sigma,
+            "tokens_per_sec": self.latency.tokens_per_sec,
+        }
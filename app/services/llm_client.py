@@ -2,20 +2,51 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import os
+import queue
+import random
+import threading
 import time
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict, deque
+from contextlib import aclosing
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 
 import httpx
 from gradio_client import Client
 
+from app.core.config import get_settings
+from app.core.metrics import counter, histogram, register_collector
+from app.core.timing import annotate, current_stage, span
+from app.services.gradio_pool import GradioClientPool
+from app.services.llm_backends import (
+    FakeBackend,
+    GradioSpaceBackend,
+    LatencyModel,
+    LLMBackend,
+    OpenAICompatibleBackend,
+)
+
 
 class LLMClientError(Exception):
     """Custom exception for LLM client errors."""
     pass
 
 
+class LLMCircuitOpenError(LLMClientError):
+    """Raised without calling the Space while the circuit breaker is open."""
+    pass
+
+
+class LLMDeadlineExceededError(LLMClientError):
+    """Raised when the caller's deadline leaves no time for (another) attempt."""
+    pass
+
+
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
@@ -34,91 +65,1376 @@ HF_API_TOKEN = (
 LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
 LLM_TIMEOUT_SEC = float(os.getenv("LLM_TIMEOUT_SEC", "60"))
 
-# Hard cap to keep calls cheap on free hardware
-HARD_MAX_NEW_TOKENS = 32
+# Exponential backoff with full jitter between retries
+LLM_BACKOFF_BASE_SEC = float(os.getenv("LLM_BACKOFF_BASE_SEC", "0.5"))
+LLM_BACKOFF_MAX_SEC = float(os.getenv("LLM_BACKOFF_MAX_SEC", "8"))
+
+# Circuit breaker: after N consecutive retryable failures, fail fast for a while,
+# then let a single probe call through to check whether the Space recovered.
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RECOVERY_SEC = float(os.getenv("LLM_BREAKER_RECOVERY_SEC", "30"))
+
+# Upper bound on any single call's token budget. Agents ask for what their
+# pipeline profile allows (app.core.profiles); this only guards against runaways.
+HARD_MAX_NEW_TOKENS = int(os.getenv("LLM_HARD_MAX_NEW_TOKENS", "1024"))
+
+# Hedged requests (async path): if a call is slower than the given percentile of
+# recent latencies, send an identical backup request and keep whichever returns
+# first. LLM_HEDGE_MAX_RATE caps the share of calls that may be hedged.
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY_SEC = float(os.getenv("LLM_HEDGE_MIN_DELAY_SEC", "0.5"))
+LLM_HEDGE_MAX_RATE = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.1"))
+
+# Completion cache (identical prompts are very common for planner/tester calls)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SEC = float(os.getenv("LLM_CACHE_TTL_SEC", "600"))
 
+# How often streaming polls a running Gradio Space job for new output
+LLM_STREAM_POLL_SEC = float(os.getenv("LLM_STREAM_POLL_SEC", "0.05"))
 
-# Singleton client instance
-_gradio_client: Optional[Client] = None
+# Micro-batching: concurrent calls are collected for a few ms and sent to the
+# Space's batch endpoint as one request. Off by default because it needs a Space
+# that exposes LLM_BATCH_API_NAME:
+#   omni_chat_batch(batch_json: str) -> str  (JSON list of completions)
+# where batch_json is a JSON list of {"messages", "max_new_tokens", "temperature"}.
+LLM_BATCH_ENABLED = os.getenv("LLM_BATCH_ENABLED", "false").lower() == "true"
+LLM_BATCH_API_NAME = os.getenv("LLM_BATCH_API_NAME", "/predict_batch")
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "8"))
+LLM_BATCH_MAX_WAIT_MS = float(os.getenv("LLM_BATCH_MAX_WAIT_MS", "5"))
 
+# Single-flight: identical prompts already in flight share one Space call
+LLM_COALESCE_ENABLED = os.getenv("LLM_COALESCE_ENABLED", "true").lower() == "true"
 
-def _get_client() -> Client:
+# Pool of Space clients (see app/services/gradio_pool.py). The total also bounds
+# concurrency for the OpenAI-compatible backend.
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "4"))
+LLM_POOL_PER_CLIENT_CONCURRENCY = int(os.getenv("LLM_POOL_PER_CLIENT_CONCURRENCY", "8"))
+LLM_POOL_MAX_CLIENT_FAILURES = int(os.getenv("LLM_POOL_MAX_CLIENT_FAILURES", "3"))
+
+
+def _create_client() -> Client:
     """
-    Lazily initialize and return a gradio_client.Client for the Space.
+    Build a gradio_client.Client for the Space (performs the slow handshake).
     """
-    global _gradio_client
-    if _gradio_client is not None:
-        return _gradio_client
-
     client_kwargs: Dict[str, Any] = {}
     if HF_API_TOKEN:
         client_kwargs["hf_token"] = HF_API_TOKEN
 
     # Example: Client("username/space-name", hf_token="...")
-    _gradio_client = Client(LLM_SPACE_ID, **client_kwargs)
-    return _gradio_client
+    return Client(LLM_SPACE_ID, **client_kwargs)
+
+
+def _create_backend() -> LLMBackend:
+    """
+    Build the LLM backend selected by Settings.LLM_BACKEND.
+    """
+    settings = get_settings()
+    kind = settings.LLM_BACKEND.lower()
+
+    if kind == "gradio":
+        pool = GradioClientPool(
+            _create_client,
+            size=LLM_POOL_SIZE,
+            per_client_concurrency=LLM_POOL_PER_CLIENT_CONCURRENCY,
+            max_failures=LLM_POOL_MAX_CLIENT_FAILURES,
+        )
+        return GradioSpaceBackend(
+            pool,
+            batch_api_name=LLM_BATCH_API_NAME,
+            stream_poll_sec=LLM_STREAM_POLL_SEC,
+        )
+
+    if kind == "openai":
+        return OpenAICompatibleBackend(
+            base_url=settings.LLM_OPENAI_BASE_URL,
+            model=settings.LLM_OPENAI_MODEL,
+            api_key=settings.LLM_OPENAI_API_KEY,
+            max_concurrency=LLM_POOL_SIZE * LLM_POOL_PER_CLIENT_CONCURRENCY,
+            timeout=LLM_TIMEOUT_SEC,
+        )
+
+    if kind == "fake":
+        return FakeBackend(
+            LatencyModel(
+                median_ms=settings.FAKE_LLM_LATENCY_MEDIAN_MS,
+                sigma=settings.FAKE_LLM_LATENCY_SIGMA,
+                tokens_per_sec=settings.FAKE_LLM_TOKENS_PER_SEC,
+            )
+        )
+
+    raise ValueError(f"Unknown LLM_BACKEND {settings.LLM_BACKEND!r} (expected gradio, openai or fake).")
+
+
+_backend: LLMBackend = _create_backend()
+
+
+def get_llm_backend() -> LLMBackend:
+    return _backend
+
+
+def set_llm_backend(backend: LLMBackend) -> None:
+    """
+    Swap the backend at runtime (benchmarks / tests). Cached completions from
+    the previous backend are dropped.
+    """
+    global _backend
+    _backend = backend
+    clear_completion_cache()
+
+
+def warm_up_llm_backend() -> int:
+    """
+    Eagerly open backend connections (called at app startup).
+    """
+    return _backend.warm_up()
+
+
+async def aclose_llm_backend() -> None:
+    await _backend.aclose()
+
+
+def get_llm_backend_stats() -> Dict[str, Any]:
+    return _backend.stats()
+
+
+# ---------------------------------------------------------------------------
+# Resilience: retry classification, backoff, circuit breaker
+# ---------------------------------------------------------------------------
+
+# Errors that mean "our request is wrong", so retrying (or blaming the Space)
+# is pointless. ValueError covers gradio_client's invalid api_name/arguments.
+_NON_RETRYABLE_ERRORS: Tuple[type, ...] = (
+    LLMClientError,
+    ValueError,
+    TypeError,
+    KeyError,
+)
+
+
+def _is_retryable(err: BaseException) -> bool:
+    """
+    Transport errors, timeouts, 429s and 5xx are retryable; other 4xx and local
+    errors (bad arguments, unexpected response shape) are not.
+    """
+    if isinstance(err, (httpx.RequestError, TimeoutError, FutureTimeoutError, asyncio.TimeoutError)):
+        return True
+    if isinstance(err, httpx.HTTPStatusError):
+        status = err.response.status_code
+        return status == 429 or status >= 500
+    if isinstance(err, _NON_RETRYABLE_ERRORS):
+        return False
+    # Unknown errors (e.g. gradio AppError from a crashed Space worker)
+    return True
+
+
+def _backoff_delay(attempt: int) -> float:
+    """
+    Full-jitter exponential backoff: uniform(0, min(max, base * 2^(attempt-1))).
+    """
+    ceiling = min(LLM_BACKOFF_MAX_SEC, LLM_BACKOFF_BASE_SEC * (2 ** (attempt - 1)))
+    return random.uniform(0.0, ceiling)
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half_open breaker around Space calls.
+
+    - closed: calls go through; consecutive failures are counted.
+    - open: after `failure_threshold` consecutive failures, calls fail fast with
+      LLMCircuitOpenError for `recovery_sec`.
+    - half_open: one probe call is let through; success closes the circuit,
+      failure re-opens it for another `recovery_sec`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, recovery_sec: float) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_sec = recovery_sec
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.total_failures = 0
+        self.total_rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_sec:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        """
+        Raise LLMCircuitOpenError if the call must not go to the Space.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+
+            self.total_rejected += 1
+            retry_in = max(0.0, self.recovery_sec - (time.monotonic() - self._opened_at))
+
+        raise LLMCircuitOpenError(
+            f"LLM Space circuit is {state}; failing fast (retry in ~{retry_in:.0f}s)."
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.total_failures += 1
+            self._consecutive_failures += 1
+            state = self._current_state()
+            if state == self.OPEN:
+                # A call that started before the circuit opened: the recovery
+                # window still runs from the moment it opened
+                return
+            if state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self.times_opened += 1
+                print(
+                    f"[LLM] Circuit breaker OPEN after {self._consecutive_failures} "
+                    f"consecutive failures; failing fast for {self.recovery_sec:.0f}s"
+                )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release(self) -> None:
+        """
+        The call ended without telling us anything about Space health
+        (cancelled, or a non-retryable client-side error): free the probe slot.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "recovery_sec": self.recovery_sec,
+                "total_failures": self.total_failures,
+                "total_rejected": self.total_rejected,
+                "times_opened": self.times_opened,
+            }
+
+
+_breaker = CircuitBreaker(LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RECOVERY_SEC)
+
+
+def get_circuit_breaker_state() -> Dict[str, Any]:
+    """
+    Current breaker state and counters (for /health and monitoring).
+    """
+    return _breaker.stats()
+
+
+# ---------------------------------------------------------------------------
+# Completion cache
+# ---------------------------------------------------------------------------
+
+class CompletionCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL for completed LLM calls.
+
+    - Bounded to `max_entries`; the least recently used entry is evicted first.
+    - Entries older than `ttl_sec` are treated as misses and dropped.
+    - Keeps hit/miss/eviction counters for monitoring (see stats()).
+    """
+
+    def __init__(self, max_entries: int, ttl_sec: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        if self.max_entries <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl_sec
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_sec": self.ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+_completion_cache = CompletionCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SEC)
+
+
+def _prompt_chars(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(str(m.get("content", ""))) for m in messages)
+
+
+def _completion_cache_key(
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_new_tokens: int,
+) -> str:
+    """
+    Canonical hash of everything that determines a completion.
+    """
+    canonical = json.dumps(
+        {
+            "messages": messages,
+            "temperature": round(float(temperature), 4),
+            "max_new_tokens": int(max_new_tokens),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_completion_cache_stats() -> Dict[str, Any]:
+    """
+    Hit/miss counters and size of the completion cache (for monitoring).
+    """
+    stats = _completion_cache.stats()
+    stats["enabled"] = LLM_CACHE_ENABLED
+    return stats
+
+
+def clear_completion_cache() -> None:
+    _completion_cache.clear()
+
+
+# ---------------------------------------------------------------------------
+# Single-flight (request coalescing)
+# ---------------------------------------------------------------------------
+
+def _wait_until(deadline: Optional[float]) -> Optional[float]:
+    """
+    Seconds left before `deadline` (never negative), or None for no deadline.
+    """
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one.
+
+    The first caller for a key (the "leader") does the work; callers that arrive
+    while it is in flight wait on the leader's result instead of issuing their own
+    Space call. Results are shared through a concurrent.futures.Future, so sync
+    (thread) and async (event loop) callers can join the same flight.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.coalesced += 1
+                return fut, False
+
+            fut = Future()
+            self._calls[key] = fut
+            self.leaders += 1
+            return fut, True
+
+    def _finish(self, key: str, fut: Future) -> None:
+        with self._lock:
+            if self._calls.get(key) is fut:
+                del self._calls[key]
+
+    def do(self, key: str, fn: Callable[[], str], deadline: Optional[float] = None) -> str:
+        """
+        Followers wait at most until their own `deadline` (absolute time.time()).
+        """
+        fut, is_leader = self._join(key)
+        if not is_leader:
+            try:
+                return fut.result(timeout=_wait_until(deadline))
+            except FutureTimeoutError:
+                raise LLMDeadlineExceededError(
+                    "Request deadline exceeded waiting for a coalesced LLM call."
+                ) from None
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, fut)
+            fut.set_exception(e)
+            raise
+
+        self._finish(key, fut)
+        fut.set_result(result)
+        return result
+
+    async def ado(
+        self,
+        key: str,
+        coro_fn: Callable[[], Awaitable[str]],
+        deadline: Optional[float] = None,
+    ) -> str:
+        """
+        Async variant of do().
+
+        The leader's work runs in its own task, so cancelling any single caller
+        (including the leader) doesn't cancel the call the others are waiting on.
+        """
+        fut, is_leader = self._join(key)
+
+        if is_leader:
+            task = asyncio.ensure_future(coro_fn())
+
+            def _on_done(t: "asyncio.Task[str]") -> None:
+                self._finish(key, fut)
+                if t.cancelled():
+                    fut.set_exception(LLMClientError("Coalesced LLM call was cancelled."))
+                elif t.exception() is not None:
+                    fut.set_exception(t.exception())
+                else:
+                    fut.set_result(t.result())
+
+            task.add_done_callback(_on_done)
+
+        waiter = asyncio.wrap_future(fut)
+        # The leader's own call already honours its deadline
+        if is_leader or deadline is None:
+            return await asyncio.shield(waiter)
+
+        # A follower that gives up must not leave the result unretrieved
+        waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout=_wait_until(deadline))
+        except asyncio.TimeoutError:
+            raise LLMDeadlineExceededError(
+                "Request deadline exceeded waiting for a coalesced LLM call."
+            ) from None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+            }
+
+
+_single_flight = SingleFlight()
+
+
+def get_coalescing_stats() -> Dict[str, Any]:
+    """
+    How many calls were coalesced onto an in-flight identical call.
+    """
+    stats = _single_flight.stats()
+    stats["enabled"] = LLM_COALESCE_ENABLED
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Helpers shared by the sync and async paths
+# ---------------------------------------------------------------------------
+
+def _resolve_max_new_tokens(
+    max_new_tokens: int,
+    max_tokens: Optional[int] = None,
+) -> int:
+    """
+    Resolve the effective token budget for a call: `max_tokens` (OpenAI-style
+    alias) wins over `max_new_tokens`, clamped to [1, HARD_MAX_NEW_TOKENS].
+    """
+    requested = max_tokens if max_tokens is not None else max_new_tokens
+    return max(1, min(int(requested), HARD_MAX_NEW_TOKENS))
+
+
+def _attempt_timeout(timeout: float, deadline: Optional[float]) -> float:
+    """
+    Timeout for the next attempt: `timeout`, shortened to what is left before
+    `deadline` (absolute time.time()). Raises LLMDeadlineExceededError if
+    nothing is left.
+    """
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise LLMDeadlineExceededError("Request deadline exceeded before calling the LLM.")
+    return min(timeout, remaining)
+
+
+def _backoff_fits(attempt: int, deadline: Optional[float]) -> Optional[float]:
+    """
+    Backoff before the next retry, or None if it would run past `deadline`.
+    """
+    delay = _backoff_delay(attempt)
+    if deadline is not None and time.time() + delay >= deadline:
+        return None
+    return delay
+
+
+def _submit(
+    messages: List[Dict[str, Any]],
+    max_new_tokens: int,
+    temperature: float,
+    timeout: float,
+) -> Future:
+    """
+    Submit one completion to the backend, through the micro-batcher when it is
+    enabled and supported.
+
+    Either way the caller gets a Future resolving to the raw completion. May
+    block while the backend is at its concurrency limit.
+    """
+    if LLM_BATCH_ENABLED and _backend.supports_batch:
+        return _batcher.submit(messages, max_new_tokens, temperature)
+    return _backend.submit(messages, max_new_tokens, temperature, timeout=timeout)
+
+
+async def _asubmit(
+    messages: List[Dict[str, Any]],
+    max_new_tokens: int,
+    temperature: float,
+    timeout: float,
+) -> Future:
+    """
+    Async _submit(): waits for backend capacity without blocking the loop.
+    """
+    if LLM_BATCH_ENABLED and _backend.supports_batch:
+        return _batcher.submit(messages, max_new_tokens, temperature)
+    return await _backend.asubmit(messages, max_new_tokens, temperature, timeout=timeout)
+
+
+def _coerce_result(result: Any) -> str:
+    if not isinstance(result, str):
+        result = str(result)
+    return result.strip()
+
+
+def _log_attempt_error(err: Exception, attempt: int, timeout: float) -> None:
+    if isinstance(err, httpx.RequestError):
+        print(f"[LLM] HTTP error calling Space (attempt {attempt}/{LLM_MAX_RETRIES}): {err}")
+    elif isinstance(err, TimeoutError):
+        print(
+            f"[LLM] Timed out after {timeout:.0f}s calling Space "
+            f"(attempt {attempt}/{LLM_MAX_RETRIES})"
+        )
+    else:
+        print(f"[LLM] Error calling Space (attempt {attempt}/{LLM_MAX_RETRIES}): {err}")
+
+
+def _is_timeout(err: BaseException) -> bool:
+    return isinstance(err, (TimeoutError, FutureTimeoutError, asyncio.TimeoutError, httpx.TimeoutException))
+
+
+def _record_breaker_outcome(err: Exception, timeout: float, full_timeout: float) -> None:
+    """
+    Count a failed attempt against the breaker only if it says something about
+    Space health (see _handle_attempt_error()); otherwise free its probe slot.
+    """
+    if not _is_retryable(err) or (_is_timeout(err) and timeout < full_timeout):
+        _breaker.release()
+    else:
+        _breaker.record_failure()
+
+
+def _handle_attempt_error(err: Exception, attempt: int, timeout: float, full_timeout: float) -> None:
+    """
+    Log a failed attempt and update the breaker. Re-raises (as LLMClientError)
+    if the error is not worth retrying.
+
+    `timeout` is the attempt's timeout, `full_timeout` the configured one. A
+    timeout on an attempt the request deadline cut short says nothing about
+    Space health, so only timeouts that ran the full configured time count.
+    """
+    _log_attempt_error(err, attempt, timeout)
+
+    _record_breaker_outcome(err, timeout, full_timeout)
+    if not _is_retryable(err):
+        if isinstance(err, LLMClientError):
+            raise err
+        raise LLMClientError(f"Non-retryable error calling LLM Space: {err}") from err
+
+
+def _parse_json_or_raw(raw: str) -> Dict[str, Any]:
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        # If the model didn't return valid JSON, wrap raw text in a dict
+        return {"raw": raw}
+
+
+# ---------------------------------------------------------------------------
+# Micro-batching
+# ---------------------------------------------------------------------------
+
+class _BatchItem:
+    __slots__ = ("messages", "max_new_tokens", "temperature", "future")
+
+    def __init__(
+        self,
+        messages: List[Dict[str, Any]],
+        max_new_tokens: int,
+        temperature: float,
+    ) -> None:
+        self.messages = messages
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.future: Future = Future()
+
+
+class MicroBatcher:
+    """
+    Collects concurrent completion requests into batched Space calls.
+
+    A daemon worker thread takes the first queued request, then keeps collecting
+    until `max_batch_size` requests are queued or `max_wait_ms` has passed, and
+    hands the batch to `dispatch`. Dispatch is non-blocking (it returns a Future),
+    so several batches can be in flight at once; results are fanned back out to
+    each caller's Future when the batch completes.
+    """
+
+    def __init__(
+        self,
+        dispatch: Callable[[List[_BatchItem]], Future],
+        max_batch_size: int,
+        max_wait_ms: float,
+    ) -> None:
+        self._dispatch = dispatch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_sec = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[_BatchItem]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(
+        self,
+        messages: List[Dict[str, Any]],
+        max_new_tokens: int,
+        temperature: float,
+    ) -> Future:
+        self._ensure_worker()
+        item = _BatchItem(messages, max_new_tokens, temperature)
+        self._queue.put(item)
+        return item.future
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name="llm-micro-batcher",
+                    daemon=True,
+                )
+                self._worker.start()
+
+    def _collect(self) -> List[_BatchItem]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_sec
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        # Drop requests whose caller already gave up (timed out / cancelled)
+        return [item for item in batch if item.future.set_running_or_notify_cancel()]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+
+            try:
+                batch_future = self._dispatch(batch)
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+
+            batch_future.add_done_callback(
+                lambda f, items=batch: self._fan_out(items, f)
+            )
+
+    @staticmethod
+    def _fan_out(items: List[_BatchItem], batch_future: Future) -> None:
+        try:
+            results = _parse_batch_result(batch_future.result(), expected=len(items))
+        except BaseException as e:
+            for item in items:
+                item.future.set_exception(e)
+            return
+
+        for item, result in zip(items, results):
+            item.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": (self.items / self.batches) if self.batches else 0.0,
+                "queued": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_sec * 1000.0,
+            }
+
+
+def _parse_batch_result(raw: Any, expected: int) -> List[Any]:
+    """
+    The batch endpoint returns a JSON list (or an already-decoded list) with one
+    completion per request, in request order.
+    """
+    results = json.loads(raw) if isinstance(raw, str) else raw
+    if not isinstance(results, list) or len(results) != expected:
+        raise LLMClientError(
+            f"Batch endpoint returned {type(results).__name__} "
+            f"of unexpected shape for {expected} requests."
+        )
+    return results
+
+
+def _dispatch_batch(items: List[_BatchItem]) -> Future:
+    requests = [
+        {
+            "messages": item.messages,
+            "max_new_tokens": int(item.max_new_tokens),
+            "temperature": float(item.temperature),
+        }
+        for item in items
+    ]
+    return _backend.submit_batch(requests, timeout=LLM_TIMEOUT_SEC)
+
+
+_batcher = MicroBatcher(_dispatch_batch, LLM_BATCH_MAX_SIZE, LLM_BATCH_MAX_WAIT_MS)
+
+
+def get_batching_stats() -> Dict[str, Any]:
+    """
+    Number of batched Space calls and their average size.
+    """
+    stats = _batcher.stats()
+    stats["enabled"] = LLM_BATCH_ENABLED
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Hedged requests
+# ---------------------------------------------------------------------------
+
+class HedgePolicy:
+    """
+    Decides when (and whether) to send a backup request.
+
+    - Tracks a rolling window of successful call latencies; the hedge delay is
+      the configured percentile of that window (never below `min_delay_sec`).
+    - No hedging until `min_samples` latencies have been observed.
+    - Over a rolling window of sent requests, at most `max_rate` of them may be
+      hedges, so a slow Space can't make us double our load.
+    """
+
+    def __init__(
+        self,
+        percentile: float,
+        min_samples: int,
+        min_delay_sec: float,
+        max_rate: float,
+        window: int = 256,
+    ) -> None:
+        self.percentile = min(max(percentile, 0.0), 1.0)
+        self.min_samples = min_samples
+        self.min_delay_sec = min_delay_sec
+        self.max_rate = max_rate
+        self._latencies: "deque[float]" = deque(maxlen=window)
+        self._hedged_window: "deque[bool]" = deque(maxlen=window)
+        self._hedged_in_window = 0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def latency_percentile(self, p: float) -> Optional[float]:
+        """
+        The p-th percentile of recent call latencies (None before min_samples).
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Seconds to wait before hedging, or None if we shouldn't hedge this call.
+        """
+        latency = self.latency_percentile(self.percentile)
+        if latency is None:
+            return None
+        return max(self.min_delay_sec, latency)
+
+    def _push_request(self, hedged: bool) -> None:
+        if len(self._hedged_window) == self._hedged_window.maxlen and self._hedged_window[0]:
+            self._hedged_in_window -= 1
+        self._hedged_window.append(hedged)
+        if hedged:
+            self._hedged_in_window += 1
+
+    def record_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+            self._push_request(False)
+
+    def try_acquire_hedge(self) -> bool:
+        """
+        Reserve a hedge if, counting it, hedges stay within `max_rate` of the
+        requests sent over the rolling window.
+        """
+        with self._lock:
+            sent = len(self._hedged_window) + 1
+            if (self._hedged_in_window + 1) / sent > self.max_rate:
+                return False
+
+            self._push_request(True)
+            self.hedges_sent += 1
+            return True
+
+    def record_hedge_win(self) -> None:
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedges_sent": self.hedges_sent,
+                "hedge_wins": self.hedge_wins,
+                "hedge_rate": (self._hedged_in_window / len(self._hedged_window))
+                if self._hedged_window
+                else 0.0,
+                "latency_samples": len(self._latencies),
+            }
+
+
+_hedge_policy = HedgePolicy(
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_MIN_DELAY_SEC,
+    LLM_HEDGE_MAX_RATE,
+)
+
+
+def get_hedging_stats() -> Dict[str, Any]:
+    """
+    How many backup requests were sent and how often they won.
+    """
+    stats = _hedge_policy.stats()
+    stats["enabled"] = LLM_HEDGE_ENABLED
+    stats["current_delay_sec"] = _hedge_policy.hedge_delay()
+    return stats
+
+
+def estimate_call_latency() -> Optional[float]:
+    """
+    Median latency of recent successful LLM calls in seconds (None until a few
+    calls have completed). Used to decide what still fits in a deadline.
+    """
+    return _hedge_policy.latency_percentile(0.5)
+
+
+async def _await_hedged(
+    messages: List[Dict[str, Any]],
+    max_new_tokens: int,
+    temperature: float,
+    timeout: float,
+) -> Any:
+    """
+    Run one attempt, hedging it with a backup request if it is slow.
+
+    Returns the first successful result; the losing request is cancelled.
+    Raises TimeoutError after `timeout` seconds.
+    """
+    t0 = time.monotonic()
+    deadline = t0 + timeout
+    _hedge_policy.record_call()
+
+    primary = asyncio.wrap_future(await _asubmit(messages, max_new_tokens, temperature, timeout))
+    pending = {primary}
+    hedge: Optional["asyncio.Future[Any]"] = None
+    last_err: Optional[BaseException] = None
+
+    try:
+        delay = _hedge_policy.hedge_delay() if LLM_HEDGE_ENABLED else None
+        if delay is not None and delay < timeout:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and _hedge_policy.try_acquire_hedge():
+                hedge = asyncio.wrap_future(
+                    await _asubmit(messages, max_new_tokens, temperature, timeout)
+                )
+                pending.add(hedge)
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=remaining,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for fut in done:
+                if fut.exception() is None:
+                    _hedge_policy.record_latency(time.monotonic() - t0)
+                    if fut is hedge:
+                        _hedge_policy.record_hedge_win()
+                    return fut.result()
+                last_err = fut.exception()
+
+        if last_err is not None and not pending:
+            raise last_err
+        raise TimeoutError()
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+_LLM_LATENCY = histogram(
+    "omni_llm_call_duration_seconds",
+    "LLM completion latency per agent and cache outcome (hit, miss, coalesced).",
+    ("agent", "cache"),
+)
+_LLM_CALLS = counter(
+    "omni_llm_calls_total",
+    "LLM completions per agent and outcome (ok, error, deadline).",
+    ("agent", "outcome"),
+)
+_LLM_RETRIES = counter(
+    "omni_llm_retries_total",
+    "LLM attempts after the first one, per agent.",
+    ("agent",),
+)
+
+
+def _agent_label() -> str:
+    return current_stage() or "none"
+
+
+def _observe_call(t0: float, cache: str, err: Optional[BaseException] = None) -> None:
+    if err is None:
+        outcome = "ok"
+    elif isinstance(err, LLMDeadlineExceededError):
+        outcome = "deadline"
+    else:
+        outcome = "error"
+    agent = _agent_label()
+    _LLM_LATENCY.labels(agent, cache).observe(time.perf_counter() - t0)
+    _LLM_CALLS.labels(agent, outcome).inc()
+
+
+def _record_attempt(attempt: int) -> None:
+    annotate(attempts=attempt)
+    if attempt > 1:
+        _LLM_RETRIES.labels(_agent_label()).inc()
+
+
+def _collect_cache_metrics() -> Any:
+    stats = _completion_cache.stats()
+    for event in ("hits", "misses", "evictions"):
+        yield "omni_llm_cache_events_total", {"event": event}, stats[event]
+    yield "omni_llm_cache_events_total", {"event": "coalesced"}, _single_flight.stats()["coalesced"]
+
+
+register_collector(
+    "omni_llm_cache_events_total",
+    "counter",
+    "Completion cache hits, misses and evictions, and calls coalesced onto an in-flight call.",
+    _collect_cache_metrics,
+)
 
 
 # ---------------------------------------------------------------------------
 # Core call used by agents
 # ---------------------------------------------------------------------------
 
+def _complete_with_retries(
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_new_tokens: int,
+    timeout: float,
+    deadline: Optional[float] = None,
+) -> str:
+    last_err: Optional[Exception] = None
+
+    for attempt in range(1, LLM_MAX_RETRIES + 1):
+        _record_attempt(attempt)
+        attempt_timeout = _attempt_timeout(timeout, deadline)
+        _breaker.before_call()
+        job: Optional[Future] = None
+        try:
+            t0 = time.monotonic()
+            job = _submit(messages, max_new_tokens, temperature, attempt_timeout)
+            result = _coerce_result(job.result(timeout=attempt_timeout))
+            _hedge_policy.record_latency(time.monotonic() - t0)
+            _breaker.record_success()
+            return result
+        except Exception as e:
+            if job is not None:
+                job.cancel()
+            last_err = e
+            _handle_attempt_error(e, attempt, attempt_timeout, timeout)
+        except BaseException:
+            _breaker.release()
+            raise
+
+        if attempt < LLM_MAX_RETRIES:
+            delay = _backoff_fits(attempt, deadline)
+            if delay is None:
+                raise LLMDeadlineExceededError(
+                    f"Request deadline exceeded after {attempt} attempt(s): {last_err!r}"
+                )
+            time.sleep(delay)
+
+    raise LLMClientError(
+        f"Failed to get completion from LLM Space after {LLM_MAX_RETRIES} attempts: {last_err}"
+    )
+
+
+async def _acomplete_with_retries(
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_new_tokens: int,
+    timeout: float,
+    deadline: Optional[float] = None,
+) -> str:
+    last_err: Optional[Exception] = None
+
+    for attempt in range(1, LLM_MAX_RETRIES + 1):
+        _record_attempt(attempt)
+        attempt_timeout = _attempt_timeout(timeout, deadline)
+        _breaker.before_call()
+        try:
+            result = await _await_hedged(messages, max_new_tokens, temperature, attempt_timeout)
+            _breaker.record_success()
+            return _coerce_result(result)
+        except asyncio.CancelledError:
+            _breaker.release()
+            raise
+        except Exception as e:
+            last_err = e
+            _handle_attempt_error(e, attempt, attempt_timeout, timeout)
+
+        if attempt < LLM_MAX_RETRIES:
+            delay = _backoff_fits(attempt, deadline)
+            if delay is None:
+                raise LLMDeadlineExceededError(
+                    f"Request deadline exceeded after {attempt} attempt(s): {last_err!r}"
+                )
+            await asyncio.sleep(delay)
+
+    raise LLMClientError(
+        f"Failed to get completion from LLM Space after {LLM_MAX_RETRIES} attempts: {last_err}"
+    )
+
+
 def generate_chat_completion(
     messages: List[Dict[str, Any]],
     temperature: float = 0.3,
     max_new_tokens: int = 512,
     max_tokens: Optional[int] = None,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
     **_: Any,
 ) -> str:
     """
     Call the Omni Nano Gradio Space and return a plain text completion.
 
     NOTE:
-    - We hard-cap the token budget to HARD_MAX_NEW_TOKENS (currently 32)
-      to keep requests fast on the free HF hardware.
-    - `max_new_tokens` and `max_tokens` are accepted for compatibility but ignored.
+    - The token budget is `max_tokens` or `max_new_tokens`, capped at
+      HARD_MAX_NEW_TOKENS; agents pass their pipeline profile's budget.
+    - `timeout` (seconds per attempt) defaults to LLM_TIMEOUT_SEC.
+    - `deadline` (absolute time.time(), optional) caps every attempt's timeout
+      and the retries; LLMDeadlineExceededError once it leaves no time.
+    - Results are served from the completion cache when possible, and identical
+      calls already in flight are joined instead of re-sent. Pass use_cache=False
+      to force a fresh, uncoalesced call (the result is still stored).
+    - This blocks the calling thread. From async code use
+      agenerate_chat_completion() instead.
     """
-    client = _get_client()
+    effective_max = _resolve_max_new_tokens(max_new_tokens, max_tokens)
+    effective_timeout = timeout if timeout is not None else LLM_TIMEOUT_SEC
+    key = _completion_cache_key(messages, temperature, effective_max)
 
-    # Resolve effective token cap (ignore larger values)
-    effective_max = HARD_MAX_NEW_TOKENS
+    t0 = time.perf_counter()
+    with span("chat_completion", "llm", prompt_chars=_prompt_chars(messages), max_new_tokens=effective_max):
+        if use_cache and LLM_CACHE_ENABLED:
+            cached = _completion_cache.get(key)
+            if cached is not None:
+                annotate(cache="hit", output_chars=len(cached))
+                _observe_call(t0, "hit")
+                return cached
 
-    # Our Space expects:
-    #   omni_chat(messages_json: str, max_new_tokens: int, temperature: float) -> str
-    #
-    # and is wired in Gradio as:
-    #   client.predict(messages_json, max_new_tokens, temperature, api_name="/predict")
-    #
-    messages_json = json.dumps({"messages": messages})
+        fetched = False
 
-    last_err: Optional[Exception] = None
+        def _fetch() -> str:
+            nonlocal fetched
+            fetched = True
+            annotate(cache="miss")
+            result = _complete_with_retries(
+                messages, temperature, effective_max, effective_timeout, deadline
+            )
+            if LLM_CACHE_ENABLED:
+                _completion_cache.set(key, result)
+            return result
 
-    for attempt in range(1, LLM_MAX_RETRIES + 1):
         try:
-            result = client.predict(
-                messages_json,
-                int(effective_max),
-                float(temperature),
-                api_name="/predict",
-            )
+            if use_cache and LLM_COALESCE_ENABLED:
+                annotate(cache="coalesced")
+                result = _single_flight.do(key, _fetch, deadline)
+            else:
+                result = _fetch()
+        except Exception as e:
+            _observe_call(t0, "miss" if fetched else "coalesced", e)
+            raise
+        _observe_call(t0, "miss" if fetched else "coalesced")
+        annotate(output_chars=len(result))
+        return result
 
-            if not isinstance(result, str):
-                result = str(result)
 
-            return result.strip()
+async def agenerate_chat_completion(
+    messages: List[Dict[str, Any]],
+    temperature: float = 0.3,
+    max_new_tokens: int = 512,
+    max_tokens: Optional[int] = None,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
+    **_: Any,
+) -> str:
+    """
+    Async version of generate_chat_completion().
 
-        except httpx.RequestError as e:
-            last_err = e
-            print(f"[LLM] HTTP error calling Space (attempt {attempt}/{LLM_MAX_RETRIES}): {e}")
+    The Space job runs on gradio_client's own worker threads and is awaited via
+    asyncio.wrap_future(), and retry backoff uses asyncio.sleep(), so a slow Space
+    call never blocks the event loop.
+    """
+    effective_max = _resolve_max_new_tokens(max_new_tokens, max_tokens)
+    effective_timeout = timeout if timeout is not None else LLM_TIMEOUT_SEC
+    key = _completion_cache_key(messages, temperature, effective_max)
+
+    t0 = time.perf_counter()
+    with span("chat_completion", "llm", prompt_chars=_prompt_chars(messages), max_new_tokens=effective_max):
+        if use_cache and LLM_CACHE_ENABLED:
+            cached = _completion_cache.get(key)
+            if cached is not None:
+                annotate(cache="hit", output_chars=len(cached))
+                _observe_call(t0, "hit")
+                return cached
+
+        fetched = False
+
+        async def _afetch() -> str:
+            # Runs in the leader's context, so this annotates the leader's span
+            nonlocal fetched
+            fetched = True
+            annotate(cache="miss")
+            result = await _acomplete_with_retries(
+                messages, temperature, effective_max, effective_timeout, deadline
+            )
+            if LLM_CACHE_ENABLED:
+                _completion_cache.set(key, result)
+            return result
+
+        try:
+            if use_cache and LLM_COALESCE_ENABLED:
+                annotate(cache="coalesced")
+                result = await _single_flight.ado(key, _afetch, deadline)
+            else:
+                result = await _afetch()
         except Exception as e:
-            last_err = e
-            print(f"[LLM] Error calling Space (attempt {attempt}/{LLM_MAX_RETRIES}): {e}")
+            _observe_call(t0, "miss" if fetched else "coalesced", e)
+            raise
+        _observe_call(t0, "miss" if fetched else "coalesced")
+        annotate(output_chars=len(result))
+        return result
 
-        time.sleep(1.0 * attempt)
 
-    raise LLMClientError(
-        f"Failed to get completion from LLM Space after {LLM_MAX_RETRIES} attempts: {last_err}"
-    )
+async def astream_chat_completion(
+    messages: List[Dict[str, Any]],
+    temperature: float = 0.3,
+    max_new_tokens: int = 512,
+    max_tokens: Optional[int] = None,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
+    **_: Any,
+) -> AsyncIterator[str]:
+    """
+    Stream a completion as text deltas from the backend's astream().
+
+    For the Gradio Space this polls partial outputs of generator endpoints; for
+    a plain endpoint the whole answer arrives as one chunk, so callers get
+    correct (just not incremental) output either way.
+
+    Streaming calls always bypass the micro-batcher. Failures are retried only
+    until the first chunk has been yielded. Cached answers are yielded as a
+    single chunk; the full streamed text is cached.
+    """
+    effective_max = _resolve_max_new_tokens(max_new_tokens, max_tokens)
+    effective_timeout = timeout if timeout is not None else LLM_TIMEOUT_SEC
+    key = _completion_cache_key(messages, temperature, effective_max)
+
+    # The span's record is updated directly: the context it was opened in is
+    # not active between chunks.
+    t0 = time.perf_counter()
+    with span(
+        "chat_completion_stream", "llm", prompt_chars=_prompt_chars(messages), max_new_tokens=effective_max
+    ) as rec:
+        if use_cache and LLM_CACHE_ENABLED:
+            cached = _completion_cache.get(key)
+            if cached is not None:
+                if rec is not None:
+                    rec.update(cache="hit", output_chars=len(cached))
+                _observe_call(t0, "hit")
+                yield cached
+                return
+
+        last_err: Optional[Exception] = None
+
+        # Retried failures are observed once, with the error that ends the call
+        try:
+            for attempt in range(1, LLM_MAX_RETRIES + 1):
+                if rec is not None:
+                    rec.update(cache="miss", attempts=attempt)
+                if attempt > 1:
+                    _LLM_RETRIES.labels(_agent_label()).inc()
+                attempt_timeout = _attempt_timeout(effective_timeout, deadline)
+                _breaker.before_call()
+                chunks: List[str] = []
+                t_attempt = time.perf_counter()
+                try:
+                    stream = _backend.astream(messages, effective_max, temperature, attempt_timeout)
+                    async with aclosing(stream):
+                        async for chunk in stream:
+                            if not chunks and rec is not None:
+                                rec["first_chunk_ms"] = round((time.perf_counter() - t_attempt) * 1000.0, 3)
+                            chunks.append(chunk)
+                            yield chunk
+
+                    _breaker.record_success()
+                    _observe_call(t0, "miss")
+                    if rec is not None:
+                        rec["output_chars"] = sum(len(c) for c in chunks)
+                    if LLM_CACHE_ENABLED:
+                        _completion_cache.set(key, _coerce_result("".join(chunks)))
+                    return
+                except (asyncio.CancelledError, GeneratorExit):
+                    _breaker.release()
+                    raise
+                except Exception as e:
+                    if chunks:
+                        _record_breaker_outcome(e, attempt_timeout, effective_timeout)
+                        raise LLMClientError(f"LLM stream failed after partial output: {e}") from e
+                    last_err = e
+                    _handle_attempt_error(e, attempt, attempt_timeout, effective_timeout)
+
+                if attempt < LLM_MAX_RETRIES:
+                    delay = _backoff_fits(attempt, deadline)
+                    if delay is None:
+                        raise LLMDeadlineExceededError(
+                            f"Request deadline exceeded after {attempt} attempt(s): {last_err!r}"
+                        )
+                    await asyncio.sleep(delay)
+
+            raise LLMClientError(
+                f"Failed to get completion from LLM Space after {LLM_MAX_RETRIES} attempts: {last_err}"
+            )
+        except Exception as e:
+            _observe_call(t0, "miss", e)
+            raise
 
 
 def generate_structured_json(
@@ -126,22 +1442,46 @@ def generate_structured_json(
     temperature: float = 0.2,
     max_new_tokens: int = 512,
     max_tokens: Optional[int] = None,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     For nodes that want the model to return JSON.
 
-    It calls generate_chat_completion() (hard-capped tokens) and then json.loads().
+    It calls generate_chat_completion() and then json.loads().
     """
     raw = generate_chat_completion(
         messages=messages,
         temperature=temperature,
         max_new_tokens=max_new_tokens,
         max_tokens=max_tokens,
+        use_cache=use_cache,
+        timeout=timeout,
+        deadline=deadline,
     )
+    return _parse_json_or_raw(raw)
 
-    try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
-        # If the model didn't return valid JSON, wrap raw text in a dict
-        return {"raw": raw}
 
+async def agenerate_structured_json(
+    messages: List[Dict[str, Any]],
+    temperature: float = 0.2,
+    max_new_tokens: int = 512,
+    max_tokens: Optional[int] = None,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Async version of generate_structured_json().
+    """
+    raw = await agenerate_chat_completion(
+        messages=messages,
+        temperature=temperature,
+        max_new_tokens=max_new_tokens,
+        max_tokens=max_tokens,
+        use_cache=use_cache,
+        timeout=timeout,
+        deadline=deadline,
+    )
+    return _parse_json_or_raw(raw)
@@ -0,0 +1,129 @@
+# app/services/mock_llm_server.py
+
+"""
+Local stand-in for the LLM Space, for load tests without touching the real one.
+
+Serves an OpenAI-compatible POST /v1/chat/completions (including `stream: true`)
+with a configurable latency distribution and token rate. Point the backend at it
+with LLM_BACKEND=openai.
+
+Usage (from omni-backend root):
+
+    python -m app.services.mock_llm_server --port 8001 \\
+        --latency-median-ms 800 --latency-sigma 0.5 --tokens-per-sec 30
+
+    export LLM_BACKEND=openai
+    export LLM_OPENAI_BASE_URL=http://127.0.0.1:8001/v1
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.core.config import get_settings
+from app.services.llm_backends import LatencyModel, fake_completion_tokens
+
+
+class MockChatRequest(BaseModel):
+    model: str = "omni-nano"
+    messages: List[Dict[str, Any]]
+    max_tokens: Optional[int] = 32
+    temperature: Optional[float] = 0.3
+    stream: bool = False
+
+
+def create_mock_app(latency: LatencyModel) -> FastAPI:
+    app = FastAPI(title="Mock Omni LLM", version="0.1.0")
+    app.state.calls = 0
+
+    def _chunk(completion_id: str, model: str, delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+        body = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(body)}\n\n"
+
+    @app.get("/health")
+    async def health() -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "calls": app.state.calls,
+            "latency_median_ms": latency.median_ms,
+            "latency_sigma": latency.sigma,
+            "tokens_per_sec": latency.tokens_per_sec,
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(req: MockChatRequest):
+        app.state.calls += 1
+        tokens = fake_completion_tokens(req.messages, req.max_tokens or 32)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        if req.stream:
+            async def event_stream() -> AsyncIterator[str]:
+                await asyncio.sleep(latency.time_to_first_token())
+                yield _chunk(completion_id, req.model, {"role": "assistant"})
+                for i, token in enumerate(tokens):
+                    if i:
+                        await asyncio.sleep(latency.per_token())
+                    yield _chunk(completion_id, req.model, {"content": token})
+                yield _chunk(completion_id, req.model, {}, finish="stop")
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+        await asyncio.sleep(latency.total(len(tokens)))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"completion_tokens": len(tokens)},
+        }
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-median-ms", type=float, default=settings.FAKE_LLM_LATENCY_MEDIAN_MS)
+    parser.add_argument("--latency-sigma", type=float, default=settings.FAKE_LLM_LATENCY_SIGMA)
+    parser.add_argument("--tokens-per-sec", type=float, default=settings.FAKE_LLM_TOKENS_PER_SEC)
+    args = parser.parse_args()
+
+    app = create_mock_app(
+        LatencyModel(
+            median_ms=args.latency_median_ms,
+            sigma=args.latency_sigma,
+            tokens_per_sec=args.tokens_per_sec,
+        )
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
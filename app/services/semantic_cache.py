@@ -0,0 +1,461 @@
+# app/services/semantic_cache.py
+
+"""
+Semantic answer cache in front of the pipeline.
+
+Users often ask paraphrases of the same question. The user message is embedded
+(app.rag.embeddings.embed_query) and compared with the messages of earlier
+answered requests; above SEMANTIC_CACHE_THRESHOLD cosine similarity, the
+earlier final answer is returned without running the pipeline.
+
+- Entries are scoped: a message is only matched against messages of the same
+  scope (pipeline profile + whether chat history was present), see
+  cache_scope(). Requests with chat history are not cached unless
+  SEMANTIC_CACHE_WITH_HISTORY=true (follow-ups depend on the conversation).
+- In-process index: a fixed-size float32 matrix of normalized embeddings
+  (one dot product per lookup), LRU eviction at SEMANTIC_CACHE_MAX_ENTRIES
+  and a per-entry TTL.
+- Optional shared tier (SEMANTIC_CACHE_BACKEND=qdrant): entries are also
+  written to a Qdrant collection, so instances share the cache. Lookups try
+  the in-process index first; Qdrant hits are copied into it. TTL is applied
+  via a created_at filter and expired points are purged periodically.
+- Off the response path as far as possible: a lookup slower than
+  SEMANTIC_CACHE_LOOKUP_TIMEOUT_SEC (or the request deadline) counts as a
+  miss, and answers are stored by background tasks drained on shutdown.
+
+Off by default: it loads the sentence-transformers model.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.metrics import register_collector
+from app.core.timing import annotate, span
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+# Minimum cosine similarity for a hit
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048"))
+SEMANTIC_CACHE_TTL_SEC = float(os.getenv("SEMANTIC_CACHE_TTL_SEC", "3600"))
+SEMANTIC_CACHE_WITH_HISTORY = os.getenv("SEMANTIC_CACHE_WITH_HISTORY", "false").lower() == "true"
+
+# "memory" (per process) or "qdrant" (memory + a shared Qdrant collection)
+SEMANTIC_CACHE_BACKEND = os.getenv("SEMANTIC_CACHE_BACKEND", "memory").strip().lower()
+SEMANTIC_CACHE_COLLECTION = os.getenv("SEMANTIC_CACHE_COLLECTION", "semantic_cache")
+# Delete expired Qdrant points every N stores
+SEMANTIC_CACHE_PURGE_EVERY = int(os.getenv("SEMANTIC_CACHE_PURGE_EVERY", "100"))
+# Longest a request waits for the lookup (embedding + Qdrant) before running
+# the pipeline as a miss; also capped by the request deadline
+SEMANTIC_CACHE_LOOKUP_TIMEOUT_SEC = float(os.getenv("SEMANTIC_CACHE_LOOKUP_TIMEOUT_SEC", "1.0"))
+# How long shutdown waits for answers still being written to the cache
+SEMANTIC_CACHE_DRAIN_TIMEOUT_SEC = float(os.getenv("SEMANTIC_CACHE_DRAIN_TIMEOUT_SEC", "5.0"))
+
+
+@dataclass
+class CachedAnswer:
+    """
+    A cache hit: the earlier message it matched and its answer.
+    """
+
+    message: str
+    answer: str
+    similarity: float
+    source: str  # "memory" | "qdrant"
+
+    def as_extras(self) -> Dict[str, Any]:
+        return {
+            "hit": True,
+            "similarity": round(self.similarity, 4),
+            "matched_message": self.message,
+            "source": self.source,
+        }
+
+
+# ---------------------------------------------------------------------------
+# In-process index
+# ---------------------------------------------------------------------------
+
+class SemanticIndex:
+    """
+    Thread-safe LRU + TTL cache searched by cosine similarity.
+
+    Vectors live in one preallocated (max_entries, dim) float32 matrix; each
+    entry owns a row ("slot"), freed on eviction / expiry. A lookup is a single
+    matrix-vector product over the rows of the query's scope.
+    """
+
+    def __init__(self, max_entries: int, ttl_sec: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self._vectors: Optional[np.ndarray] = None
+        # Per slot: scope code (-1 = free) and expiry (monotonic; 0 = free)
+        self._scope_codes: Dict[str, int] = {}
+        self._scopes = np.full(max_entries, -1, dtype=np.int32)
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._free: List[int] = list(range(max_entries - 1, -1, -1))
+        # slot -> (message, answer), in LRU order
+        self._entries: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _release(self, slot: int) -> None:
+        del self._entries[slot]
+        self._scopes[slot] = -1
+        self._expires[slot] = 0.0
+        self._free.append(slot)
+
+    def lookup(self, vector: np.ndarray, scope: str, threshold: float) -> Optional[CachedAnswer]:
+        now = time.monotonic()
+        with self._lock:
+            code = self._scope_codes.get(scope)
+            if self._vectors is None or code is None:
+                self.misses += 1
+                return None
+
+            for slot in np.nonzero((self._expires > 0) & (self._expires <= now))[0]:
+                self._release(int(slot))
+
+            slots = np.nonzero(self._scopes == code)[0]
+            if not len(slots):
+                self.misses += 1
+                return None
+
+            scores = self._vectors[slots] @ vector
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < threshold:
+                self.misses += 1
+                return None
+
+            slot = int(slots[best])
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            message, answer = self._entries[slot]
+            return CachedAnswer(message=message, answer=answer, similarity=similarity, source="memory")
+
+    def add(self, vector: np.ndarray, scope: str, message: str, answer: str) -> None:
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            if not self._free:
+                oldest = next(iter(self._entries))
+                self._release(oldest)
+                self.evictions += 1
+
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._scopes[slot] = self._scope_codes.setdefault(scope, len(self._scope_codes))
+            self._expires[slot] = time.monotonic() + self.ttl_sec
+            self._entries[slot] = (message, answer)
+
+    def clear(self) -> None:
+        with self._lock:
+            for slot in list(self._entries):
+                self._release(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_sec": self.ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+_index = SemanticIndex(SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_TTL_SEC)
+
+
+def _collect_metrics() -> Any:
+    stats = _index.stats()
+    for event in ("hits", "misses", "evictions"):
+        yield "omni_semantic_cache_events_total", {"event": event}, stats[event]
+
+
+register_collector(
+    "omni_semantic_cache_events_total",
+    "counter",
+    "Semantic answer cache hits, misses and evictions (in-process index).",
+    _collect_metrics,
+)
+
+
+# ---------------------------------------------------------------------------
+# Qdrant tier
+# ---------------------------------------------------------------------------
+
+class QdrantSemanticStore:
+    """
+    Shared cache entries in a Qdrant collection (cosine distance), payload:
+    {scope, message, answer, created_at}.
+    """
+
+    def __init__(self, collection: str, ttl_sec: float) -> None:
+        self.collection = collection
+        self.ttl_sec = ttl_sec
+        self._collection_ready = False
+        self._lock = threading.Lock()
+        self._stores = 0
+
+    def _get_client(self, dim: int) -> Any:
+        from app.rag.qdrant_client import get_qdrant_client
+
+        client = get_qdrant_client()
+        with self._lock:
+            if not self._collection_ready:
+                from qdrant_client import models as qmodels
+
+                if not client.collection_exists(self.collection):
+                    client.create_collection(
+                        collection_name=self.collection,
+                        vectors_config=qmodels.VectorParams(size=dim, distance=qmodels.Distance.COSINE),
+                    )
+                    client.create_payload_index(
+                        self.collection, "scope", field_schema=qmodels.PayloadSchemaType.KEYWORD
+                    )
+                    client.create_payload_index(
+                        self.collection, "created_at", field_schema=qmodels.PayloadSchemaType.FLOAT
+                    )
+                self._collection_ready = True
+        return client
+
+    def _fresh_filter(self, scope: str) -> Any:
+        from qdrant_client import models as qmodels
+
+        return qmodels.Filter(
+            must=[
+                qmodels.FieldCondition(key="scope", match=qmodels.MatchValue(value=scope)),
+                qmodels.FieldCondition(
+                    key="created_at", range=qmodels.Range(gte=time.time() - self.ttl_sec)
+                ),
+            ]
+        )
+
+    def lookup(self, vector: np.ndarray, scope: str, threshold: float) -> Optional[CachedAnswer]:
+        from app.rag.qdrant_client import QDRANT_LATENCY
+
+        client = self._get_client(vector.shape[0])
+        t0 = time.perf_counter()
+        with span("semantic_cache.query", "qdrant", collection=self.collection):
+            response = client.query_points(
+                collection_name=self.collection,
+                query=vector.tolist(),
+                query_filter=self._fresh_filter(scope),
+                limit=1,
+                score_threshold=threshold,
+                with_payload=True,
+            )
+            annotate(hits=len(response.points))
+        QDRANT_LATENCY.labels("query", self.collection).observe(time.perf_counter() - t0)
+        if not response.points:
+            return None
+        point = response.points[0]
+        payload = point.payload or {}
+        return CachedAnswer(
+            message=payload.get("message", ""),
+            answer=payload.get("answer", ""),
+            similarity=float(point.score),
+            source="qdrant",
+        )
+
+    def add(self, vector: np.ndarray, scope: str, message: str, answer: str) -> None:
+        from qdrant_client import models as qmodels
+
+        from app.rag.qdrant_client import QDRANT_LATENCY
+
+        client = self._get_client(vector.shape[0])
+        t0 = time.perf_counter()
+        with span("semantic_cache.upsert", "qdrant", collection=self.collection):
+            client.upsert(
+                collection_name=self.collection,
+                points=[
+                    qmodels.PointStruct(
+                        id=str(uuid.uuid4()),
+                        vector=vector.tolist(),
+                        payload={
+                            "scope": scope,
+                            "message": message,
+                            "answer": answer,
+                            "created_at": time.time(),
+                        },
+                    )
+                ],
+            )
+        QDRANT_LATENCY.labels("upsert", self.collection).observe(time.perf_counter() - t0)
+
+        with self._lock:
+            self._stores += 1
+            purge = SEMANTIC_CACHE_PURGE_EVERY > 0 and self._stores % SEMANTIC_CACHE_PURGE_EVERY == 0
+        if purge:
+            client.delete(
+                collection_name=self.collection,
+                points_selector=qmodels.FilterSelector(
+                    filter=qmodels.Filter(
+                        must=[
+                            qmodels.FieldCondition(
+                                key="created_at", range=qmodels.Range(lt=time.time() - self.ttl_sec)
+                            )
+                        ]
+                    )
+                ),
+            )
+
+
+_shared_store: Optional[QdrantSemanticStore] = (
+    QdrantSemanticStore(SEMANTIC_CACHE_COLLECTION, SEMANTIC_CACHE_TTL_SEC)
+    if SEMANTIC_CACHE_BACKEND == "qdrant"
+    else None
+)
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def cache_scope(profile: str, chat_history: Optional[List[Dict[str, Any]]]) -> Optional[str]:
+    """
+    Scope a request's message is matched in, or None if it shouldn't be cached.
+    """
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    if chat_history and not SEMANTIC_CACHE_WITH_HISTORY:
+        return None
+    return f"{profile}:{'history' if chat_history else 'fresh'}"
+
+
+def _normalize(message: str) -> str:
+    return " ".join(message.split())
+
+
+def embed_message(message: str) -> Optional[np.ndarray]:
+    """
+    Normalized embedding of `message` (None if the embedding model is unavailable).
+    """
+    try:
+        from app.rag.embeddings import embed_query
+
+        vector = embed_query(_normalize(message))
+    except Exception as e:
+        print(f"[CACHE] Embedding unavailable, skipping semantic cache: {e!r}")
+        return None
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else None
+
+
+def lookup_answer(vector: np.ndarray, scope: str) -> Optional[CachedAnswer]:
+    """
+    Best cached answer for `vector` in `scope` above SEMANTIC_CACHE_THRESHOLD.
+    """
+    hit = _index.lookup(vector, scope, SEMANTIC_CACHE_THRESHOLD)
+    if hit is not None or _shared_store is None:
+        return hit
+
+    try:
+        hit = _shared_store.lookup(vector, scope, SEMANTIC_CACHE_THRESHOLD)
+    except Exception as e:
+        print(f"[CACHE] Qdrant lookup failed: {e!r}")
+        return None
+    if hit is not None:
+        _index.add(vector, scope, hit.message, hit.answer)
+    return hit
+
+
+def store_answer(vector: np.ndarray, scope: str, message: str, answer: str) -> None:
+    _index.add(vector, scope, message, answer)
+    if _shared_store is None:
+        return
+    try:
+        _shared_store.add(vector, scope, message, answer)
+    except Exception as e:
+        print(f"[CACHE] Qdrant store failed: {e!r}")
+
+
+async def alookup_answer(
+    message: str,
+    scope: str,
+    timeout: Optional[float] = None,
+) -> Tuple[Optional[CachedAnswer], Optional[np.ndarray]]:
+    """
+    Embed `message` and look it up (in a worker thread). Returns the hit, if
+    any, and the embedding to pass to store_answer_in_background() on a miss.
+
+    After `timeout` seconds the lookup is abandoned and treated as a miss
+    without an embedding (the worker thread finishes on its own).
+    """
+
+    def lookup() -> Tuple[Optional[CachedAnswer], Optional[np.ndarray]]:
+        with span("semantic_cache.lookup", "cache", scope=scope):
+            vector = embed_message(message)
+            if vector is None:
+                return None, None
+            hit = lookup_answer(vector, scope)
+            annotate(cache="hit" if hit is not None else "miss")
+            return hit, vector
+
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(lookup), timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"[CACHE] Lookup took longer than {timeout:.2f}s, treating it as a miss")
+        return None, None
+
+
+# Stores still running; kept referenced so they aren't garbage-collected
+_pending_stores: Set["asyncio.Task[None]"] = set()
+
+
+def store_answer_in_background(vector: np.ndarray, scope: str, message: str, answer: str) -> None:
+    """
+    Cache an answer without holding up the response (must be called from the
+    event loop). adrain_pending_stores() waits for these on shutdown.
+    """
+    task = asyncio.create_task(asyncio.to_thread(store_answer, vector, scope, message, answer))
+    _pending_stores.add(task)
+    task.add_done_callback(_pending_stores.discard)
+
+
+async def adrain_pending_stores(timeout: float = SEMANTIC_CACHE_DRAIN_TIMEOUT_SEC) -> None:
+    """
+    Wait (up to `timeout` seconds) for background stores to finish.
+    """
+    if not _pending_stores:
+        return
+    _, pending = await asyncio.wait(set(_pending_stores), timeout=timeout)
+    if pending:
+        print(f"[CACHE] {len(pending)} cache store(s) still running at shutdown; abandoning them")
+
+
+def get_semantic_cache_stats() -> Dict[str, Any]:
+    """
+    Counters and size of the in-process index (for monitoring).
+    """
+    stats = _index.stats()
+    stats["enabled"] = SEMANTIC_CACHE_ENABLED
+    stats["backend"] = SEMANTIC_CACHE_BACKEND
+    stats["threshold"] = SEMANTIC_CACHE_THRESHOLD
+    return stats
+
+
+def clear_semantic_cache() -> None:
+    """
+    Clear the in-process index (the Qdrant collection is left alone).
+    """
+    _index.clear()
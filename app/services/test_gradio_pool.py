@@ -0,0 +1,78 @@
+# app/services/test_gradio_pool.py
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.gradio_pool import GradioClientPool
+
+
+def _pool(factory=object) -> GradioClientPool:
+    return GradioClientPool(factory, size=1, per_client_concurrency=1, max_failures=3)
+
+
+def _wait_for_idle(pool: GradioClientPool, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while pool.stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_cancelled_aacquire_on_saturated_pool_releases_its_lease() -> None:
+    pool = _pool()
+    held = pool.acquire()
+
+    async def scenario() -> None:
+        waiter = asyncio.create_task(pool.aacquire(timeout=5))
+        await asyncio.sleep(0.05)  # waiter is blocked in its worker thread
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # Freeing the slot lets the abandoned worker take it; it must give it back
+        pool.release(held)
+        await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+    _wait_for_idle(pool)
+
+    assert pool.stats()["in_flight"] == 0
+    assert pool.try_acquire() is not None
+
+
+def test_cancelled_aacquire_during_client_creation_releases_its_lease() -> None:
+    creating = threading.Event()
+    proceed = threading.Event()
+
+    def slow_factory() -> object:
+        creating.set()
+        proceed.wait(2)
+        return object()
+
+    pool = _pool(slow_factory)
+
+    async def scenario() -> None:
+        waiter = asyncio.create_task(pool.aacquire())
+        await asyncio.to_thread(creating.wait, 2)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        proceed.set()
+        await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+    _wait_for_idle(pool)
+
+    assert pool.stats()["in_flight"] == 0
+    assert pool.try_acquire() is not None
+
+
+def test_aacquire_returns_a_ready_slot() -> None:
+    pool = _pool()
+    slot = asyncio.run(pool.aacquire())
+    assert slot.client is not None
+    assert pool.stats()["in_flight"] == 1
+    pool.release(slot)
+    assert pool.stats()["in_flight"] == 0
@@ -0,0 +1,221 @@
+# app/services/test_llm_client.py
+
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import Future
+
+import httpx
+import pytest
+
+from app.services import llm_client
+from app.services.llm_client import (
+    CircuitBreaker,
+    LLMCircuitOpenError,
+    LLMClientError,
+    LLMDeadlineExceededError,
+)
+
+
+# ---------------------------------------------------------------------------
+# CircuitBreaker
+# ---------------------------------------------------------------------------
+
+def test_breaker_opens_after_consecutive_failures() -> None:
+    breaker = CircuitBreaker(failure_threshold=2, recovery_sec=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(LLMCircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()["total_rejected"] == 1
+
+
+def test_breaker_half_open_lets_one_probe_through() -> None:
+    breaker = CircuitBreaker(failure_threshold=1, recovery_sec=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.before_call()
+    with pytest.raises(LLMCircuitOpenError):
+        breaker.before_call()
+
+    # A released probe (cancelled call) frees the slot without closing
+    breaker.release()
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_the_circuit() -> None:
+    breaker = CircuitBreaker(failure_threshold=3, recovery_sec=0.05)
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats()["times_opened"] == 2
+
+
+def test_late_failures_do_not_extend_the_open_window() -> None:
+    breaker = CircuitBreaker(failure_threshold=1, recovery_sec=0.1)
+    breaker.record_failure()
+    for _ in range(3):
+        time.sleep(0.03)
+        breaker.record_failure()  # calls that started before it opened
+    time.sleep(0.02)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.stats()["times_opened"] == 1
+
+
+# ---------------------------------------------------------------------------
+# Retry classification and backoff
+# ---------------------------------------------------------------------------
+
+def _status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://space.example/run")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+
+@pytest.mark.parametrize(
+    "err, retryable",
+    [
+        (TimeoutError(), True),
+        (httpx.ConnectError("refused"), True),
+        (_status_error(429), True),
+        (_status_error(503), True),
+        (_status_error(400), False),
+        (ValueError("bad api_name"), False),
+        (LLMClientError("bad response"), False),
+        (RuntimeError("Space worker crashed"), True),
+    ],
+)
+def test_retry_classification(err: Exception, retryable: bool) -> None:
+    assert llm_client._is_retryable(err) is retryable
+
+
+def test_backoff_is_jittered_and_capped(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(llm_client, "LLM_BACKOFF_BASE_SEC", 0.5)
+    monkeypatch.setattr(llm_client, "LLM_BACKOFF_MAX_SEC", 2.0)
+    for attempt, ceiling in [(1, 0.5), (2, 1.0), (3, 2.0), (6, 2.0)]:
+        delays = [llm_client._backoff_delay(attempt) for _ in range(200)]
+        assert all(0.0 <= d <= ceiling for d in delays)
+        assert max(delays) > ceiling / 2
+
+
+def test_non_retryable_error_fails_without_retrying_or_tripping(monkeypatch: pytest.MonkeyPatch) -> None:
+    breaker = CircuitBreaker(failure_threshold=1, recovery_sec=60)
+    calls = []
+
+    def submit(*args, **kwargs) -> Future:
+        calls.append(1)
+        raise ValueError("bad api_name")
+
+    monkeypatch.setattr(llm_client, "_breaker", breaker)
+    monkeypatch.setattr(llm_client, "_submit", submit)
+    with pytest.raises(LLMClientError):
+        llm_client._complete_with_retries([{"role": "user", "content": "hi"}], 0.2, 16, timeout=1)
+    assert len(calls) == 1
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_circuit_fails_fast_without_calling_the_space(monkeypatch: pytest.MonkeyPatch) -> None:
+    breaker = CircuitBreaker(failure_threshold=1, recovery_sec=60)
+    breaker.record_failure()
+    monkeypatch.setattr(llm_client, "_breaker", breaker)
+    monkeypatch.setattr(llm_client, "_submit", pytest.fail)
+    with pytest.raises(LLMCircuitOpenError):
+        llm_client._complete_with_retries([{"role": "user", "content": "hi"}], 0.2, 16, timeout=1)
+
+
+@pytest.mark.parametrize("err, counted", [(ValueError("bad chunk"), 0), (httpx.ReadError("reset"), 1)])
+def test_stream_failure_after_partial_output_is_classified(
+    err: Exception,
+    counted: int,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    breaker = CircuitBreaker(failure_threshold=5, recovery_sec=60)
+
+    async def astream(messages, max_new_tokens, temperature, timeout):
+        yield "partial"
+        raise err
+
+    monkeypatch.setattr(llm_client, "_breaker", breaker)
+    monkeypatch.setattr(llm_client._backend, "astream", astream)
+
+    async def consume() -> None:
+        stream = llm_client.astream_chat_completion([{"role": "user", "content": "hi"}], use_cache=False)
+        async for _ in stream:
+            pass
+
+    with pytest.raises(LLMClientError):
+        asyncio.run(consume())
+    assert breaker.stats()["total_failures"] == counted
+
+
+# ---------------------------------------------------------------------------
+# Timeouts and the breaker
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def hanging_space(monkeypatch: pytest.MonkeyPatch) -> CircuitBreaker:
+    """
+    A Space that never answers, behind a fresh breaker.
+    """
+    breaker = CircuitBreaker(failure_threshold=5, recovery_sec=60)
+    monkeypatch.setattr(llm_client, "_breaker", breaker)
+    monkeypatch.setattr(llm_client, "_submit", lambda *args, **kwargs: Future())
+    monkeypatch.setattr(llm_client, "_backoff_delay", lambda attempt: 0.0)
+    return breaker
+
+
+def test_deadline_shortened_timeout_is_not_a_breaker_failure(hanging_space: CircuitBreaker) -> None:
+    messages = [{"role": "user", "content": "hi"}]
+    with pytest.raises(LLMDeadlineExceededError):
+        llm_client._complete_with_retries(
+            messages, 0.2, 16, timeout=30, deadline=time.time() + 0.1
+        )
+    assert hanging_space.stats()["total_failures"] == 0
+
+
+def test_full_timeout_is_a_breaker_failure(
+    hanging_space: CircuitBreaker,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 2)
+    messages = [{"role": "user", "content": "hi"}]
+    with pytest.raises(LLMClientError):
+        llm_client._complete_with_retries(messages, 0.2, 16, timeout=0.05)
+    assert hanging_space.stats()["total_failures"] == 2
+
+
+def test_async_deadline_shortened_timeout_is_not_a_breaker_failure(
+    hanging_space: CircuitBreaker,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def never_answers(*args, **kwargs) -> str:
+        await asyncio.sleep(3600)
+        return ""
+
+    async def hedged(messages, max_new_tokens, temperature, timeout) -> str:
+        try:
+            return await asyncio.wait_for(never_answers(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError() from None
+
+    monkeypatch.setattr(llm_client, "_await_hedged", hedged)
+    messages = [{"role": "user", "content": "hi"}]
+    with pytest.raises(LLMDeadlineExceededError):
+        asyncio.run(
+            llm_client._acomplete_with_retries(
+                messages, 0.2, 16, timeout=30, deadline=time.time() + 0.1
+            )
+        )
+    assert hanging_space.stats()["total_failures"] == 0
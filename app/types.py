@@ -40,4 +40,5 @@ class OmniState:
 
     # Optional metadata
     session_id: Optional[str] = None
+    deadline: Optional[float] = None  # absolute time.time(); see app.core.deadline
     extras: Dict[str, Any] = field(default_factory=dict)
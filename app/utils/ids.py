@@ -0,0 +1,12 @@
+# app/utils/ids.py
+
+from __future__ import annotations
+
+import uuid
+
+
+def new_run_id() -> str:
+    """
+    Id of one pipeline run (also its checkpoint thread id).
+    """
+    return uuid.uuid4().hex